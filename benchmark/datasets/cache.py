@@ -0,0 +1,165 @@
+"""
+Cache of the generated datasets.
+
+The generation of a dataset has two steps: the translation of its data and of its programs. A step is rebuilt only if
+its key, a hash of its source files, of the code of its translators and of its parameters, changed, or if its outputs
+were modified since it was built. The keys and the outputs are recorded in a manifest, in the dataset directory.
+"""
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set
+
+from benchmark.datasets.core import DATA_SUBDIR_NAME, DICTIONARIES_SUBDIR_NAME, QUERIES_SUBDIR_NAME
+
+MANIFEST_FILENAME = ".generate-manifest.json"
+DATASET_STEP = "dataset"
+PROGRAM_STEP = "program"
+HASH_READ_SIZE = 1 << 20
+
+# the outputs of each step, in the tool directories of a dataset
+_STEP_OUTPUT_SUBDIRS = {
+    DATASET_STEP: (DATA_SUBDIR_NAME, DICTIONARIES_SUBDIR_NAME),
+    PROGRAM_STEP: (QUERIES_SUBDIR_NAME,),
+}
+_MISSING = "missing"
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open(mode="rb") as file_object:
+        while block := file_object.read(HASH_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _iter_files(path: Path) -> List[Path]:
+    if path.is_file():
+        return [path]
+    files = []
+    for root, dir_names, file_names in os.walk(path, followlinks=True):
+        dir_names.sort()
+        files.extend(Path(root) / file_name for file_name in sorted(file_names))
+    return files
+
+
+def _get_imported_files(module_path: Path, package_name: str) -> Set[Path]:
+    """The files defining what a module imports from the benchmark, outside its package."""
+    files = set()
+    for node in ast.walk(ast.parse(module_path.read_text(), filename=str(module_path))):
+        if isinstance(node, ast.Import):
+            imports = [(alias.name, None) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+            imports = [(node.module, alias.name) for alias in node.names]
+        else:
+            continue
+        for module_name, name in imports:
+            if module_name.split(".")[0] != "benchmark" or f"{module_name}.".startswith(f"{package_name}."):
+                continue
+            module = importlib.import_module(module_name)
+            try:
+                # the module of a class or a function, which may only be re-exported by the imported module
+                source_file = inspect.getsourcefile(getattr(module, name) if name is not None else module)
+            except TypeError:
+                source_file = None
+            files.add(Path(source_file or module.__file__))
+    return files
+
+
+@lru_cache(maxsize=None)
+def get_code_files() -> List[Path]:
+    """
+    The modules the translations depend on: the whole datasets package, since the classes share helpers, and the files
+    defining what the package imports from the rest of the benchmark.
+    """
+    package_files = sorted(Path(__file__).parent.rglob("*.py"))
+    imported_files = set()
+    for module_path in package_files:
+        imported_files |= _get_imported_files(module_path, __package__)
+    return [*package_files, *sorted(imported_files - set(package_files))]
+
+
+def get_step_outputs(dataset_dir: Path, step: str) -> Dict[str, List[int]]:
+    """The size and the modification time of the outputs of a step, by path relative to the dataset directory."""
+    outputs = {}
+    if not dataset_dir.is_dir():
+        return outputs
+    for tool_dir in sorted(dataset_dir.iterdir()):
+        for subdir_name in _STEP_OUTPUT_SUBDIRS[step]:
+            if not (tool_dir / subdir_name).is_dir():
+                continue
+            for output_file in _iter_files(tool_dir / subdir_name):
+                stat = output_file.stat()
+                outputs[str(output_file.relative_to(dataset_dir))] = [stat.st_size, stat.st_mtime_ns]
+    return outputs
+
+
+class BuildManifest:
+    """The keys and the outputs of the steps of a dataset, and the hashes of the files they were computed from."""
+
+    def __init__(self, dataset_dir: Path):
+        self.dataset_dir = dataset_dir
+        self.path = dataset_dir / MANIFEST_FILENAME
+        try:
+            content = json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError):
+            content = {}
+        self._steps: Dict[str, Dict[str, Any]] = content.get("steps", {})
+        # path -> [size, mtime_ns, sha256], so that the unchanged files are not hashed again
+        self._file_hashes: Dict[str, list] = content.get("files", {})
+
+    def _hash_file(self, path: Path) -> str:
+        stat = path.stat()
+        known = self._file_hashes.get(str(path))
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        file_hash = _hash_file(path)
+        self._file_hashes[str(path)] = [stat.st_size, stat.st_mtime_ns, file_hash]
+        return file_hash
+
+    def get_key(self, sources: Sequence[Path], code_files: Sequence[Path], params: Mapping[str, Any]) -> str:
+        """Hash the content of the sources (files or directories), of the code files, and the parameters."""
+        digest = hashlib.sha256()
+        for path in [*sources, *code_files]:
+            digest.update(f"{path}\0".encode())
+            if not path.exists():
+                digest.update(f"{_MISSING}\0".encode())
+                continue
+            for file_path in _iter_files(path):
+                digest.update(f"{file_path.relative_to(path) if file_path != path else ''}\0".encode())
+                digest.update(self._hash_file(file_path).encode())
+        digest.update(json.dumps(dict(params), sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get_stale_reason(self, step: str, key: str) -> Optional[str]:
+        """Why the step must be rebuilt, or None if its outputs are up to date."""
+        recorded = self._steps.get(step)
+        if recorded is None:
+            return "never built"
+        if recorded["key"] != key:
+            return "sources, translators or parameters changed"
+        outputs = get_step_outputs(self.dataset_dir, step)
+        if not outputs:
+            return "no outputs"
+        recorded_outputs = recorded["outputs"]
+        if outputs != recorded_outputs:
+            changed = sorted(
+                name for name in outputs.keys() | recorded_outputs.keys()
+                if outputs.get(name) != recorded_outputs.get(name)
+            )
+            return f"outputs modified: {', '.join(changed[:3])}{', ...' if len(changed) > 3 else ''}"
+        return None
+
+    def record(self, step: str, key: str) -> None:
+        self._steps[step] = dict(key=key, outputs=get_step_outputs(self.dataset_dir, step))
+
+    def save(self) -> None:
+        self.dataset_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(dict(steps=self._steps, files=self._file_hashes), indent=1))
+        os.replace(tmp_path, self.path)
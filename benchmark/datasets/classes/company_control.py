@@ -1,9 +1,11 @@
 import shutil
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Callable
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR
-from benchmark.datasets.core import Dataset, DatasetID, QUERIES_SUBDIR_NAME, DATA_SUBDIR_NAME, DEFAULT_QUERY_FILENAME
+from benchmark.datasets.core import Dataset, DatasetID, DATA_SUBDIR_NAME, DEFAULT_QUERY_FILENAME, prepare_program_dirs
+from benchmark.datasets.tasks import TranslationTask
 from benchmark.datasets.translate import quote_csv_line, max_digits, get_normalized_integer, \
     process_program_for_vadalog, process_program_for_dlve
 from benchmark.tools import ToolID
@@ -55,11 +57,14 @@ class CompanyControlDataset(Dataset):
     is_partitioned = True
 
     @classmethod
-    def process_dataset(cls, original_dataset_path: Path, output_path: Path, force: bool = True):
+    def get_dataset_tasks(
+        cls, original_dataset_path: Path, output_path: Path, force: bool = True
+    ) -> List[TranslationTask]:
         dataset_name = DatasetID.COMPANY_CONTROL.value
         output_dataset_dir = output_path / dataset_name
 
         dataset_max_digits = max_digits(OWNERSHIP_DATASET_NAMES)
+        tasks = []
         for tool in [ToolID.DLVE, ToolID.VADALOG]:
             dataset_handler = dataset_handlers[tool]
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
@@ -75,14 +80,27 @@ class CompanyControlDataset(Dataset):
 
                 dataset_partition = original_dataset_path / ownership_dataset_name
                 output_dataset_file = tool_output_partition_dir / "own.data"
-                dataset_handler(dataset_partition, output_dataset_file)
+                tasks.append(TranslationTask(
+                    f"{tool.value}/{normalized_partition_name}",
+                    partial(dataset_handler, dataset_partition, output_dataset_file),
+                    (dataset_partition,),
+                ))
+        return tasks
 
     @classmethod
-    def process_program(cls, original_program_path: Path, output_dir: Path, force: bool = True):
-        for tool in ToolID:
-            output_program_dir = output_dir / DatasetID.COMPANY_CONTROL.value / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(output_program_dir, force)
-            output_program_dir.mkdir(parents=True, exist_ok=True)
+    def get_program_tasks(
+        cls, original_program_path: Path, output_dir: Path, force: bool = True
+    ) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / DatasetID.COMPANY_CONTROL.value, force)
+        return [
+            TranslationTask(
+                "all", partial(cls._write_programs, original_program_path, output_program_dirs), (original_program_path,)
+            )
+        ]
+
+    @classmethod
+    def _write_programs(cls, original_program_path: Path, output_program_dirs: Dict[ToolID, Path]):
+        for tool, output_program_dir in output_program_dirs.items():
             output_file = output_program_dir / DEFAULT_QUERY_FILENAME
             output_content = program_handler[tool](original_program_path.read_text())
             output_file.write_text(output_content)
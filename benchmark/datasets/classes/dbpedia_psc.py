@@ -1,12 +1,14 @@
 from functools import partial
 from pathlib import Path
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Tuple
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR
-from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME, DatasetID, DEFAULT_QUERY_FILENAME
-from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
-    get_normalized_integer, normalize, normalize_person_dataset_row, process_program_for_vadalog, \
-    process_program_for_dlve
+from benchmark.datasets.core import Dataset, DICTIONARIES_SUBDIR_NAME, DATA_SUBDIR_NAME, prepare_program_dirs, \
+    DatasetID, DEFAULT_QUERY_FILENAME
+from benchmark.datasets.tasks import TranslationTask
+from benchmark.datasets.translate import ConstantEncoder, PartitionSink, get_dlve_row_formatter, \
+    get_vadalog_row_formatter, write_prefix_partitions, get_normalized_integer, normalize, \
+    normalize_person_dataset_row, process_program_for_vadalog, process_program_for_dlve
 from benchmark.tools import ToolID
 from benchmark.utils.base import remove_dir_or_fail
 
@@ -18,9 +20,9 @@ SIZES = [1000, 10000, 100000, 500000, 1000000]
 
 
 
-dataset_handlers: Dict[ToolID, Callable] = {
-    ToolID.VADALOG: write_lines_for_vadalog,
-    ToolID.DLVE: transform_dataset_file_with_header,
+row_formatters: Dict[ToolID, Callable] = {
+    ToolID.VADALOG: get_vadalog_row_formatter,
+    ToolID.DLVE: get_dlve_row_formatter,
 }
 
 
@@ -38,9 +40,13 @@ program_handler: Dict[ToolID, Callable] = {
 class DBPediaPscDataset(Dataset):
 
     is_partitioned = True
+    supports_constant_encoding = True
 
     @classmethod
-    def process_dataset(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def _prepare_partitions(
+        cls, input_dir: Path, output_dir: Path, force: bool, encode_constants: bool
+    ) -> Tuple[List[TranslationTask], Dict[str, ConstantEncoder]]:
+        """Create the partition directories; return the writers of the partitions, one per source, and the encoders."""
         dataset_name = DatasetID.DBPEDIA_PSC.value
         full_person_dataset_path = input_dir / "persons_1m.csv"
         companies_kp_dataset_path = input_dir / "dbpedia_companies_kp.csv"
@@ -52,58 +58,116 @@ class DBPediaPscDataset(Dataset):
 
         custom_normalize = partial(normalize, nb_https=2)
 
-        for tool in {ToolID.DLVE, ToolID.VADALOG}:
-            dataset_handler = dataset_handlers[tool]
+        tools = [ToolID.DLVE, ToolID.VADALOG]
+        for tool in tools:
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
             remove_dir_or_fail(tool_output_dataset_dir, force)
             tool_output_dataset_dir.mkdir(parents=True, exist_ok=True)
-
-            for size in SIZES:
-                # copy persons
-                normalized_partition_name = get_normalized_integer(size, dataset_max_digits)
+            tool_dictionaries_dir = output_dataset_dir / tool.value / DICTIONARIES_SUBDIR_NAME
+            remove_dir_or_fail(tool_dictionaries_dir, force)
+            if encode_constants:
+                tool_dictionaries_dir.mkdir(parents=True)
+
+        person_sinks: List[PartitionSink] = []
+        control_sinks: List[PartitionSink] = []
+        key_person_sinks: List[PartitionSink] = []
+        encoders: Dict[str, ConstantEncoder] = {}
+        for size in SIZES:
+            normalized_partition_name = get_normalized_integer(size, dataset_max_digits)
+            # the same IDs for all the predicates of the partition, and for all the tools
+            encoder = encoders[normalized_partition_name] = ConstantEncoder() if encode_constants else None
+            for tool in tools:
                 tool_output_partition_dir = (
-                        tool_output_dataset_dir / normalized_partition_name
+                        output_dataset_dir / tool.value / DATA_SUBDIR_NAME / normalized_partition_name
                 )
                 tool_output_partition_dir.mkdir()
-
-                output_dataset_file = tool_output_partition_dir / "person.data"
-                dataset_handler(
+                row_formatter = row_formatters[tool]
+                person_sinks.append(PartitionSink(
+                    tool_output_partition_dir / "person.data", size, row_formatter("person"), encoder
+                ))
+                control_sinks.append(PartitionSink(
+                    tool_output_partition_dir / "control.data", size, row_formatter("control"), encoder
+                ))
+                key_person_sinks.append(PartitionSink(
+                    tool_output_partition_dir / "keyPerson.data", size, row_formatter("keyPerson"), encoder
+                ))
+
+        # each source is read once, for all the partitions of all the tools
+        tasks = [
+            TranslationTask(
+                full_person_dataset_path.stem,
+                partial(
+                    write_prefix_partitions,
                     full_person_dataset_path,
-                    output_dataset_file,
-                    header=None,
-                    predicate_name="person",
-                    row_processor=normalize_person_dataset_row,
+                    person_sinks,
+                    normalize_person_dataset_row,
                     skip_lines=3,
-                    size=size,
-                )
-
-                # copy company_control
-                dataset_handler(
-                    control_dataset_path,
-                    tool_output_partition_dir / "control.data",
-                    header=None,
-                    predicate_name="control",
-                    row_processor=custom_normalize,
-                    skip_lines=1,
-                    size=size,
-                )
-                # copy companies_kp
-                dataset_handler(
+                ),
+                (full_person_dataset_path,),
+            ),
+            TranslationTask(
+                control_dataset_path.stem,
+                partial(
+                    write_prefix_partitions, control_dataset_path, control_sinks, custom_normalize, skip_lines=1
+                ),
+                (control_dataset_path,),
+            ),
+            TranslationTask(
+                companies_kp_dataset_path.stem,
+                partial(
+                    write_prefix_partitions,
                     companies_kp_dataset_path,
-                    tool_output_partition_dir / "keyPerson.data",
-                    header=None,
-                    predicate_name="keyPerson",
-                    row_processor=custom_normalize,
+                    key_person_sinks,
+                    custom_normalize,
                     skip_lines=1,
-                    size=size,
-                )
+                ),
+                (companies_kp_dataset_path,),
+            ),
+        ]
+        return tasks, encoders
+
+    @classmethod
+    def get_dataset_tasks(
+        cls, input_dir: Path, output_dir: Path, force: bool = True, encode_constants: bool = False
+    ) -> List[TranslationTask]:
+        tasks, encoders = cls._prepare_partitions(input_dir, output_dir, force, encode_constants)
+        if not encode_constants:
+            return tasks
+        # the IDs of the constants depend on the order of the sources: a single task
+        return [
+            TranslationTask(
+                "all",
+                partial(cls._write_encoded_partitions, tasks, encoders, output_dir),
+                tuple(source for task in tasks for source in task.sources),
+            )
+        ]
+
+    @classmethod
+    def _write_encoded_partitions(
+        cls, tasks: List[TranslationTask], encoders: Dict[str, ConstantEncoder], output_dir: Path
+    ):
+        for task in tasks:
+            task.function()
+        output_dataset_dir = output_dir / DatasetID.DBPEDIA_PSC.value
+        for normalized_partition_name, encoder in encoders.items():
+            for tool in [ToolID.DLVE, ToolID.VADALOG]:
+                tool_dictionaries_dir = output_dataset_dir / tool.value / DICTIONARIES_SUBDIR_NAME
+                encoder.save(tool_dictionaries_dir / f"{normalized_partition_name}.tsv")
+
+    @classmethod
+    def get_program_tasks(
+        cls, original_program_path: Path, output_dir: Path, force: bool = True
+    ) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / DatasetID.DBPEDIA_PSC.value, force)
+        return [
+            TranslationTask(
+                "all", partial(cls._write_programs, original_program_path, output_program_dirs), (original_program_path,)
+            )
+        ]
 
     @classmethod
-    def process_program(cls, original_program_path: Path, output_dir: Path, force: bool = True):
-        for tool in ToolID:
-            output_program_dir = output_dir / DatasetID.DBPEDIA_PSC.value / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(output_program_dir, force)
-            output_program_dir.mkdir(parents=True, exist_ok=True)
+    def _write_programs(cls, original_program_path: Path, output_program_dirs: Dict[ToolID, Path]):
+        for tool, output_program_dir in output_program_dirs.items():
             output_file = output_program_dir / DEFAULT_QUERY_FILENAME
             output_content = program_handler[tool](original_program_path.read_text())
             output_file.write_text(output_content)
@@ -1,11 +1,14 @@
 from functools import partial
 from pathlib import Path
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Tuple
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR
-from benchmark.datasets.core import Dataset, DatasetID, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME, DEFAULT_QUERY_FILENAME
-from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
-    get_normalized_integer, normalize, process_program_for_vadalog, process_program_for_dlve
+from benchmark.datasets.core import Dataset, DICTIONARIES_SUBDIR_NAME, DatasetID, DATA_SUBDIR_NAME, \
+    prepare_program_dirs, DEFAULT_QUERY_FILENAME
+from benchmark.datasets.tasks import TranslationTask
+from benchmark.datasets.translate import ConstantEncoder, PartitionSink, get_dlve_row_formatter, \
+    get_vadalog_row_formatter, write_prefix_partitions, get_normalized_integer, normalize, \
+    process_program_for_vadalog, process_program_for_dlve
 from benchmark.tools import ToolID
 from benchmark.utils.base import remove_dir_or_fail
 
@@ -15,11 +18,11 @@ DBPEDIA_STRONGLINK_PROGRAM = ORIGINAL_PROGRAMS_DIR / "stronglink.vada"
 SIZES = [1000, 10000, 25000, 50000, 67500]
 
 
-dataset_handlers: Dict[ToolID, Callable] = {
-    ToolID.VADALOG: write_lines_for_vadalog,
-    ToolID.VADALOG_PARSIMONIOUS_NAIVE: write_lines_for_vadalog,
-    ToolID.VADALOG_PARSIMONIOUS_AGGREGATE: write_lines_for_vadalog,
-    ToolID.DLVE: transform_dataset_file_with_header,
+row_formatters: Dict[ToolID, Callable] = {
+    ToolID.VADALOG: get_vadalog_row_formatter,
+    ToolID.VADALOG_PARSIMONIOUS_NAIVE: get_vadalog_row_formatter,
+    ToolID.VADALOG_PARSIMONIOUS_AGGREGATE: get_vadalog_row_formatter,
+    ToolID.DLVE: get_dlve_row_formatter,
 }
 
 program_handler: Dict[ToolID, Callable] = {
@@ -36,9 +39,13 @@ program_handler: Dict[ToolID, Callable] = {
 class DBPediaStronglinkDataset(Dataset):
 
     is_partitioned = True
+    supports_constant_encoding = True
 
     @classmethod
-    def process_dataset(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def _prepare_partitions(
+        cls, input_dir: Path, output_dir: Path, force: bool, encode_constants: bool
+    ) -> Tuple[List[TranslationTask], Dict[str, ConstantEncoder]]:
+        """Create the partition directories; return the writers of the partitions, one per source, and the encoders."""
         dataset_name = DatasetID.DBPEDIA_STRONGLINK.value
         full_companies_dataset_path = input_dir / "companies_ok.csv"
         control_dataset_path = input_dir / "dbpedia_company_control.csv"
@@ -48,46 +55,101 @@ class DBPediaStronglinkDataset(Dataset):
         normalize_one_https = partial(normalize, nb_https=1)
         normalize_two_https = partial(normalize, nb_https=2)
 
-        for tool in {ToolID.DLVE, ToolID.VADALOG}:
-            dataset_handler = dataset_handlers[tool]
+        tools = [ToolID.DLVE, ToolID.VADALOG]
+        for tool in tools:
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
             remove_dir_or_fail(tool_output_dataset_dir, force)
             tool_output_dataset_dir.mkdir(parents=True, exist_ok=True)
-
-            # copy companies
-            for size in SIZES:
-                normalized_partition_name = get_normalized_integer(size, dataset_max_digits)
+            tool_dictionaries_dir = output_dataset_dir / tool.value / DICTIONARIES_SUBDIR_NAME
+            remove_dir_or_fail(tool_dictionaries_dir, force)
+            if encode_constants:
+                tool_dictionaries_dir.mkdir(parents=True)
+
+        company_sinks: List[PartitionSink] = []
+        controls_sinks: List[PartitionSink] = []
+        encoders: Dict[str, ConstantEncoder] = {}
+        for size in SIZES:
+            normalized_partition_name = get_normalized_integer(size, dataset_max_digits)
+            # the same IDs for all the predicates of the partition, and for all the tools
+            encoder = encoders[normalized_partition_name] = ConstantEncoder() if encode_constants else None
+            for tool in tools:
                 tool_output_partition_dir = (
-                        tool_output_dataset_dir / normalized_partition_name
+                        output_dataset_dir / tool.value / DATA_SUBDIR_NAME / normalized_partition_name
                 )
                 tool_output_partition_dir.mkdir()
-
-                output_dataset_file = tool_output_partition_dir / "company.data"
-                dataset_handler(
+                row_formatter = row_formatters[tool]
+                company_sinks.append(PartitionSink(
+                    tool_output_partition_dir / "company.data", size, row_formatter("company"), encoder
+                ))
+                controls_sinks.append(PartitionSink(
+                    tool_output_partition_dir / "controls.data", size, row_formatter("controls"), encoder
+                ))
+
+        # each source is read once, for all the partitions of all the tools
+        tasks = [
+            TranslationTask(
+                full_companies_dataset_path.stem,
+                partial(
+                    write_prefix_partitions,
                     full_companies_dataset_path,
-                    output_dataset_file,
-                    predicate_name="company",
-                    row_processor=normalize_one_https,
+                    company_sinks,
+                    normalize_one_https,
                     skip_lines=3,
-                    size=size,
-                )
+                ),
+                (full_companies_dataset_path,),
+            ),
+            TranslationTask(
+                control_dataset_path.stem,
+                partial(
+                    write_prefix_partitions, control_dataset_path, controls_sinks, normalize_two_https, skip_lines=1
+                ),
+                (control_dataset_path,),
+            ),
+        ]
+        return tasks, encoders
 
-                # copy companies_control
-                dataset_handler(
-                    control_dataset_path,
-                    tool_output_partition_dir / "controls.data",
-                    predicate_name="controls",
-                    row_processor=normalize_two_https,
-                    skip_lines=1,
-                    size=size,
-                )
+    @classmethod
+    def get_dataset_tasks(
+        cls, input_dir: Path, output_dir: Path, force: bool = True, encode_constants: bool = False
+    ) -> List[TranslationTask]:
+        tasks, encoders = cls._prepare_partitions(input_dir, output_dir, force, encode_constants)
+        if not encode_constants:
+            return tasks
+        # the IDs of the constants depend on the order of the sources: a single task
+        return [
+            TranslationTask(
+                "all",
+                partial(cls._write_encoded_partitions, tasks, encoders, output_dir),
+                tuple(source for task in tasks for source in task.sources),
+            )
+        ]
+
+    @classmethod
+    def _write_encoded_partitions(
+        cls, tasks: List[TranslationTask], encoders: Dict[str, ConstantEncoder], output_dir: Path
+    ):
+        for task in tasks:
+            task.function()
+        output_dataset_dir = output_dir / DatasetID.DBPEDIA_STRONGLINK.value
+        for normalized_partition_name, encoder in encoders.items():
+            for tool in [ToolID.DLVE, ToolID.VADALOG]:
+                tool_dictionaries_dir = output_dataset_dir / tool.value / DICTIONARIES_SUBDIR_NAME
+                encoder.save(tool_dictionaries_dir / f"{normalized_partition_name}.tsv")
+
+    @classmethod
+    def get_program_tasks(
+        cls, original_program_path: Path, output_dir: Path, force: bool = True
+    ) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / DatasetID.DBPEDIA_STRONGLINK.value, force)
+        return [
+            TranslationTask(
+                "all", partial(cls._write_programs, original_program_path, output_program_dirs), (original_program_path,)
+            )
+        ]
 
     @classmethod
-    def process_program(cls, original_program_path: Path, output_dir: Path, force: bool = True):
-        for tool in ToolID:
-            output_program_dir = output_dir / DatasetID.DBPEDIA_STRONGLINK.value / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(output_program_dir, force)
-            output_program_dir.mkdir(parents=True, exist_ok=True)
+    def _write_programs(cls, original_program_path: Path, output_program_dirs: Dict[ToolID, Path]):
+        for tool, output_program_dir in output_program_dirs.items():
             output_file = output_program_dir / DEFAULT_QUERY_FILENAME
             output_content = program_handler[tool](original_program_path.read_text())
             output_file.write_text(output_content)
@@ -1,9 +1,11 @@
 import re
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Callable
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR, CHASEBENCH_SCENARIOS
-from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME, DatasetID
+from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, prepare_program_dirs, DatasetID
+from benchmark.datasets.tasks import TranslationTask
 from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
     from_str_to_int_with_label, get_normalized_integer, process_program_for_vadalog, process_program_for_dlve, \
     process_program_for_vadalog_with_original_query
@@ -48,10 +50,11 @@ class DoctorsDataset(Dataset):
     is_partitioned = True
 
     @classmethod
-    def process_dataset(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def get_dataset_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
         dataset_name = input_dir.name
         output_dataset_dir = output_dir / dataset_name
 
+        tasks = []
         for tool in {ToolID.DLVE, ToolID.VADALOG}:
             dataset_handler = dataset_handlers[tool]
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
@@ -76,19 +79,27 @@ class DoctorsDataset(Dataset):
                     output_dataset_file = output_dataset_subdir / (
                             dataset_file.stem + ".data"
                     )
-                    dataset_handler(
-                        dataset_file,
-                        output_dataset_file,
-                        header=None,
-                        predicate_name=dataset_file.stem,
-                    )
+                    tasks.append(TranslationTask(
+                        f"{tool.value}/{normalized_partition_name}/{dataset_file.stem}",
+                        partial(
+                            dataset_handler,
+                            dataset_file,
+                            output_dataset_file,
+                            header=None,
+                            predicate_name=dataset_file.stem,
+                        ),
+                        (dataset_file,),
+                    ))
+        return tasks
+
+    @classmethod
+    def get_program_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / input_dir.name, force)
+        return [TranslationTask("all", partial(cls._write_programs, input_dir, output_program_dirs), (input_dir,))]
 
     @classmethod
-    def process_program(cls, input_dir: Path, output_dir: Path, force: bool = True):
-        for tool in ToolID:
-            current_output_dir = output_dir / input_dir.name / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(current_output_dir, force)
-            current_output_dir.mkdir(parents=True, exist_ok=True)
+    def _write_programs(cls, input_dir: Path, output_program_dirs: Dict[ToolID, Path]):
+        for tool, current_output_dir in output_program_dirs.items():
             # we consider only one partition since they are equivalent
             for program in sorted(input_dir.glob(f"program_10kq*.vada")):
                 query_name = re.search("q[0-9]+", program.name).group(0)
@@ -1,9 +1,11 @@
 import re
+from functools import partial
 from pathlib import Path
-from typing import Dict, Callable
+from typing import Dict, Callable, List
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR
-from benchmark.datasets.core import Dataset, DatasetID, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME
+from benchmark.datasets.core import Dataset, DatasetID, DATA_SUBDIR_NAME, prepare_program_dirs
+from benchmark.datasets.tasks import TranslationTask
 from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
     get_normalized_integer, process_program_for_vadalog, process_program_for_dlve, \
     process_program_for_vadalog_set_query
@@ -42,30 +44,45 @@ class HasAncestorDataset(Dataset):
     is_program_partitioned = True
 
     @classmethod
-    def process_dataset(cls, input_path: Path, output_dir: Path, force: bool = True):
+    def get_dataset_tasks(cls, input_path: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
         dataset_name = DatasetID.HAS_ANCESTOR.value
         person_dataset_path = input_path
         output_dataset_dir = output_dir / dataset_name
 
+        tasks = []
         for tool in ToolID:
             dataset_handler = dataset_handlers[tool]
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
             remove_dir_or_fail(tool_output_dataset_dir, force)
             tool_output_dataset_dir.mkdir(parents=True, exist_ok=True)
             output_dataset_file = tool_output_dataset_dir / "person.data"
-            dataset_handler(
-                person_dataset_path,
-                output_dataset_file,
-                predicate_name="person",
+            tasks.append(TranslationTask(
+                tool.value,
+                partial(
+                    dataset_handler,
+                    person_dataset_path,
+                    output_dataset_file,
+                    predicate_name="person",
+                ),
+                (person_dataset_path,),
+            ))
+        return tasks
+
+    @classmethod
+    def get_program_tasks(
+        cls, original_program_path: Path, output_dir: Path, force: bool = True
+    ) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / DatasetID.HAS_ANCESTOR.value, force)
+        return [
+            TranslationTask(
+                "all", partial(cls._write_programs, original_program_path, output_program_dirs), (original_program_path,)
             )
+        ]
 
     @classmethod
-    def process_program(cls, original_program_path: Path, output_dir: Path, force: bool = True):
+    def _write_programs(cls, original_program_path: Path, output_program_dirs: Dict[ToolID, Path]):
         max_digits = len(str(MAX_NB_ANCESTORS))
-        for tool in ToolID:
-            output_program_dir = output_dir / DatasetID.HAS_ANCESTOR.value / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(output_program_dir, force)
-            output_program_dir.mkdir(parents=True, exist_ok=True)
+        for tool, output_program_dir in output_program_dirs.items():
             for size in range(2, MAX_NB_ANCESTORS + 1):
                 query_name = "q" + get_normalized_integer(size, max_digits)
                 original_program = original_program_path.read_text()
@@ -1,11 +1,11 @@
 import re
 from functools import partial
-from multiprocessing import Pool
 from pathlib import Path
 from typing import List, Dict, Callable
 
 from benchmark import ROOT_DIR, ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR, CHASEBENCH_SCENARIOS
-from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME, DatasetID
+from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, prepare_program_dirs, DatasetID
+from benchmark.datasets.tasks import TranslationTask
 from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
     from_str_to_int_with_label, get_normalized_integer, process_program_for_vadalog, process_program_for_dlve, \
     process_program_for_vadalog_with_original_query, process_program_for_vadalog_set_query
@@ -59,10 +59,11 @@ class LUBMDataset(Dataset):
     is_partitioned = True
 
     @classmethod
-    def process_dataset(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def get_dataset_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
         dataset_name = input_dir.name
         output_dataset_dir = output_dir / dataset_name
 
+        tasks = []
         for tool in [ToolID.DLVE, ToolID.VADALOG]:
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
             # get max digits number
@@ -80,20 +81,28 @@ class LUBMDataset(Dataset):
                 output_dataset_subdir = tool_output_dataset_dir / normalized_partition_name
                 remove_dir_or_fail(output_dataset_subdir, force)
                 output_dataset_subdir.mkdir(parents=True, exist_ok=True)
-                job_i = partial(job, output_dataset_subdir, tool)
-                with Pool() as pool:
-                    pool.map(job_i, subdir.iterdir())
+                tasks.extend(
+                    TranslationTask(
+                        f"{tool.value}/{normalized_partition_name}/{dataset_file.stem}",
+                        partial(job, output_dataset_subdir, tool, dataset_file),
+                        (dataset_file,),
+                    )
+                    for dataset_file in subdir.iterdir()
+                )
+        return tasks
+
+    @classmethod
+    def get_program_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / input_dir.name, force)
+        return [TranslationTask("all", partial(cls._write_programs, input_dir, output_program_dirs), (input_dir,))]
 
     @classmethod
-    def process_program(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def _write_programs(cls, input_dir: Path, output_program_dirs: Dict[ToolID, Path]):
         program = input_dir / "program_01k.vada"
         input_content = program.read_text()
         query_names = re.findall('@output\("(q[0-9]+)"\).', input_content)
         input_content = re.sub("%?@.*", "", input_content)
-        for tool in ToolID:
-            current_output_dir = output_dir / input_dir.name / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(current_output_dir, force)
-            current_output_dir.mkdir(parents=True, exist_ok=True)
+        for tool, current_output_dir in output_program_dirs.items():
             for query_name in query_names:
                 output_content = input_content + "\n" + f'@output("{query_name}").'
                 output_content = program_handler[tool](output_content, query_name)
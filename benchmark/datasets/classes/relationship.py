@@ -1,11 +1,19 @@
 from functools import partial
 from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Callable, Set
+from typing import List, Dict, Callable, Optional, Set
+
+try:
+    import pyarrow.compute as pc
+except ImportError:
+    # the vectorised translators are optional
+    pc = None
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR
 from benchmark.datasets.core import Dataset, DatasetID, DATA_SUBDIR_NAME
-from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header
+from benchmark.datasets.tasks import TranslationTask
+from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
+    register_block_row_processor
 from benchmark.tools import ToolID
 from benchmark.utils.base import remove_dir_or_fail
 
@@ -31,32 +39,58 @@ def project_row(csv_line: str, indexes: Set[int]) -> str:
     ) + "\n"
 
 
+def _project_row_block(rows: "pa.Array", indexes: Set[int]) -> Optional["pa.Array"]:
+    indexes = sorted(index for index in set(indexes) if index >= 0)
+    if not indexes or len(rows) == 0:
+        return None
+    fields = pc.split_pattern(rows, ",")
+    if pc.min(pc.list_value_length(fields)).as_py() <= indexes[-1]:
+        # some rows have fewer fields: let them be projected one by one
+        return None
+    projected = pc.binary_join_element_wise(*(pc.list_element(fields, index) for index in indexes), ",")
+    return pc.binary_join_element_wise(projected, "\n", "")
+
+
+register_block_row_processor(project_row, _project_row_block)
+
+
 class RelationshipDataset(Dataset):
     # TODO add programs
 
     is_partitioned = False
 
     @classmethod
-    def process_dataset(cls, original_dataset_path: Path, output_dir: Path, force: bool = True):
+    def get_dataset_tasks(
+        cls, original_dataset_path: Path, output_dir: Path, force: bool = True
+    ) -> List[TranslationTask]:
         dataset_name = DatasetID.RELATIONSHIP.value
         output_dataset_dir = output_dir / dataset_name
 
         indexes = [0, 1, 3]
 
+        tasks = []
         for tool in [ToolID.DLVE, ToolID.VADALOG]:
             dataset_handler = dataset_handlers[tool]
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
             remove_dir_or_fail(tool_output_dataset_dir, force)
             tool_output_dataset_dir.mkdir(parents=True, exist_ok=True)
             output_dataset_file = tool_output_dataset_dir / (dataset_name + ".data")
-            dataset_handler(
-                original_dataset_path,
-                output_dataset_file,
-                header=None,
-                predicate_name="own",
-                row_processor=partial(project_row, indexes=indexes),
-            )
+            tasks.append(TranslationTask(
+                tool.value,
+                partial(
+                    dataset_handler,
+                    original_dataset_path,
+                    output_dataset_file,
+                    header=None,
+                    predicate_name="own",
+                    row_processor=partial(project_row, indexes=indexes),
+                ),
+                (original_dataset_path,),
+            ))
+        return tasks
 
     @classmethod
-    def process_program(cls, original_program_path: Path, output_path: Path, force: bool = True):
-        pass
+    def get_program_tasks(
+        cls, original_program_path: Path, output_path: Path, force: bool = True
+    ) -> List[TranslationTask]:
+        return []
@@ -1,11 +1,11 @@
 import re
 from functools import partial
-from multiprocessing import Pool
 from pathlib import Path
 from typing import List, Dict, Callable
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR, CHASEBENCH_SCENARIOS
-from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME
+from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, prepare_program_dirs
+from benchmark.datasets.tasks import TranslationTask
 from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file_with_header, \
     process_program_for_vadalog, process_program_for_dlve, process_program_for_vadalog_with_original_query
 from benchmark.tools import ToolID
@@ -50,25 +50,34 @@ class STB128Dataset(Dataset):
     _IGNORE_QUERIES = {"q01", "q02", "q04", "q05"}
 
     @classmethod
-    def process_dataset(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def get_dataset_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
         dataset_name = input_dir.name
         output_dataset_dir = output_dir / dataset_name
 
+        tasks = []
         for tool in [ToolID.DLVE, ToolID.VADALOG]:
             dataset_handler = dataset_handlers[tool]
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
             remove_dir_or_fail(tool_output_dataset_dir, force)
             tool_output_dataset_dir.mkdir(parents=True, exist_ok=True)
-            job_i = partial(job, tool_output_dataset_dir, dataset_handler)
-            with Pool() as pool:
-                pool.map(job_i, input_dir.iterdir())
+            tasks.extend(
+                TranslationTask(
+                    f"{tool.value}/{dataset_file.stem}",
+                    partial(job, tool_output_dataset_dir, dataset_handler, dataset_file),
+                    (dataset_file,),
+                )
+                for dataset_file in input_dir.iterdir()
+            )
+        return tasks
 
     @classmethod
-    def process_program(cls, input_dir: Path, output_dir: Path, force: bool = True):
-        for tool in ToolID:
-            current_output_dir = output_dir / input_dir.name / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(current_output_dir, force)
-            current_output_dir.mkdir(parents=True, exist_ok=True)
+    def get_program_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / input_dir.name, force)
+        return [TranslationTask("all", partial(cls._write_programs, input_dir, output_program_dirs), (input_dir,))]
+
+    @classmethod
+    def _write_programs(cls, input_dir: Path, output_program_dirs: Dict[ToolID, Path]):
+        for tool, current_output_dir in output_program_dirs.items():
             for program_file in sorted(input_dir.glob(f"program_q*.vada")):
                 query_name = re.search("q[0-9]+", program_file.name).group(0)
                 if query_name in cls._IGNORE_QUERIES:
@@ -1,10 +1,12 @@
 import re
 from abc import ABC
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Callable
 
 from benchmark import ORIGINAL_DATASETS_DIR, ORIGINAL_PROGRAMS_DIR
-from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, QUERIES_SUBDIR_NAME, DEFAULT_QUERY_FILENAME, DatasetID
+from benchmark.datasets.core import Dataset, DATA_SUBDIR_NAME, DEFAULT_QUERY_FILENAME, DatasetID, prepare_program_dirs
+from benchmark.datasets.tasks import TranslationTask
 from benchmark.datasets.translate import write_lines_for_vadalog, transform_dataset_file, process_program_for_vadalog
 from benchmark.tools import ToolID
 from benchmark.utils.base import remove_dir_or_fail
@@ -89,11 +91,12 @@ class SynthDataset(Dataset, ABC):
         return dataset_id.value
 
     @classmethod
-    def process_dataset(cls, input_dir: Path, output_dir: Path, force: bool = True):
+    def get_dataset_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
         input_dataset_dir = SYNTH_DATASET_DIR / cls._synth_dataset_name
         edb_dataset_dir = input_dataset_dir / EDB_DATASET_DIRNAME
         output_dataset_dir = output_dir / cls._get_datset_id()
 
+        tasks = []
         for tool in [ToolID.DLVE, ToolID.VADALOG]:
             dataset_handler = dataset_handlers[tool]
             tool_output_dataset_dir = output_dataset_dir / tool.value / DATA_SUBDIR_NAME
@@ -102,18 +105,26 @@ class SynthDataset(Dataset, ABC):
             for edb_dataset_path in edb_dataset_dir.iterdir():
                 new_filename = edb_dataset_path.stem.replace("_csv", "")
                 output_dataset_file = tool_output_dataset_dir / (new_filename + ".data")
-                dataset_handler(
-                    edb_dataset_path,
-                    output_dataset_file,
-                    predicate_name=new_filename,
-                )
+                tasks.append(TranslationTask(
+                    f"{tool.value}/{new_filename}",
+                    partial(
+                        dataset_handler,
+                        edb_dataset_path,
+                        output_dataset_file,
+                        predicate_name=new_filename,
+                    ),
+                    (edb_dataset_path,),
+                ))
+        return tasks
 
     @classmethod
-    def process_program(cls, input_dir: Path, output_dir: Path, force: bool = True):
-        for tool in ToolID:
-            output_program_dir = output_dir / cls._get_datset_id() / tool.value / QUERIES_SUBDIR_NAME
-            remove_dir_or_fail(output_program_dir, force)
-            output_program_dir.mkdir(parents=True, exist_ok=True)
+    def get_program_tasks(cls, input_dir: Path, output_dir: Path, force: bool = True) -> List[TranslationTask]:
+        output_program_dirs = prepare_program_dirs(output_dir / cls._get_datset_id(), force)
+        return [TranslationTask("all", partial(cls._write_programs, input_dir, output_program_dirs), (input_dir,))]
+
+    @classmethod
+    def _write_programs(cls, input_dir: Path, output_program_dirs: Dict[ToolID, Path]):
+        for tool, output_program_dir in output_program_dirs.items():
             output_file = output_program_dir / DEFAULT_QUERY_FILENAME
             output_content = program_handler[tool](input_dir.read_text())
             output_file.write_text(output_content)
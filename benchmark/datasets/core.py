@@ -5,13 +5,17 @@ from pathlib import Path
 from typing import List, Optional, Dict
 
 from benchmark import DATASETS_DIR
+from benchmark.datasets.tasks import TranslationTask, run_all_tasks
 from benchmark.registry import ItemRegistry
 from benchmark.tools import ToolID
+from benchmark.utils.base import remove_dir_or_fail
 
 SHUTDOWN_TIMEOUT = 20.0
 
 DATA_SUBDIR_NAME = "data"
 QUERIES_SUBDIR_NAME = "queries"
+# the dictionaries of the encoded constants, one per partition, next to the data dir
+DICTIONARIES_SUBDIR_NAME = "dictionaries"
 DEFAULT_QUERY_FILENAME = "program.txt"
 
 
@@ -37,11 +41,24 @@ class DatasetID(Enum):
 ALL_DATASET_IDS = tuple(map(attrgetter("value"), DatasetID))
 
 
+def prepare_program_dirs(output_dataset_dir: Path, force: bool) -> Dict[ToolID, Path]:
+    """Remove and create the directories of the programs of all the tools; return them by tool."""
+    output_program_dirs = {}
+    for tool in ToolID:
+        output_program_dir = output_dataset_dir / tool.value / QUERIES_SUBDIR_NAME
+        remove_dir_or_fail(output_program_dir, force)
+        output_program_dir.mkdir(parents=True, exist_ok=True)
+        output_program_dirs[tool] = output_program_dir
+    return output_program_dirs
+
+
 class Dataset(ABC):
     """Base class for datasets."""
 
     is_partitioned: bool
     is_program_partitioned: bool = False
+    # whether process_dataset accepts encode_constants, to replace the constants with short IDs
+    supports_constant_encoding: bool = False
 
     def __init__(self, dataset_id: DatasetID, path: Optional[Path] = None) -> None:
         self.__dataset_id = dataset_id
@@ -87,23 +104,42 @@ class Dataset(ABC):
 
     @classmethod
     @abstractmethod
-    def process_dataset(cls, original_dataset_path: Path, output_path: Path, force: bool = True):
+    def get_dataset_tasks(
+        cls, original_dataset_path: Path, output_path: Path, force: bool = True, **kwargs
+    ) -> List[TranslationTask]:
+        """
+        Prepare the output directories, and return the translations of the dataset as independent tasks.
+
+        The directories are removed and created by the calling process, so that the tasks only write files, and can run
+        in a pool of processes. If force=False, a prompt is shown to the user whether the output path should be deleted.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def process_dataset(cls, original_dataset_path: Path, output_path: Path, force: bool = True, **kwargs):
         """
         Process a dataset in its original format.
 
         If force=False, a prompt is shown to the user whether the output path should be deleted.
         """
-        raise NotImplementedError
+        run_all_tasks(cls.get_dataset_tasks(original_dataset_path, output_path, force, **kwargs))
 
     @classmethod
     @abstractmethod
+    def get_program_tasks(
+        cls, original_program_path: Path, output_path: Path, force: bool = True
+    ) -> List[TranslationTask]:
+        """Prepare the output directories, and return the translations of the programs as tasks (see get_dataset_tasks)."""
+        raise NotImplementedError
+
+    @classmethod
     def process_program(cls, original_program_path: Path, output_path: Path, force: bool = True):
         """
         Process a program in its original format.
 
         If force=False, a prompt is shown to the user whether the output path should be deleted.
         """
-        raise NotImplementedError
+        run_all_tasks(cls.get_program_tasks(original_program_path, output_path, force))
 
     @classmethod
     def get_run_config(cls, tool_id: ToolID, dataset_path: Path) -> Dict:
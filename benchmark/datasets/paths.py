@@ -1,6 +1,7 @@
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
+from benchmark import CHASEBENCH_SCENARIOS
 from benchmark.datasets import DatasetID
 from benchmark.datasets.classes.company_control import COMPANY_CONTROL_DATASET, COMPANY_CONTROL_PROGRAM
 from benchmark.datasets.classes.dbpedia_psc import DBPEDIA_DATASET_DIR, DBPEDIA_PSC_PROGRAM
@@ -58,6 +59,15 @@ _program_path_by_dataset_id: Dict[DatasetID, Path] = {
 }
 
 
+# the queries of ChaseBench, read by the program translators of some datasets
+_program_extra_paths_by_dataset_id: Dict[DatasetID, List[Path]] = {
+    DatasetID.DOCTORS: [CHASEBENCH_SCENARIOS / "doctors" / "queries"],
+    DatasetID.DOCTORS_FD: [CHASEBENCH_SCENARIOS / "doctors-fd" / "queries"],
+    DatasetID.ONTOLOGY_256: [CHASEBENCH_SCENARIOS / "Ontology-256" / "queries"],
+    DatasetID.STB_128: [CHASEBENCH_SCENARIOS / "STB-128" / "queries"],
+}
+
+
 def get_dataset_original_path(dataset_id: DatasetID):
     return _dataset_path_by_dataset_id[dataset_id]
 
@@ -65,3 +75,6 @@ def get_dataset_original_path(dataset_id: DatasetID):
 def get_program_original_path(dataset_id: DatasetID):
     return _program_path_by_dataset_id[dataset_id]
 
+
+def get_program_extra_paths(dataset_id: DatasetID) -> List[Path]:
+    return _program_extra_paths_by_dataset_id.get(dataset_id, [])
@@ -0,0 +1,102 @@
+"""The translations of the datasets, as independent tasks run by a single pool of processes."""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class TranslationTask:
+    """A translation: a picklable function without arguments, and the source files it reads."""
+
+    name: str
+    function: Callable[[], Any]
+    sources: Tuple[Path, ...] = ()
+
+
+@dataclass(frozen=True)
+class TaskTiming:
+    name: str
+    elapsed: float
+    error: Optional[str] = None
+
+
+def get_cost(task: TranslationTask) -> int:
+    """The size, in bytes, of the sources of a task."""
+    cost = 0
+    for source in task.sources:
+        if source.is_file():
+            cost += source.stat().st_size
+        elif source.is_dir():
+            cost += sum(
+                (Path(root) / file_name).stat().st_size
+                for root, _, file_names in os.walk(source, followlinks=True) for file_name in file_names
+            )
+    return cost
+
+
+def group_by_sources(tasks: Iterable[TranslationTask]) -> List[List[TranslationTask]]:
+    """
+    Group the tasks reading the same sources (e.g. the DBPedia scenarios), so that they run one after another in the
+    same process, while the sources are in the page cache.
+    """
+    groups: Dict[Tuple, List[TranslationTask]] = {}
+    for task in tasks:
+        groups.setdefault(task.sources or (task.name,), []).append(task)
+    return list(groups.values())
+
+
+def _run_group(tasks: Sequence[TranslationTask]) -> List[TaskTiming]:
+    timings = []
+    for task in tasks:
+        start = time.perf_counter()
+        error = None
+        try:
+            task.function()
+        except Exception as e:
+            logging.exception(f"Task {task.name} failed")
+            error = f"{type(e).__name__}: {e}"
+        timings.append(TaskTiming(task.name, time.perf_counter() - start, error))
+    return timings
+
+
+def run_tasks(
+    tasks: Iterable[TranslationTask],
+    nb_workers: Optional[int] = None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> Iterator[TaskTiming]:
+    """
+    Run the tasks in a pool of nb_workers processes, the groups with the largest sources first, so that the small
+    tasks fill the gaps behind the large ones; yield their timings as they finish.
+    """
+    groups = sorted(group_by_sources(tasks), key=lambda group: sum(map(get_cost, group)), reverse=True)
+    if not groups:
+        return
+    with ProcessPoolExecutor(max_workers=nb_workers, initializer=initializer, initargs=initargs) as executor:
+        futures = [executor.submit(_run_group, group) for group in groups]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def run_all_tasks(tasks: Iterable[TranslationTask], nb_workers: Optional[int] = None) -> None:
+    """Run the tasks (see run_tasks); raise RuntimeError if any of them failed."""
+    errors = [f"{timing.name}: {timing.error}" for timing in run_tasks(tasks, nb_workers) if timing.error is not None]
+    if errors:
+        raise RuntimeError(f"{len(errors)} tasks failed: {'; '.join(errors)}")
+
+
+def format_timings(timings: Sequence[TaskTiming], wall_clock_time: float) -> str:
+    """A report of the timings of the tasks, the longest first."""
+    total = sum(timing.elapsed for timing in timings)
+    lines = [
+        f"{len(timings)} tasks in {wall_clock_time:.2f} s (wall clock), {total:.2f} s of task time",
+        f"{'seconds':>10}  task",
+    ]
+    for timing in sorted(timings, key=lambda timing: timing.elapsed, reverse=True):
+        status = "" if timing.error is None else f"  FAILED ({timing.error})"
+        lines.append(f"{timing.elapsed:>10.2f}  {timing.name}{status}")
+    return "\n".join(lines)
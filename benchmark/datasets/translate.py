@@ -1,10 +1,36 @@
 import itertools
+import locale
+import logging
+import mmap
+import os
+import pickle
 import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    # the vectorised translators are optional
+    pa = None
+    pc = None
 
+# rows per write
 DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_BUFFER_SIZE = 1 << 20
+# smaller files are translated by a single process
+PARALLEL_MIN_SIZE = 16 << 20
+# byte ranges per worker process, to balance the load
+RANGES_PER_WORKER = 4
+
+_default_nb_workers = 1
 
 
 def max_digits(dataset_partition_filenames):
@@ -52,43 +78,264 @@ def quote_csv_file(input_content: str) -> str:
     return "\n".join(map(quote_csv_line, input_content.splitlines(keepends=False)))
 
 
-def transform_dataset_file(input_file: Path, output_file: Path, predicate_name: str):
-    lines = input_file.read_text().splitlines(keepends=False)
-    atoms = map(lambda line: f"{predicate_name}(" + quote_csv_line(line) + ").", lines)
-    output_file.write_text("\n".join(atoms))
-
-
 def normalize_name(file_name: str, min_digits: int):
     dataset_name, nb_rows = Path(file_name).stem.split("_")
     new_nb_rows = (min_digits - len(nb_rows)) * "0" + nb_rows
     return f"{dataset_name}_{new_nb_rows}"
 
 
+def _identity(line: str) -> str:
+    return line
+
+
+def set_default_nb_workers(nb_workers: int) -> None:
+    """Set the number of worker processes of the translators, when they are not given one."""
+    global _default_nb_workers
+    _default_nb_workers = nb_workers
+
+
+def _translate_chunks(
+    input_rows: Iterable[str],
+    output_file_object: TextIO,
+    translate_row: Callable[[str], str],
+    chunk_size: int,
+    vectorised: Optional[bool] = None,
+) -> Tuple[int, int]:
+    """
+    Translate rows in chunks of chunk_size rows (one write per chunk); return the numbers of rows and of lines.
+
+    The chunks are translated by the vectorised equivalent of translate_row, if any (see get_block_translator).
+    """
+    translate_block = get_block_translator(translate_row, vectorised)
+    nb_read = 0
+    nb_written = 0
+    data = ""
+    while True:
+        chunk = list(itertools.islice(input_rows, chunk_size))
+        if not chunk:
+            break
+        nb_read += len(chunk)
+        data = _translate_block_or_rows(chunk, translate_block, translate_row)
+        output_file_object.write(data)
+        nb_written += data.count("\n")
+    if data and not data.endswith("\n"):
+        # the last row of the input might not end with a newline
+        nb_written += 1
+    return nb_read, nb_written
+
+
+def _find_line_offset(content: mmap.mmap, start: int, nb_lines: Optional[int]) -> Tuple[int, int]:
+    """
+    Return the offset after the first nb_lines lines from start (all of them if None), and their number.
+
+    The last line of the content might not end with a newline.
+    """
+    if nb_lines == 0:
+        return start, 0
+    end = len(content)
+    position = start
+    nb_found = 0
+    while position < end and (nb_lines is None or nb_found < nb_lines):
+        block_end = min(position + DEFAULT_BUFFER_SIZE, end)
+        block = content[position:block_end]
+        nb_newlines = block.count(b"\n")
+        if nb_lines is not None and nb_found + nb_newlines >= nb_lines:
+            index = -1
+            for _ in range(nb_lines - nb_found):
+                index = block.find(b"\n", index + 1)
+            return position + index + 1, nb_lines
+        nb_found += nb_newlines
+        position = block_end
+    if end > start and content[end - 1:end] != b"\n":
+        nb_found += 1
+    return end, nb_found
+
+
+def _split_range(content: mmap.mmap, start: int, end: int, nb_ranges: int) -> List[Tuple[int, int]]:
+    """Split [start, end) into at most nb_ranges ranges of about the same size, each ending after a newline."""
+    boundaries = [start]
+    for i in range(1, nb_ranges):
+        newline = content.find(b"\n", max(start + (end - start) * i // nb_ranges, boundaries[-1]), end)
+        if newline == -1:
+            break
+        if newline + 1 > boundaries[-1]:
+            boundaries.append(newline + 1)
+    if boundaries[-1] < end:
+        boundaries.append(end)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _iter_range_rows(content: mmap.mmap, start: int, end: int) -> Iterator[str]:
+    """
+    Iterate the lines of the bytes [start, end) of the content, read one at a time from the mapping; the range must
+    end after a newline or at the end of the content.
+
+    The lines are decoded as input_file.open() does: with the locale encoding, and with \\r\\n read as \\n.
+    """
+    encoding = locale.getpreferredencoding(False)
+    content.seek(start)
+    while content.tell() < end:
+        line = content.readline().decode(encoding)
+        yield line[:-2] + "\n" if line.endswith("\r\n") else line
+
+
+def _translate_range(
+    input_file: Path,
+    start: int,
+    end: int,
+    translate_row: Callable[[str], str],
+    shard_file: Path,
+    chunk_size: int,
+    vectorised: Optional[bool] = None,
+) -> Tuple[int, int]:
+    """Translate the rows in the bytes [start, end) of the input file into a shard; run in the worker processes."""
+    with input_file.open(mode="rb") as input_file_object, mmap.mmap(
+        input_file_object.fileno(), 0, access=mmap.ACCESS_READ
+    ) as content, shard_file.open(mode="w", buffering=DEFAULT_BUFFER_SIZE) as shard_file_object:
+        input_rows = _iter_range_rows(content, start, end)
+        return _translate_chunks(input_rows, shard_file_object, translate_row, chunk_size, vectorised)
+
+
+def _translate_rows_parallel(
+    input_file: Path,
+    output_file: Path,
+    translate_row: Callable[[str], str],
+    header: Optional[str],
+    skip_lines: int,
+    size: Optional[int],
+    chunk_size: int,
+    nb_workers: int,
+    vectorised: Optional[bool] = None,
+) -> Optional[Tuple[int, int]]:
+    """
+    Translate the rows of a slice of the input file with nb_workers processes, each translating newline-aligned
+    byte ranges of the slice into a shard; the shards are concatenated in order into the output file.
+
+    Return the numbers of rows and of lines, or None if the slice must be translated sequentially.
+    """
+    try:
+        pickle.dumps(translate_row)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        # e.g. the rows are encoded: the IDs of the constants depend on the order of the rows
+        logging.info(f"{input_file}: the rows cannot be translated in parallel, translating them sequentially")
+        return None
+    if input_file.stat().st_size < PARALLEL_MIN_SIZE:
+        return None
+    with input_file.open(mode="rb") as input_file_object, mmap.mmap(
+        input_file_object.fileno(), 0, access=mmap.ACCESS_READ
+    ) as content:
+        start, _ = _find_line_offset(content, 0, skip_lines)
+        end, nb_rows = _find_line_offset(content, start, size)
+        ranges = _split_range(content, start, end, nb_workers * RANGES_PER_WORKER)
+    with tempfile.TemporaryDirectory(
+        prefix=f".{output_file.name}-", dir=output_file.parent
+    ) as shard_dir, ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        shard_files = [Path(shard_dir) / f"{index}.shard" for index in range(len(ranges))]
+        futures = [
+            executor.submit(
+                _translate_range, input_file, range_start, range_end, translate_row, shard_file, chunk_size, vectorised
+            )
+            for (range_start, range_end), shard_file in zip(ranges, shard_files)
+        ]
+        counts = [future.result() for future in futures]
+        with output_file.open(mode="w", buffering=DEFAULT_BUFFER_SIZE) as output_file_object:
+            if header is not None:
+                output_file_object.write(header + "\n")
+            for shard_file in shard_files:
+                with shard_file.open() as shard_file_object:
+                    shutil.copyfileobj(shard_file_object, output_file_object, DEFAULT_BUFFER_SIZE)
+    nb_read = sum(nb_read for nb_read, _ in counts)
+    if nb_read != nb_rows:
+        raise RuntimeError(f"{input_file}: {nb_read} rows translated, expected {nb_rows}")
+    return nb_read, sum(nb_written for _, nb_written in counts)
+
+
+def _translate_rows(
+    input_file: Path,
+    output_file: Path,
+    translate_row: Callable[[str], str],
+    header: Optional[str] = None,
+    skip_lines: int = 0,
+    size: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    nb_workers: Optional[int] = None,
+    vectorised: Optional[bool] = None,
+) -> int:
+    """
+    Translate the rows of a slice of the input file, writing them in chunks of chunk_size rows (one write per chunk).
+
+    With more than one worker, large files are translated in parallel by _translate_rows_parallel.
+    Return the number of rows; raise RuntimeError if the number of lines written is not the number of rows of the slice.
+    """
+    nb_workers = _default_nb_workers if nb_workers is None else nb_workers
+    counts = None
+    if nb_workers > 1:
+        counts = _translate_rows_parallel(
+            input_file, output_file, translate_row, header, skip_lines, size, chunk_size, nb_workers, vectorised
+        )
+    if counts is None:
+        with input_file.open() as input_file_object, output_file.open(
+            mode="w", buffering=DEFAULT_BUFFER_SIZE
+        ) as output_file_object:
+            if header is not None:
+                output_file_object.write(header + "\n")
+            end_slice = None if size is None else skip_lines + size
+            input_file_rows = itertools.islice(input_file_object, skip_lines, end_slice)
+            counts = _translate_chunks(input_file_rows, output_file_object, translate_row, chunk_size, vectorised)
+    nb_read, nb_written = counts
+    if nb_written != nb_read:
+        raise RuntimeError(f"{output_file}: {nb_written} lines written, expected {nb_read}")
+    if size is not None and nb_read < size:
+        logging.warning(f"{input_file} has only {nb_read} rows after the first {skip_lines}, fewer than {size}")
+    return nb_written
+
+
+def _to_dlve_fact(line: str, predicate_name: str, row_processor: Callable[[str], str]) -> str:
+    return f"{predicate_name}(" + quote_csv_line(row_processor(line)) + ").\n"
+
+
 def transform_dataset_file_with_header(
     input_file: Path,
     output_file: Path,
     header: Optional[str] = None,
     predicate_name: Optional[str] = None,
-    row_processor: Callable = lambda x: x,
+    row_processor: Callable = _identity,
     skip_lines: int = 0,
     size: Optional[int] = None,
-):
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    nb_workers: Optional[int] = None,
+    vectorised: Optional[bool] = None,
+) -> int:
+    """Translate the rows [skip_lines, skip_lines + size) of a CSV file into DLV^E facts; return the number of rows."""
     assert predicate_name is not None
-    with input_file.open() as input_file_object, output_file.open(
-        mode="w"
-    ) as output_file_object:
-        if header is not None:
-            output_file_object.write(header + "\n")
-        end_slice = None if size is None else skip_lines + size
-        input_file_object = itertools.islice(input_file_object, skip_lines, end_slice)
-        atoms = map(
-            lambda line: f"{predicate_name}("
-            + quote_csv_line(row_processor(line))
-            + ").\n",
-            input_file_object,
-        )
-        for chunk in itertools.islice(atoms, DEFAULT_CHUNK_SIZE):
-            output_file_object.writelines(chunk)
+    return _translate_rows(
+        input_file,
+        output_file,
+        partial(_to_dlve_fact, predicate_name=predicate_name, row_processor=row_processor),
+        header,
+        skip_lines,
+        size,
+        chunk_size,
+        nb_workers,
+        vectorised,
+    )
+
+
+def transform_dataset_file(
+    input_file: Path, output_file: Path, predicate_name: str, nb_workers: Optional[int] = None
+) -> int:
+    """
+    Translate all the rows of a CSV file into DLV^E facts; return the number of rows.
+
+    As in the original translator, the facts are separated by newlines, without a newline after the last one.
+    """
+    nb_rows = transform_dataset_file_with_header(
+        input_file, output_file, predicate_name=predicate_name, nb_workers=nb_workers
+    )
+    with output_file.open(mode="rb+") as output_file_object:
+        if nb_rows > 0:
+            output_file_object.truncate(output_file_object.seek(-1, os.SEEK_END))
+    return nb_rows
 
 
 def write_lines_for_vadalog(
@@ -96,20 +343,163 @@ def write_lines_for_vadalog(
     output_file: Path,
     header: Optional[str] = None,
     predicate_name: Optional[str] = None,
-    row_processor: Callable = lambda x: x,
+    row_processor: Callable = _identity,
     skip_lines: int = 0,
     size: Optional[int] = None,
-):
-    with input_file.open() as input_file_object, output_file.open(
-        mode="w"
-    ) as output_file_object:
-        if header is not None:
-            output_file_object.write(header + "\n")
-        end_slice = None if size is None else skip_lines + size
-        input_file_rows = itertools.islice(input_file_object, skip_lines, end_slice)
-        processed_input_file_rows = map(row_processor, input_file_rows)
-        for chunk in itertools.islice(processed_input_file_rows, DEFAULT_CHUNK_SIZE):
-            output_file_object.writelines(chunk)
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    nb_workers: Optional[int] = None,
+    vectorised: Optional[bool] = None,
+) -> int:
+    """Translate the rows [skip_lines, skip_lines + size) of a CSV file into Vadalog CSV rows; return their number."""
+    return _translate_rows(
+        input_file, output_file, row_processor, header, skip_lines, size, chunk_size, nb_workers, vectorised
+    )
+
+
+class ConstantEncoder:
+    """
+    Replace the constants of the rows with short IDs (c0, c1, ...).
+
+    Use the same encoder for all the predicates of a partition, so that the IDs are consistent
+    across them; save its dictionary to decode the answers back.
+    """
+
+    def __init__(self, prefix: str = "c"):
+        self.prefix = prefix
+        self._ids: Dict[str, str] = {}
+
+    def encode(self, constant: str) -> str:
+        encoded = self._ids.get(constant)
+        if encoded is None:
+            encoded = self._ids[constant] = f"{self.prefix}{len(self._ids)}"
+        return encoded
+
+    def encode_row(self, row: str) -> str:
+        """Encode a CSV row (with its end of line), as returned by the row processors."""
+        return ",".join(map(self.encode, row.rstrip("\n").split(","))) + "\n"
+
+    def save(self, output_file: Path) -> None:
+        """Write the dictionary, one 'id<TAB>constant' line per constant."""
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with output_file.open(mode="w") as output_file_object:
+            output_file_object.writelines(f"{encoded}\t{constant}\n" for constant, encoded in self._ids.items())
+
+
+def with_encoder(row_processor: Callable, encoder: Optional[ConstantEncoder]) -> Callable:
+    """Compose a row processor with an encoder, if any."""
+    if encoder is None:
+        return row_processor
+    return lambda line: encoder.encode_row(row_processor(line))
+
+
+@lru_cache(maxsize=None)
+def get_dlve_row_formatter(predicate_name: str) -> Callable[[str], str]:
+    """Format a processed row as a DLV^E fact (the same object for the same predicate)."""
+    return partial(_to_dlve_fact, predicate_name=predicate_name, row_processor=_identity)
+
+
+def get_vadalog_row_formatter(_predicate_name: str) -> Callable[[str], str]:
+    """Vadalog reads the processed rows as they are."""
+    return _identity
+
+
+@dataclass(frozen=True)
+class PartitionSink:
+    """An output file of a partition: the first size rows of a source, formatted by format_row."""
+
+    output_file: Path
+    size: int
+    format_row: Callable[[str], str]
+    encoder: Optional[ConstantEncoder] = None
+
+
+def write_prefix_partitions(
+    input_file: Path,
+    sinks: Sequence[PartitionSink],
+    row_processor: Callable[[str], str],
+    skip_lines: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    vectorised: Optional[bool] = None,
+) -> int:
+    """
+    Write the partitions of a source, each a prefix of the rows after skip_lines, in a single pass.
+
+    Each row is processed once, (encoded and) formatted once per distinct formatter (and encoder), and written
+    to all the sinks whose size covers it. Unless a sink encodes its rows, the chunks are processed and formatted
+    as pyarrow arrays, if possible (see get_block_translator). Return the number of rows read; raise RuntimeError
+    if the number of lines written to a sink is not its number of rows.
+    """
+    max_size = max(sink.size for sink in sinks)
+    block_row_processor = None
+    if vectorised is not False and all(sink.encoder is None for sink in sinks):
+        block_row_processor = get_block_row_processor(row_processor)
+    if vectorised and block_row_processor is None:
+        raise ValueError(f"{row_processor} has no vectorised equivalent, or the rows are encoded")
+    block_translators = {} if block_row_processor is None else {
+        sink.format_row: get_block_translator(sink.format_row) for sink in sinks
+    }
+    nb_read = 0
+    nb_written = [0] * len(sinks)
+    last_data = [""] * len(sinks)
+    with ExitStack() as stack:
+        input_file_object = stack.enter_context(input_file.open())
+        output_file_objects = [
+            stack.enter_context(sink.output_file.open(mode="w", buffering=DEFAULT_BUFFER_SIZE)) for sink in sinks
+        ]
+        input_file_rows = itertools.islice(input_file_object, skip_lines, skip_lines + max_size)
+        while True:
+            chunk = list(itertools.islice(input_file_rows, chunk_size))
+            if not chunk:
+                break
+            processed_block = None
+            if block_row_processor is not None:
+                processed_block = block_row_processor(pa.array(chunk, type=pa.string()))
+            # processed one by one, only if the block translators cannot
+            processed_rows = None
+            # the data of the sinks with the same formatter, encoder and number of rows
+            chunk_data: Dict[tuple, str] = {}
+            for i, (sink, output_file_object) in enumerate(zip(sinks, output_file_objects)):
+                nb_rows = min(len(chunk), sink.size - nb_read)
+                if nb_rows <= 0:
+                    continue
+                key = (sink.format_row, sink.encoder, nb_rows)
+                data = chunk_data.get(key)
+                translate_block = block_translators.get(sink.format_row)
+                if data is None and processed_block is not None and translate_block is not None:
+                    translated = translate_block(processed_block.slice(0, nb_rows))
+                    if translated is not None:
+                        data = chunk_data[key] = _join_block(translated)
+                if data is None:
+                    if processed_rows is None:
+                        processed_rows = list(map(row_processor, chunk))
+                    rows = processed_rows[:nb_rows]
+                    if sink.encoder is not None:
+                        rows = map(sink.encoder.encode_row, rows)
+                    data = chunk_data[key] = "".join(map(sink.format_row, rows))
+                output_file_object.write(data)
+                nb_written[i] += data.count("\n")
+                last_data[i] = data
+            nb_read += len(chunk)
+    for sink, nb_lines, data in zip(sinks, nb_written, last_data):
+        if data and not data.endswith("\n"):
+            # the last row of the input might not end with a newline
+            nb_lines += 1
+        if nb_lines != min(sink.size, nb_read):
+            raise RuntimeError(f"{sink.output_file}: {nb_lines} lines written, expected {min(sink.size, nb_read)}")
+    if nb_read < max_size:
+        logging.warning(f"{input_file} has only {nb_read} rows after the first {skip_lines}, fewer than {max_size}")
+    return nb_read
+
+
+def load_constant_dictionary(dictionary_file: Path) -> Dict[str, str]:
+    """Load a dictionary saved by ConstantEncoder, from the IDs to the constants."""
+    with dictionary_file.open() as dictionary_file_object:
+        return dict(line.rstrip("\n").split("\t", maxsplit=1) for line in dictionary_file_object)
+
+
+def decode_constants(text: str, dictionary: Dict[str, str], prefix: str = "c") -> str:
+    """Replace the IDs in a text (e.g. the answers of an engine) with their constants."""
+    return re.sub(rf"\b{re.escape(prefix)}\d+\b", lambda match: dictionary.get(match.group(0), match.group(0)), text)
 
 
 def normalize(line: str, nb_https: int = 2):
@@ -129,6 +519,133 @@ def normalize_person_dataset_row(line: str):
     return new_line.replace(",", "_") + "\n"
 
 
+# the characters removed by str.strip(): the whitespace of Unicode, all below U+3001
+_WHITESPACE = "".join(filter(str.isspace, map(chr, range(0x3001))))
+
+
+def _strip_block(rows: "pa.Array") -> "pa.Array":
+    return pc.utf8_trim(rows, characters=_WHITESPACE)
+
+
+def _extract_groups_block(rows: "pa.Array", pattern: str, nb_groups: int) -> Optional["pa.Array"]:
+    """Search a pattern in the rows; replace the commas of its groups (g0, g1, ...) with '_', and join them with ','."""
+    extracted = pc.extract_regex(rows, pattern)
+    if extracted.null_count:
+        # some rows do not match: let them be processed (and fail) one by one
+        return None
+    groups = [pc.replace_substring(extracted.field(i), ",", "_") for i in range(nb_groups)]
+    return pc.binary_join_element_wise(*groups, ",")
+
+
+def _normalize_block(rows: "pa.Array", nb_https: int = 2) -> Optional["pa.Array"]:
+    assert nb_https > 0
+    stripped = _strip_block(rows)
+    # the rows of nb_https URIs without commas are already normalized: search the pattern only in the others
+    is_other = pc.invert(pc.match_substring_regex(stripped, "^" + ",".join(["http[^,]*"] * nb_https) + "$"))
+    normalized = stripped
+    if pc.any(is_other).as_py():
+        pattern = ",".join(f"(?P<g{i}>http.*)" for i in range(nb_https))
+        normalized_others = _extract_groups_block(stripped.filter(is_other), pattern, nb_https)
+        if normalized_others is None:
+            return None
+        normalized = pc.replace_with_mask(stripped, is_other, normalized_others)
+    return pc.binary_join_element_wise(normalized, "\n", "")
+
+
+def _normalize_person_dataset_row_block(rows: "pa.Array") -> Optional["pa.Array"]:
+    # the same group as "(.*),.*,.*,.*,.*", since the stripped rows have no newlines
+    normalized = _extract_groups_block(_strip_block(rows), "^(?P<g0>.*),[^,]*,[^,]*,[^,]*,[^,]*$", 1)
+    return None if normalized is None else pc.binary_join_element_wise(normalized, "\n", "")
+
+
+def _to_dlve_facts_block(
+    rows: "pa.Array", predicate_name: str, block_row_processor: Callable[["pa.Array"], Optional["pa.Array"]]
+) -> Optional["pa.Array"]:
+    processed = block_row_processor(rows)
+    if processed is None:
+        return None
+    # quote_csv_line, for the rows without quotes
+    stripped = _strip_block(processed)
+    if pc.any(pc.match_substring(stripped, '"')).as_py():
+        return None
+    quoted = pc.replace_substring(stripped, ",", '","')
+    return pc.binary_join_element_wise(f'{predicate_name}("', quoted, '").\n', "")
+
+
+_block_row_processors: Dict[Callable, Callable] = {
+    _identity: lambda rows: rows,
+    normalize: _normalize_block,
+    normalize_person_dataset_row: _normalize_person_dataset_row_block,
+}
+
+
+def register_block_row_processor(row_processor: Callable, block_row_processor: Callable) -> None:
+    """
+    Register the vectorised equivalent of a row processor.
+
+    It takes the same keyword arguments, and maps a pyarrow array of rows to the array of the processed rows,
+    or to None if the rows must be processed one by one.
+    """
+    _block_row_processors[row_processor] = block_row_processor
+
+
+def get_block_row_processor(row_processor: Callable) -> Optional[Callable[["pa.Array"], Optional["pa.Array"]]]:
+    """The vectorised equivalent of a row processor (or of a partial of it, with keyword arguments), if any."""
+    if pa is None:
+        return None
+    keywords = {}
+    if isinstance(row_processor, partial):
+        if row_processor.args:
+            return None
+        row_processor, keywords = row_processor.func, row_processor.keywords
+    block_row_processor = _block_row_processors.get(row_processor)
+    return None if block_row_processor is None else partial(block_row_processor, **keywords)
+
+
+def get_block_translator(
+    translate_row: Callable[[str], str], vectorised: Optional[bool] = None
+) -> Optional[Callable[["pa.Array"], Optional["pa.Array"]]]:
+    """
+    The vectorised equivalent of a row translator (the DLV^E facts or the Vadalog rows of a known row processor).
+
+    With vectorised=None, it is used if pyarrow is installed; raise ValueError if vectorised=True and there is none.
+    The rows translated by it are the same as the ones translated by translate_row.
+    """
+    block_translator = None
+    if vectorised is not False:
+        if isinstance(translate_row, partial) and translate_row.func is _to_dlve_fact:
+            block_row_processor = get_block_row_processor(translate_row.keywords["row_processor"])
+            if block_row_processor is not None:
+                block_translator = partial(
+                    _to_dlve_facts_block,
+                    predicate_name=translate_row.keywords["predicate_name"],
+                    block_row_processor=block_row_processor,
+                )
+        else:
+            block_translator = get_block_row_processor(translate_row)
+    if vectorised and block_translator is None:
+        reason = "" if pa is not None else " (pyarrow is not installed)"
+        raise ValueError(f"{translate_row} has no vectorised equivalent{reason}")
+    return block_translator
+
+
+def _join_block(rows: "pa.Array") -> str:
+    return pc.binary_join(pa.ListArray.from_arrays(pa.array([0, len(rows)], type=pa.int32()), rows), "")[0].as_py()
+
+
+def _translate_block_or_rows(
+    chunk: List[str],
+    translate_block: Optional[Callable[["pa.Array"], Optional["pa.Array"]]],
+    translate_row: Callable[[str], str],
+) -> str:
+    """Translate a chunk of rows with the vectorised translator, if any and if it can, else one row at a time."""
+    if translate_block is not None:
+        translated = translate_block(pa.array(chunk, type=pa.string()))
+        if translated is not None:
+            return _join_block(translated)
+    return "".join(map(translate_row, chunk))
+
+
 def get_nb_columns_from_csv(input_file: Path) -> int:
     return len(input_file.read_text().split("\n", maxsplit=1)[0].split(","))
 
@@ -0,0 +1,243 @@
+"""Containment of the runs with cgroups v2, or with resource limits as a fallback."""
+import dataclasses
+import itertools
+import logging
+import math
+import os
+import resource
+import signal
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CGROUP_MOUNT_POINT = Path("/sys/fs/cgroup")
+HARNESS_CGROUP_NAME = "harness"
+DEFAULT_CPU_PERIOD_US = 100000
+_REMOVE_ATTEMPTS = 50
+_REMOVE_WAIT = 0.02
+
+_container_ids = itertools.count()
+
+
+@dataclasses.dataclass(frozen=True)
+class ContainmentConfig:
+    """
+    Limits for a run.
+
+    :param memory_max: the maximum memory, in MB
+    :param cpu_max: the maximum CPU bandwidth, in number of CPUs
+    :param pids_max: the maximum number of processes/threads
+    :param cgroup_root: a cgroup v2 directory, delegated to the harness, under which to create
+                        the cgroups of the runs. If None, resource limits are used instead.
+    :param move_harness: without cgroup root, whether the harness may move itself in a leaf of its
+                         own cgroup, to create the cgroups of the runs next to it.
+    """
+
+    memory_max: Optional[int] = None
+    cpu_max: Optional[float] = None
+    pids_max: Optional[int] = None
+    cgroup_root: Optional[Path] = None
+    move_harness: bool = False
+
+    def __post_init__(self):
+        if self.memory_max is not None:
+            assert self.memory_max > 0
+        if self.cpu_max is not None:
+            assert self.cpu_max > 0.0
+        if self.pids_max is not None:
+            assert self.pids_max > 0
+
+    @property
+    def controllers(self) -> List[str]:
+        # memory is always needed to detect OOM kills
+        controllers = ["memory"]
+        if self.cpu_max is not None:
+            controllers.append("cpu")
+        if self.pids_max is not None:
+            controllers.append("pids")
+        return controllers
+
+
+@dataclasses.dataclass(frozen=True)
+class ContainmentUsage:
+    memory_peak: Optional[int] = None
+    cpu_usage: Optional[float] = None
+    oom_kills: Optional[int] = None
+
+
+def _read_key_value_file(path: Path) -> Dict[str, int]:
+    result = {}
+    for line in path.read_text().splitlines():
+        key, value = line.split()
+        result[key] = int(value)
+    return result
+
+
+def get_containment_config(
+    memory_max: Optional[int] = None,
+    cpu_max: Optional[float] = None,
+    pids_max: Optional[int] = None,
+    cgroup_root: Optional[str] = None,
+    move_harness: bool = False,
+) -> Optional[ContainmentConfig]:
+    """Get the containment configuration from command line options; None if no limit is set."""
+    if memory_max is None and cpu_max is None and pids_max is None:
+        return None
+    return ContainmentConfig(memory_max, cpu_max, pids_max, Path(cgroup_root) if cgroup_root else None, move_harness)
+
+
+def get_own_cgroup() -> Optional[Path]:
+    """Get the cgroup v2 directory of the current process, or None if cgroup v2 is not mounted."""
+    if not (CGROUP_MOUNT_POINT / "cgroup.controllers").exists():
+        return None
+    for line in Path("/proc/self/cgroup").read_text().splitlines():
+        hierarchy_id, _, path = line.split(":", maxsplit=2)
+        if hierarchy_id == "0":
+            return CGROUP_MOUNT_POINT / path.lstrip("/")
+    return None
+
+
+def _enable_controllers(cgroup_root: Path, controllers: List[str]) -> None:
+    available = (cgroup_root / "cgroup.controllers").read_text().split()
+    missing = set(controllers).difference(available)
+    if missing:
+        raise OSError(f"controllers {sorted(missing)} not available in {cgroup_root}")
+    (cgroup_root / "cgroup.subtree_control").write_text(" ".join(f"+{c}" for c in controllers))
+
+
+def _enable_controllers_from_leaf(cgroup_root: Path, controllers: List[str]) -> None:
+    """Move the current process in a leaf cgroup, and enable the controllers; move it back if they cannot be."""
+    harness_cgroup = cgroup_root / HARNESS_CGROUP_NAME
+    harness_cgroup.mkdir(exist_ok=True)
+    (harness_cgroup / "cgroup.procs").write_text(str(os.getpid()))
+    try:
+        _enable_controllers(cgroup_root, controllers)
+    except OSError:
+        (cgroup_root / "cgroup.procs").write_text(str(os.getpid()))
+        try:
+            harness_cgroup.rmdir()
+        except OSError:
+            pass
+        raise
+
+
+def resolve_containment(config: ContainmentConfig) -> ContainmentConfig:
+    """
+    Check that cgroups v2 are delegated to the harness, and set the cgroup root accordingly.
+
+    If no cgroup root is configured, the cgroup of the current process is used; to comply
+    with the 'no internal processes' rule, the current process is moved in a leaf cgroup, only
+    if move_harness is set (and moved back if that does not help). If the cgroup root cannot be
+    used, fall back to resource limits (i.e. cgroup_root=None).
+    """
+    cgroup_root = config.cgroup_root if config.cgroup_root is not None else get_own_cgroup()
+    if cgroup_root is None:
+        logging.warning("cgroup v2 not available; falling back to resource limits")
+        return dataclasses.replace(config, cgroup_root=None)
+    try:
+        try:
+            _enable_controllers(cgroup_root, config.controllers)
+        except OSError:
+            if config.cgroup_root is not None or not config.move_harness:
+                raise
+            # the cgroup has processes: move the harness in a leaf cgroup, and retry
+            _enable_controllers_from_leaf(cgroup_root, config.controllers)
+    except OSError as e:
+        hint = "" if config.cgroup_root is not None or config.move_harness else " (see --cgroup-move-harness)"
+        logging.warning(f"cgroup {cgroup_root} not delegated ({e}); falling back to resource limits{hint}")
+        return dataclasses.replace(config, cgroup_root=None)
+    logging.info(f"Using cgroup root {cgroup_root}")
+    return dataclasses.replace(config, cgroup_root=cgroup_root)
+
+
+class Container:
+    """
+    Contain a process (and its descendants).
+
+    Use 'preexec' as the preexec_fn of the process. With a cgroup root, the process joins
+    a fresh cgroup with the configured limits; otherwise, RLIMIT_AS (unless limit_address_space is
+    False, e.g. for a JVM, which reserves much more address space than it uses) and RLIMIT_CPU are set.
+    """
+
+    def __init__(
+        self, config: ContainmentConfig, name: str, timeout: Optional[float] = None, limit_address_space: bool = True
+    ):
+        self.config = config
+        self.name = f"{name}-{os.getpid()}-{next(_container_ids)}"
+        self.timeout = timeout
+        self.limit_address_space = limit_address_space
+        self.cgroup: Optional[Path] = None
+
+    @property
+    def uses_cgroup(self) -> bool:
+        return self.config.cgroup_root is not None
+
+    def create(self) -> None:
+        if not self.uses_cgroup:
+            return
+        self.cgroup = self.config.cgroup_root / self.name
+        self.cgroup.mkdir()
+        if self.config.memory_max is not None:
+            (self.cgroup / "memory.max").write_text(str(self.config.memory_max * 1024 * 1024))
+            # do not swap: a run out of memory must be killed, not slowed down
+            if (self.cgroup / "memory.swap.max").exists():
+                (self.cgroup / "memory.swap.max").write_text("0")
+        if self.config.cpu_max is not None:
+            quota = int(self.config.cpu_max * DEFAULT_CPU_PERIOD_US)
+            (self.cgroup / "cpu.max").write_text(f"{quota} {DEFAULT_CPU_PERIOD_US}")
+        if self.config.pids_max is not None:
+            (self.cgroup / "pids.max").write_text(str(self.config.pids_max))
+
+    def preexec(self) -> None:
+        """Run in the child process, before exec."""
+        os.setsid()
+        if self.cgroup is not None:
+            (self.cgroup / "cgroup.procs").write_text(str(os.getpid()))
+            return
+        if self.config.memory_max is not None and self.limit_address_space:
+            memory_max = self.config.memory_max * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory_max, memory_max))
+        if self.config.cpu_max is not None and self.timeout is not None:
+            cpu_seconds = math.ceil(self.config.cpu_max * self.timeout)
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+
+    def get_usage(self) -> ContainmentUsage:
+        if self.cgroup is None:
+            return ContainmentUsage()
+        memory_peak_file = self.cgroup / "memory.peak"
+        memory_peak = int(memory_peak_file.read_text()) if memory_peak_file.exists() else None
+        cpu_stat = _read_key_value_file(self.cgroup / "cpu.stat")
+        memory_events = _read_key_value_file(self.cgroup / "memory.events")
+        return ContainmentUsage(
+            memory_peak=memory_peak,
+            cpu_usage=cpu_stat["usage_usec"] / 10**6,
+            oom_kills=memory_events.get("oom_kill", 0),
+        )
+
+    def kill(self) -> None:
+        """Kill all the processes left in the cgroup."""
+        if self.cgroup is None:
+            return
+        kill_file = self.cgroup / "cgroup.kill"
+        if kill_file.exists():
+            kill_file.write_text("1")
+            return
+        for pid in (self.cgroup / "cgroup.procs").read_text().split():
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def destroy(self) -> None:
+        if self.cgroup is None:
+            return
+        self.kill()
+        for _ in range(_REMOVE_ATTEMPTS):
+            try:
+                self.cgroup.rmdir()
+                break
+            except OSError:
+                time.sleep(_REMOVE_WAIT)
+        else:
+            logging.warning(f"cannot remove cgroup {self.cgroup}")
+        self.cgroup = None
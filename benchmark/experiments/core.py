@@ -4,16 +4,23 @@ import os
 import signal
 import subprocess
 import sys
+import threading
 import time
+from abc import ABC, abstractmethod
 from contextlib import suppress
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, ClassVar, Mapping, Sequence, Tuple, get_args
 
 import psutil
 
+from benchmark.experiments.containment import Container, ContainmentUsage
+from benchmark.experiments.telemetry import ProcessTreeSampler, TelemetryConfig, TelemetrySummary
+
 SHUTDOWN_TIMEOUT = 20.0
+TELEMETRY_FILENAME = "telemetry.tsv"
+PIPE_READ_SIZE = 1 << 20
 
 
 class Status(Enum):
@@ -22,6 +29,12 @@ class Status(Enum):
     TIMEOUT = "timeout"
     INTERRUPTED = "interrupted"
     ERROR = "error"
+    OUT_OF_MEMORY = "out-of-memory"
+    SKIPPED_PREDICTED = "skipped-predicted"
+
+
+# the phases of time_engine stacked by the plots; time_end2end - time_engine is the overhead outside the engine
+PHASE_COLUMNS = ("time_parse", "time_rewrite", "time_reason", "time_output")
 
 
 @dataclass()  # frozen=True
@@ -36,61 +49,143 @@ class Result:
     time_end2end: Optional[float] = None
     status: Optional[Status] = None
     nb_atoms: Optional[int] = None
+    # resource usage of the process tree (bytes and seconds)
+    peak_rss: Optional[int] = None
+    mean_rss: Optional[int] = None
+    cpu_user: Optional[float] = None
+    cpu_system: Optional[float] = None
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+    peak_threads: Optional[int] = None
+    # accounting of the cgroup of the run, if contained (bytes and seconds)
+    cgroup_memory_peak: Optional[int] = None
+    cgroup_cpu_usage: Optional[float] = None
+    oom_kills: Optional[int] = None
+    # time predicted from the smaller partitions, if predictive skip is enabled
+    predicted_time: Optional[float] = None
+    # bootstrap confidence interval of the median time of the runs so far, if repetition is adaptive
+    median_ci_low: Optional[float] = None
+    median_ci_high: Optional[float] = None
+    # engine-internal phases (seconds), as reported by the engine
+    time_parse: Optional[float] = None
+    time_rewrite: Optional[float] = None
+    time_reason: Optional[float] = None
+    time_output: Optional[float] = None
+    time_engine: Optional[float] = None
+    # DLV^E only: split of time_reason
+    time_grounding: Optional[float] = None
+    time_model_generation: Optional[float] = None
+    nb_derived_atoms: Optional[int] = None
+    # Vadalog only: 'cold' if the server was started for the run, 'warm' if it had already served runs
+    jvm_state: Optional[str] = None
+    # Vadalog only, for cold runs: seconds until the server answered, and to evaluate the warm-up program
+    time_server_start: Optional[float] = None
+    time_server_warmup: Optional[float] = None
+    # Vadalog only: whether the server used an AppCDS archive ('use'), dumped it ('dump'), or neither ('off')
+    jvm_cds: Optional[str] = None
+    # Vadalog only, with GC logging: collections, stop-the-world pauses (seconds), peak heap after a collection (bytes)
+    gc_count: Optional[int] = None
+    gc_pause_time: Optional[float] = None
+    gc_max_pause: Optional[float] = None
+    gc_peak_heap_after: Optional[int] = None
+    # order-independent hash of the answers, if requested
+    answer_hash: Optional[str] = None
+
+    # order of the columns in the TSV file; 'command' must be the last one
+    COLUMNS: ClassVar[Tuple[str, ...]] = (
+        "name",
+        "tool",
+        "timestamp",
+        "run_id",
+        "partition",
+        "program",
+        "status",
+        "time_end2end",
+        "nb_atoms",
+        "peak_rss",
+        "mean_rss",
+        "cpu_user",
+        "cpu_system",
+        "read_bytes",
+        "write_bytes",
+        "peak_threads",
+        "cgroup_memory_peak",
+        "cgroup_cpu_usage",
+        "oom_kills",
+        "predicted_time",
+        "median_ci_low",
+        "median_ci_high",
+        "time_parse",
+        "time_rewrite",
+        "time_reason",
+        "time_output",
+        "time_engine",
+        "time_grounding",
+        "time_model_generation",
+        "nb_derived_atoms",
+        "jvm_state",
+        "time_server_start",
+        "time_server_warmup",
+        "jvm_cds",
+        "gc_count",
+        "gc_pause_time",
+        "gc_max_pause",
+        "gc_peak_heap_after",
+        "answer_hash",
+        "command",
+    )
 
     @staticmethod
     def headers() -> str:
-        return "name\t" "tool\t" "timestamp\t" "run_id\t" "partition\t" "program\t" "status\t" "time_end2end\t" "nb_atoms\t" "command"
+        return "\t".join(Result.COLUMNS)
 
     def json(self) -> Dict[str, Any]:
         """To json."""
-        return dict(
-            name=self.name,
-            tool=self.tool,
-            timestamp=self.timestamp,
-            run_id=self.run_id,
-            partition=self.partition,
-            program=self.program,
-            status=self.status.value,
-            time_end2end=self.time_end2end,
-            nb_atoms=self.nb_atoms,
-            command=self.command_str,
-        )
+        values = {column: getattr(self, column) for column in self.COLUMNS}
+        values["status"] = self.status.value
+        values["command"] = self.command_str
+        return values
+
+    @classmethod
+    def from_dict(cls, values: Mapping[str, Optional[str]]) -> "Result":
+        """Parse a result from the string values of a TSV row; missing columns are set to None."""
+        field_types = {field.name: field.type for field in fields(cls)}
+        kwargs = {}
+        for column, value in values.items():
+            if column not in field_types or value is None or value.strip() == "None":
+                continue
+            value_type = get_args(field_types[column])[0]
+            if column == "command":
+                kwargs[column] = value.split(" ")
+            elif value_type is datetime.datetime:
+                kwargs[column] = datetime.datetime.fromisoformat(value)
+            else:
+                kwargs[column] = value_type(value.strip())
+        return Result(**kwargs)
 
     @property
     def command_str(self) -> str:
         return ' '.join(map(str, self.command)) if self.command is not None else "None"
 
+    def _format_value(self, column: str) -> str:
+        value = getattr(self, column)
+        if column == "command":
+            return self.command_str
+        if isinstance(value, Status):
+            return value.value
+        if isinstance(value, float):
+            return f"{value:10.6f}"
+        return str(value)
+
     def __str__(self):
         """To string."""
-        time_end2end_str = (
-            f"{self.time_end2end:10.6f}" if self.time_end2end is not None else "None"
-        )
-        return (
-            f"{self.name}\t"
-            f"{self.tool}\t"
-            f"{self.timestamp}\t"
-            f"{self.run_id}\t"
-            f"{self.partition}\t"
-            f"{self.program}\t"
-            f"{self.status.value}\t"
-            f"{time_end2end_str}\t"
-            f"{self.nb_atoms}\t"
-            f"{self.command_str}"
-        )
+        return "\t".join(map(self._format_value, self.COLUMNS))
 
     def to_rows(self) -> str:
         """Print results by rows."""
-        return (
-            f"name={self.name}\n"
-            f"tool={self.tool}\n"
-            f"timestamp={self.timestamp}\n"
-            f"run_id={self.run_id}\n"
-            f"partition={self.partition}\n"
-            f"program={self.program}\n"
-            f"status={self.status}\n"
-            f"time_end2end={self.time_end2end}\n"
-            f"nb_atoms={self.nb_atoms}\n"
-            f"command={self.command_str}"
+        return "\n".join(
+            f"{column}={self.command_str if column == 'command' else getattr(self, column)}"
+            for column in self.COLUMNS
         )
 
 
@@ -103,7 +198,54 @@ def save_data(data: List[Result], output: Path) -> None:
     output.write_text(content)
 
 
-def run_cli(cmd, timeout: float, cwd, logger: logging.Logger, stdout_file: Path, stderr_file: Path):
+def load_data(input_file: Path) -> List[Result]:
+    """Load data saved with 'save_data'."""
+    header, *rows = input_file.read_text().splitlines()
+    columns = header.split("\t")
+    return [Result.from_dict(dict(zip(columns, row.split("\t")))) for row in rows if row]
+
+
+class OutputFilter(ABC):
+    """Filter the stdout of a command, read from a pipe, before it is written to the stdout file."""
+
+    @abstractmethod
+    def feed(self, data: bytes) -> bytes:
+        """Consume a chunk of the output; return the part to write."""
+
+    @abstractmethod
+    def close(self) -> bytes:
+        """Consume the end of the output; return the part to write."""
+
+
+def _copy_output(fd: int, fout, output_filter: OutputFilter) -> None:
+    with os.fdopen(fd, mode="rb", buffering=0) as fin:
+        for chunk in iter(lambda: fin.read(PIPE_READ_SIZE), b""):
+            fout.write(output_filter.feed(chunk))
+    fout.write(output_filter.close())
+
+
+def run_cli(
+    cmd,
+    timeout: float,
+    cwd,
+    logger: logging.Logger,
+    stdout_file: Path,
+    stderr_file: Path,
+    telemetry_config: Optional[TelemetryConfig] = None,
+    extra_pids: Sequence[int] = (),
+    container: Optional[Container] = None,
+    stdout_filter: Optional[OutputFilter] = None,
+    merge_stderr: bool = False,
+):
+    """
+    Run a command.
+
+    If telemetry_config is set, the resource usage of the process tree of the command
+    (and of the processes in extra_pids) is sampled and summarized.
+    If container is set, the command runs inside it, and its accounting is returned.
+    If stdout_filter is set, the stdout of the command is read from a pipe, and only what the filter
+    returns is written to stdout_file. If merge_stderr is set, stderr is redirected to stdout, and stderr_file is empty.
+    """
     start = time.perf_counter()
     timed_out = False
     interrupted = False
@@ -111,16 +253,36 @@ def run_cli(cmd, timeout: float, cwd, logger: logging.Logger, stdout_file: Path,
     command_str = " ".join(cmd_args)
     logger.info("Calling command: %s", command_str)
 
-    with stdout_file.open(mode="w") as stdout_fp, \
+    if container is not None:
+        container.create()
+    with stdout_file.open(mode="wb" if stdout_filter is not None else "w") as stdout_fp, \
          stderr_file.open(mode="w") as stderr_fp:
-        proc = subprocess.Popen(cmd_args,
-                                cwd=cwd,
-                                encoding="utf-8",
-                                stdout=stdout_fp,
-                                stderr=stderr_fp,
-                                preexec_fn=os.setsid,
-                                )
+        copier: Optional[threading.Thread] = None
+        if stdout_filter is not None:
+            read_fd, write_fd = os.pipe()
+            stdout = write_fd
+        else:
+            stdout = stdout_fp
+        try:
+            proc = subprocess.Popen(cmd_args,
+                                    cwd=cwd,
+                                    encoding="utf-8",
+                                    stdout=stdout,
+                                    stderr=subprocess.STDOUT if merge_stderr else stderr_fp,
+                                    preexec_fn=container.preexec if container is not None else os.setsid,
+                                    )
+        finally:
+            if stdout_filter is not None:
+                # the pipe is closed when the command (and its children) exit
+                os.close(write_fd)
+        if stdout_filter is not None:
+            copier = threading.Thread(target=_copy_output, args=(read_fd, stdout_fp, stdout_filter), daemon=True)
+            copier.start()
         logger.info(f"Created process with PID: %s", proc.pid)
+        sampler: Optional[ProcessTreeSampler] = None
+        if telemetry_config is not None:
+            sampler = ProcessTreeSampler(proc.pid, extra_pids, telemetry_config.sampling_interval)
+            sampler.start()
         try:
             proc.communicate(timeout=timeout)
             logger.info(f"command succeeded: %s", command_str)
@@ -135,8 +297,22 @@ def run_cli(cmd, timeout: float, cwd, logger: logging.Logger, stdout_file: Path,
             terminate_process(proc, logger)
         total = end - start
         proc.communicate(timeout=0.1)
+        if copier is not None:
+            copier.join(timeout=SHUTDOWN_TIMEOUT)
+            if copier.is_alive():
+                logger.error("the stdout of the command is still open; the output might be incomplete")
         logger.info(f"Return code of PID %s: %s", proc.pid, proc.returncode)
-        return proc.returncode, total, timed_out, interrupted
+        telemetry_summary: Optional[TelemetrySummary] = None
+        if sampler is not None:
+            telemetry_summary = sampler.stop()
+            if telemetry_config.save_time_series:
+                sampler.save_time_series(stdout_file.parent / TELEMETRY_FILENAME)
+        containment_usage: Optional[ContainmentUsage] = None
+        if container is not None:
+            container.kill()
+            containment_usage = container.get_usage()
+            container.destroy()
+        return proc.returncode, total, timed_out, interrupted, telemetry_summary, containment_usage
 
 
 def terminate_process(proc: subprocess.Popen, logger: logging.Logger):
@@ -153,14 +329,16 @@ def terminate_process(proc: subprocess.Popen, logger: logging.Logger):
 
     logger.info("Killing child processes...")
     for any_process in psutil.process_iter():
-        if any_process.ppid() == proc.pid:
-            child_process = any_process
-            logger.info(
-                f"Killing child process with PID %s (PPID: %s)",
-                child_process,
-                any_process.ppid(),
-            )
-            terminate_process(proc, logger)
+        # processes (e.g. of other workers) might exit while iterating
+        with suppress(psutil.NoSuchProcess):
+            if any_process.ppid() == proc.pid:
+                child_process = any_process
+                logger.info(
+                    f"Killing child process with PID %s (PPID: %s)",
+                    child_process,
+                    any_process.ppid(),
+                )
+                terminate_process(proc, logger)
 
 
 def get_sigint_crossplatform():
@@ -0,0 +1,134 @@
+"""Append-only, crash-safe journal of results."""
+import datetime
+import json
+import logging
+import os
+import tempfile
+from operator import attrgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from benchmark.experiments.core import Result, load_data, save_data
+from benchmark.utils.base import TSV_FILENAME, itersubdir
+
+JOURNAL_FILENAME = "output.jsonl"
+WORKER_JOURNAL_PATTERN = "output.*.jsonl"
+
+
+def get_result_key(result: Result) -> Tuple[str, str, str, str, int]:
+    return result.name, result.tool, result.program, result.partition, result.run_id
+
+
+class ResultJournal:
+    """
+    A JSON-lines file with one record per finished run.
+
+    Each record is appended with a single write on a file opened in append mode, and then
+    fsynced; a record torn by a crash can only be the last line, and it is ignored on load.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def append(self, result: Result) -> None:
+        self.extend([result])
+
+    def extend(self, results: Iterable[Result]) -> None:
+        content = "".join(json.dumps(result.json(), default=str) + "\n" for result in results)
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # a torn record must not be merged with the next one
+            size = os.fstat(fd).st_size
+            if size > 0 and os.pread(fd, 1, size - 1) != b"\n":
+                content = "\n" + content
+            os.write(fd, content.encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def load(self) -> List[Result]:
+        """Load all the records, in order of writing."""
+        if not self.exists():
+            return []
+        results = []
+        for line_number, line in enumerate(self.path.read_text().splitlines(), start=1):
+            try:
+                values = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"ignoring torn record at {self.path}:{line_number}")
+                continue
+            results.append(Result.from_dict({k: None if v is None else str(v) for k, v in values.items()}))
+        return results
+
+    def load_latest(self) -> List[Result]:
+        """Load the latest record of each run, sorted by program, partition and run id."""
+        return get_latest_results(self.load())
+
+
+def get_latest_results(results: Iterable[Result]) -> List[Result]:
+    """Keep the latest (by timestamp) result of each run, sorted by program, partition and run id."""
+    latest: Dict[Tuple, Result] = {}
+    for result in sorted(results, key=lambda r: r.timestamp or datetime.datetime.min):
+        latest[get_result_key(result)] = result
+    return sorted(latest.values(), key=attrgetter("program", "partition", "run_id"))
+
+
+def get_tool_journals(tool_dir: Path) -> List[ResultJournal]:
+    """Get the journals of a tool directory: the main one, and the ones of the workers."""
+    paths = [tool_dir / JOURNAL_FILENAME, *sorted(tool_dir.glob(WORKER_JOURNAL_PATTERN))]
+    return [ResultJournal(path) for path in paths if path.exists()]
+
+
+def _seed_journal(tool_dir: Path) -> None:
+    """If the directory only has a TSV file (i.e. it was written before journals), initialize the main journal with it."""
+    tsv_file = tool_dir / TSV_FILENAME
+    if not get_tool_journals(tool_dir) and tsv_file.exists():
+        ResultJournal(tool_dir / JOURNAL_FILENAME).extend(load_data(tsv_file))
+
+
+def get_tool_journal(tool_dir: Path, worker_id: Optional[str] = None) -> ResultJournal:
+    """Get the journal to append the results of a tool directory to; workers have their own journal."""
+    _seed_journal(tool_dir)
+    filename = JOURNAL_FILENAME if worker_id is None else WORKER_JOURNAL_PATTERN.replace("*", worker_id)
+    return ResultJournal(tool_dir / filename)
+
+
+def load_tool_results(tool_dir: Path) -> List[Result]:
+    """Load the latest result of each run from all the journals of a tool directory."""
+    _seed_journal(tool_dir)
+    return get_latest_results(result for journal in get_tool_journals(tool_dir) for result in journal.load())
+
+
+def _fsync_path(path: Path) -> None:
+    """Flush a file, or the entries of a directory, to disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def compact_tool_results(tool_dir: Path) -> None:
+    """
+    Write the results of a tool directory in the TSV format read by 'log_parsing'; the file is replaced atomically.
+
+    The new file is fsynced before it replaces the old one, and the directory after, so that a crash leaves either
+    the old or the new file, complete.
+    """
+    fd, tmp_output = tempfile.mkstemp(prefix=TSV_FILENAME + ".", suffix=".tmp", dir=tool_dir)
+    os.close(fd)
+    save_data(load_tool_results(tool_dir), Path(tmp_output))
+    _fsync_path(Path(tmp_output))
+    os.replace(tmp_output, tool_dir / TSV_FILENAME)
+    _fsync_path(tool_dir)
+
+
+def compact_results(output_dir: Path) -> None:
+    """Compact the journals of all the tool directories of an output directory."""
+    for dataset_dir in itersubdir(output_dir):
+        for tool_dir in itersubdir(dataset_dir):
+            if get_tool_journals(tool_dir):
+                compact_tool_results(tool_dir)
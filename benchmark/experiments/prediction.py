@@ -0,0 +1,131 @@
+"""Prediction of the running time of a partition from the times measured on the smaller ones."""
+import dataclasses
+import math
+import re
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+from benchmark.experiments.core import Result, Status
+
+DEFAULT_PREDICTION_MARGIN = 1.5
+
+# statuses whose time is a measure of the running time (not a lower bound)
+MEASURED_STATUSES = {Status.SUCCESS, Status.FAILURE}
+
+SeriesKey = Tuple[str, str, str]
+
+_SIZE_PATTERN = re.compile(r"[^0-9]*([0-9]+)")
+
+
+@dataclasses.dataclass(frozen=True)
+class PredictionConfig:
+    """
+    Configuration of the predictive skip.
+
+    :param margin: a run is predicted to not finish if its predicted time exceeds timeout * margin
+    :param predicted_timeout: if None, such runs are skipped; otherwise, they are run with this timeout
+    """
+
+    margin: float = DEFAULT_PREDICTION_MARGIN
+    predicted_timeout: Optional[float] = None
+
+    def __post_init__(self):
+        assert self.margin > 0.0
+        if self.predicted_timeout is not None:
+            assert self.predicted_timeout > 0.0
+
+
+def get_size(name: str) -> Optional[int]:
+    """
+    Get the size from the name of a partition or of a program, e.g. '050000' or 'q05'.
+
+    Names are produced with 'get_normalized_integer'; return None if the name has no size.
+    """
+    match = _SIZE_PATTERN.fullmatch(name)
+    return int(match.group(1)) if match is not None else None
+
+
+def get_series(
+    name: str, tool: str, program: str, partition: str, is_program_partitioned: bool = False
+) -> Tuple[Optional[SeriesKey], Optional[int]]:
+    """
+    Get the series of runs that differ only by size, and the size of the run in that series.
+
+    The size is the one of the partition, if any (e.g. dbpedia), otherwise, for the datasets partitioned by
+    program (e.g. has-ancestor), the one of the program; the programs of the other datasets (e.g. stb-128)
+    are unrelated queries. Return (None, None) if the run has no size.
+    """
+    partition_size = get_size(partition)
+    if partition_size is not None:
+        return (name, tool, program), partition_size
+    program_size = get_size(program) if is_program_partitioned else None
+    if program_size is not None:
+        return (name, tool, partition), program_size
+    return None, None
+
+
+@dataclasses.dataclass(frozen=True)
+class ScalingModel:
+    """A model time = a * e^(b * size) ('exponential') or time = a * size^b ('power-law')."""
+
+    kind: str
+    a: float
+    b: float
+
+    def predict(self, size: int) -> float:
+        try:
+            if self.kind == "exponential":
+                return self.a * math.exp(self.b * size)
+            return self.a * float(size) ** self.b
+        except OverflowError:
+            return math.inf
+
+
+def _fit_log_linear(xs: List[float], ys: List[float]) -> Tuple[float, float, float]:
+    """Least-squares fit of ys = intercept + slope * xs; return intercept, slope and the squared error."""
+    mean_x = statistics.fmean(xs)
+    mean_y = statistics.fmean(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    intercept = mean_y - slope * mean_x
+    error = sum((y - intercept - slope * x) ** 2 for x, y in zip(xs, ys))
+    return intercept, slope, error
+
+
+def fit_scaling_model(times_by_size: Dict[int, float]) -> Optional[ScalingModel]:
+    """
+    Fit a power-law and an exponential model, in log space, and return the best fitting one.
+
+    At least two distinct sizes are needed. With exactly two sizes both models fit exactly,
+    and the power law is chosen since it extrapolates more conservatively.
+    """
+    points = [(size, time) for size, time in sorted(times_by_size.items()) if size > 0 and time > 0.0]
+    if len(points) < 2:
+        return None
+    sizes = [float(size) for size, _ in points]
+    log_times = [math.log(time) for _, time in points]
+    power_intercept, power_slope, power_error = _fit_log_linear([math.log(s) for s in sizes], log_times)
+    power_law = ScalingModel("power-law", math.exp(power_intercept), power_slope)
+    if len(points) == 2:
+        return power_law
+    exp_intercept, exp_slope, exp_error = _fit_log_linear(sizes, log_times)
+    if exp_error < power_error:
+        return ScalingModel("exponential", math.exp(exp_intercept), exp_slope)
+    return power_law
+
+
+class ScalingPredictor:
+    """Collect the times of the runs of a series, and predict the time of a bigger run."""
+
+    def __init__(self):
+        self._times: Dict[int, List[float]] = {}
+
+    def observe(self, size: int, result: Result) -> None:
+        if result.status in MEASURED_STATUSES and result.time_end2end is not None:
+            self._times.setdefault(size, []).append(result.time_end2end)
+
+    def predict(self, size: int) -> Optional[float]:
+        """Predict the time of a run from the median times of the smaller sizes; None if not enough data."""
+        times_by_size = {s: statistics.median(times) for s, times in self._times.items() if s < size}
+        model = fit_scaling_model(times_by_size)
+        return model.predict(size) if model is not None else None
@@ -0,0 +1,82 @@
+"""Adaptive repetition of the runs, until the confidence interval of the median time is tight enough."""
+import dataclasses
+import random
+import statistics
+from typing import List, Optional, Sequence, Tuple
+
+from benchmark.experiments.core import Result, Status
+
+DEFAULT_MIN_RUNS = 3
+DEFAULT_MAX_RUNS = 30
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_NB_RESAMPLES = 1000
+_BOOTSTRAP_SEED = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class RepetitionConfig:
+    """
+    Configuration of the adaptive repetition.
+
+    :param min_runs: the minimum number of runs of a cell
+    :param max_runs: the maximum number of runs of a cell
+    :param target_rel_ci: the target width of the confidence interval of the median time, relative to the median
+    :param confidence: the confidence level of the interval
+    :param nb_resamples: the number of bootstrap resamples
+    """
+
+    min_runs: int = DEFAULT_MIN_RUNS
+    max_runs: int = DEFAULT_MAX_RUNS
+    target_rel_ci: float = 0.01
+    confidence: float = DEFAULT_CONFIDENCE
+    nb_resamples: int = DEFAULT_NB_RESAMPLES
+
+    def __post_init__(self):
+        assert 2 <= self.min_runs <= self.max_runs
+        assert self.target_rel_ci > 0.0
+        assert 0.0 < self.confidence < 1.0
+        assert self.nb_resamples > 0
+
+
+def bootstrap_median_ci(
+    times: Sequence[float], confidence: float = DEFAULT_CONFIDENCE, nb_resamples: int = DEFAULT_NB_RESAMPLES
+) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the median; resampling is seeded, hence reproducible."""
+    rng = random.Random(_BOOTSTRAP_SEED)
+    medians = sorted(statistics.median(rng.choices(times, k=len(times))) for _ in range(nb_resamples))
+    alpha = (1.0 - confidence) / 2
+    low_index = int(alpha * (nb_resamples - 1))
+    high_index = int(round((1.0 - alpha) * (nb_resamples - 1)))
+    return medians[low_index], medians[high_index]
+
+
+class RepetitionState:
+    """The measured runs of a cell, i.e. of a (dataset, tool, program, partition) tuple."""
+
+    def __init__(self, config: RepetitionConfig):
+        self.config = config
+        self.times: List[float] = []
+        self.failed = False
+        self.ci: Optional[Tuple[float, float]] = None
+
+    def add(self, result: Result) -> None:
+        """Add the result of a run, and update the confidence interval."""
+        if result.status != Status.SUCCESS or result.time_end2end is None:
+            # the median time is not defined anymore: repeating the run is useless
+            self.failed = True
+            return
+        self.times.append(result.time_end2end)
+        if len(self.times) >= 2:
+            self.ci = bootstrap_median_ci(self.times, self.config.confidence, self.config.nb_resamples)
+
+    @property
+    def rel_ci(self) -> Optional[float]:
+        if self.ci is None:
+            return None
+        median = statistics.median(self.times)
+        return (self.ci[1] - self.ci[0]) / median if median > 0.0 else 0.0
+
+    def is_done(self) -> bool:
+        if self.failed or len(self.times) >= self.config.max_runs:
+            return True
+        return len(self.times) >= self.config.min_runs and self.rel_ci <= self.config.target_rel_ci
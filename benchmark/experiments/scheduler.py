@@ -0,0 +1,457 @@
+"""Scheduling of experiment runs over isolated, CPU-pinned slots."""
+import datetime
+import logging
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from multiprocessing import Queue
+from operator import attrgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from benchmark.datasets import DatasetID, dataset_registry
+from benchmark.datasets.core import Dataset
+from benchmark.datasets.translate import get_normalized_integer_alt
+from benchmark.experiments.containment import ContainmentConfig
+from benchmark.experiments.core import Result, Status
+from benchmark.experiments.journal import get_result_key, load_tool_results
+from benchmark.experiments.prediction import PredictionConfig, ScalingPredictor, SeriesKey, get_series
+from benchmark.experiments.repetition import RepetitionConfig, RepetitionState
+from benchmark.experiments.telemetry import TelemetryConfig
+from benchmark.tools import ToolID
+from benchmark.tools.engine import run_engine
+from benchmark.tools.vadalog import DEFAULT_VADALOG_PORT, shutdown_vadalog_servers
+from benchmark.utils.base import ensure_dict, itersubdir
+
+CellKey = Tuple[str, str, str, str, int]
+RepetitionKey = Tuple[str, str, str, str]
+
+FINAL_STATUSES = {Status.SUCCESS, Status.FAILURE, Status.TIMEOUT, Status.ERROR, Status.OUT_OF_MEMORY}
+STOP_STATUSES = {Status.ERROR, Status.TIMEOUT, Status.OUT_OF_MEMORY, Status.SKIPPED_PREDICTED}
+
+
+@lru_cache(maxsize=None)
+def is_program_partitioned(dataset_id: str) -> bool:
+    """Whether the programs of a dataset are its partitions (e.g. has-ancestor), and not unrelated queries."""
+    return dataset_registry.make(DatasetID(dataset_id)).is_program_partitioned
+
+
+@dataclass(frozen=True)
+class Cell:
+    """A single run of the experiment matrix; warm-up runs are not recorded."""
+
+    dataset_id: str
+    tool_id: str
+    program_path: Path
+    dataset_instance_path: Path
+    run_id: int
+    nb_runs: int
+    warmup: bool = False
+
+    @property
+    def partition_name(self) -> str:
+        return self.dataset_instance_path.stem
+
+    @property
+    def program_name(self) -> str:
+        return self.program_path.stem
+
+    @property
+    def run_id_str(self) -> str:
+        prefix = "warmup" if self.warmup else "run"
+        return f"{prefix}-{get_normalized_integer_alt(self.run_id, self.nb_runs)}"
+
+    @property
+    def key(self) -> CellKey:
+        return self.dataset_id, self.tool_id, self.program_name, self.partition_name, self.run_id
+
+    @property
+    def repetition_key(self) -> RepetitionKey:
+        return self.dataset_id, self.tool_id, self.program_name, self.partition_name
+
+    @property
+    def series(self) -> Tuple[Optional[SeriesKey], Optional[int]]:
+        return get_series(*self.repetition_key, is_program_partitioned=is_program_partitioned(self.dataset_id))
+
+    def get_tool_dir(self, output_dir: Path) -> Path:
+        return output_dir / self.dataset_id / self.tool_id
+
+    def get_working_dir(self, output_dir: Path) -> Path:
+        return self.get_tool_dir(output_dir) / self.partition_name / self.program_name / self.run_id_str
+
+
+@dataclass(frozen=True)
+class Chain:
+    """
+    A sequence of cells that must be run in order.
+
+    If stop_on_timeout is set, the first cell that ends with an error, a timeout, out of memory
+    or that is skipped by prediction stops the chain, i.e. the remaining (bigger) partitions/programs are not run.
+    """
+
+    cells: Tuple[Cell, ...]
+    stop_on_timeout: bool
+
+    def should_stop(self, result: Result) -> bool:
+        return self.stop_on_timeout and result.status in STOP_STATUSES
+
+
+@dataclass(frozen=True)
+class Slot:
+    """An isolated execution slot: a disjoint CPU set, a Vadalog port and a scratch dir."""
+
+    index: int
+    cpus: Tuple[int, ...]
+    port: int
+    working_dir: Path
+
+
+@dataclass(frozen=True)
+class ExperimentConfig:
+    """
+    The options of the runs of an experiment, passed once from the command line to the scheduler and to each run.
+
+    If prediction_config is set, the time of a cell is predicted from the results of the smaller
+    cells of its series; a cell predicted to not finish within the timeout is skipped, or run with a reduced timeout.
+    If repetition_config is set, the runs of a (program, partition) pair stop as soon as the confidence
+    interval of their median time is tight enough.
+    base_port is the Vadalog port of the first slot. vadalog_config holds the other keyword arguments of the Vadalog
+    tools (e.g. the server pool that each slot reuses across runs), dlve_config the ones of DLV^E.
+    If profile is set, the runs are profiled (see benchmark.utils.profiling).
+    """
+
+    timeout: float
+    telemetry_config: Optional[TelemetryConfig] = None
+    containment_config: Optional[ContainmentConfig] = None
+    prediction_config: Optional[PredictionConfig] = None
+    repetition_config: Optional[RepetitionConfig] = None
+    base_port: int = DEFAULT_VADALOG_PORT
+    vadalog_config: Optional[Mapping] = None
+    profile: bool = False
+    dlve_config: Optional[Mapping] = None
+
+    def get_tool_config(self, tool_id: ToolID, port: int) -> Dict:
+        """Get the configuration of a tool that uses the given Vadalog port."""
+        tool_config = dict(profile=True) if self.profile else {}
+        if tool_id.get_dataset_type() == ToolID.VADALOG.value:
+            tool_config.update(port=port, **ensure_dict(self.vadalog_config))
+        elif tool_id == ToolID.DLVE:
+            tool_config.update(ensure_dict(self.dlve_config))
+        return tool_config
+
+
+def build_chains(
+    dataset: Dataset, tool_id: ToolID, nb_runs: int, stop_on_timeout: bool, nb_warmup_runs: int = 0
+) -> List[Chain]:
+    """
+    Build the chains of cells for a (dataset, tool) pair.
+
+    Cells are ordered as programs, then partitions, then runs, the warm-up runs first. The granularity
+    of the chains is the smallest one that preserves the stop_on_timeout semantics.
+    """
+    dataset_id_str = dataset.dataset_id.value
+    groups: List[List[Cell]] = []
+    for program_path in sorted(dataset.get_program_paths(tool_id)):
+        if stop_on_timeout and (not groups or not dataset.is_program_partitioned):
+            groups.append([])
+        for dataset_instance_path in sorted(dataset.get_dataset_paths(tool_id)):
+            if not stop_on_timeout:
+                groups.append([])
+            for run_id in range(nb_warmup_runs):
+                groups[-1].append(
+                    Cell(
+                        dataset_id_str, str(tool_id.value), program_path, dataset_instance_path,
+                        run_id, nb_warmup_runs, warmup=True,
+                    )
+                )
+            for run_id in range(nb_runs):
+                groups[-1].append(
+                    Cell(dataset_id_str, str(tool_id.value), program_path, dataset_instance_path, run_id, nb_runs)
+                )
+    return [Chain(tuple(cells), stop_on_timeout) for cells in groups if cells]
+
+
+def load_completed_results(output_dir: Path) -> Dict[CellKey, Result]:
+    """Load the results with a final status from the per-tool journals of a previous execution."""
+    completed: Dict[CellKey, Result] = {}
+    for dataset_dir in itersubdir(output_dir):
+        for tool_dir in itersubdir(dataset_dir):
+            for result in load_tool_results(tool_dir):
+                if result.status in FINAL_STATUSES:
+                    completed[get_result_key(result)] = result
+    return completed
+
+
+def resume_chain(chain: Chain, completed: Mapping[CellKey, Result], output_dir: Path) -> Optional[Chain]:
+    """
+    Remove the already completed cells from a chain.
+
+    A completed cell that stops the chain (e.g. a timeout) also discards the cells after it.
+    Warm-up runs are kept only if some runs of the same cell are left.
+    Return None if nothing is left to run.
+    """
+    remaining: List[Cell] = []
+    for cell in chain.cells:
+        if cell.warmup:
+            remaining.append(cell)
+            continue
+        result = completed.get(cell.key)
+        if result is None:
+            if cell.get_working_dir(output_dir).exists():
+                logging.info(f"Found interrupted run in {cell.get_working_dir(output_dir)}; running it again")
+            remaining.append(cell)
+            continue
+        if chain.should_stop(result):
+            break
+    left_keys = {cell.repetition_key for cell in remaining if not cell.warmup}
+    remaining = [cell for cell in remaining if cell.repetition_key in left_keys]
+    return Chain(tuple(remaining), chain.stop_on_timeout) if remaining else None
+
+
+def make_slots(nb_slots: int, working_dir: Path, base_port: int = DEFAULT_VADALOG_PORT) -> List[Slot]:
+    """Split the available CPUs in nb_slots disjoint sets."""
+    available_cpus = sorted(os.sched_getaffinity(0))
+    cpus_per_slot = len(available_cpus) // nb_slots
+    if cpus_per_slot == 0:
+        raise ValueError(f"cannot create {nb_slots} slots with {len(available_cpus)} available CPUs")
+    return [
+        Slot(
+            index,
+            tuple(available_cpus[index * cpus_per_slot:(index + 1) * cpus_per_slot]),
+            base_port + index,
+            working_dir / f"slot-{index}",
+        )
+        for index in range(nb_slots)
+    ]
+
+
+_current_slot: Optional[Slot] = None
+# the (dataset, tool) group of the last cell run by the current process
+_current_group: Optional[Tuple[str, str]] = None
+
+
+def _init_slot(slots_queue: Queue) -> None:
+    """Initialize a worker process: pin it to the slot CPUs, and move to the slot dir."""
+    global _current_slot
+    slot: Slot = slots_queue.get()
+    os.sched_setaffinity(0, slot.cpus)
+    slot.working_dir.mkdir(parents=True, exist_ok=True)
+    os.chdir(slot.working_dir)
+    os.environ["TMPDIR"] = str(slot.working_dir)
+    _current_slot = slot
+    logging.info(f"Slot {slot.index} ready: cpus={slot.cpus}, port={slot.port}, pid={os.getpid()}")
+
+
+def run_cell(cell: Cell, output_dir: Path, timeout: float, config: ExperimentConfig) -> Result:
+    """
+    Run a single cell of the experiment matrix, with the given timeout (which may be shorter than the one of the config).
+
+    The Vadalog port is the base port of the config, or the one of the current slot, if any.
+
+    With a server pool of scope 'group', the servers of the process are stopped when the (dataset, tool) group changes.
+    """
+    global _current_group
+    dataset: Dataset = dataset_registry.make(DatasetID(cell.dataset_id))
+    tool_id = ToolID(cell.tool_id)
+    tool_config = config.get_tool_config(tool_id, _current_slot.port if _current_slot is not None else config.base_port)
+    server_pool_config = ensure_dict(config.vadalog_config).get("server_pool_config")
+    group = (cell.dataset_id, cell.tool_id)
+    if server_pool_config is not None and server_pool_config.scope == "group" and group != _current_group:
+        shutdown_vadalog_servers()
+    _current_group = group
+    working_dir = cell.get_working_dir(output_dir)
+    logging.info("=" * 100)
+    logging.info(f"Time: {datetime.datetime.now()}")
+    logging.info(f"Processing dataset {cell.dataset_id}")
+    logging.info(f"Using program: {cell.program_path}")
+    logging.info(f"Run id: {cell.run_id}" + (" (warm-up)" if cell.warmup else ""))
+    logging.info(f"Working dir: {working_dir}")
+    if _current_slot is not None:
+        logging.info(f"Slot: {_current_slot.index}")
+    result = run_engine(
+        dataset.dataset_id.value,
+        cell.program_path,
+        list(cell.dataset_instance_path.iterdir()),
+        timeout,
+        str(tool_id.value),
+        tool_config=tool_config,
+        run_config=dataset.get_run_config(tool_id, cell.dataset_instance_path),
+        working_dir=working_dir,
+        force=True,
+        telemetry_config=config.telemetry_config,
+        containment_config=config.containment_config,
+    )
+    result.name = cell.dataset_id
+    result.run_id = cell.run_id
+    result.partition = cell.partition_name
+    result.program = cell.program_name
+    logging.info("Result: \n" + result.to_rows())
+    return result
+
+
+def make_skipped_result(cell: Cell, predicted_time: float) -> Result:
+    """Make the result of a cell that is not run since it is predicted to not finish."""
+    return Result(
+        name=cell.dataset_id,
+        tool=cell.tool_id,
+        timestamp=datetime.datetime.now(),
+        run_id=cell.run_id,
+        partition=cell.partition_name,
+        program=cell.program_name,
+        status=Status.SKIPPED_PREDICTED,
+        predicted_time=predicted_time,
+    )
+
+
+class Scheduler:
+    """
+    Run chains of cells, either sequentially or in parallel over isolated slots.
+
+    The predictions of the times of the cells (see ExperimentConfig) include previous_results, e.g. when resuming.
+    With a repetition_config, the chains must have max_runs runs per (program, partition) pair.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        config: ExperimentConfig,
+        nb_slots: int = 1,
+        previous_results: Iterable[Result] = (),
+    ):
+        assert nb_slots > 0
+        self.output_dir = output_dir
+        self.config = config
+        self.nb_slots = nb_slots
+        self._predictors: Dict[SeriesKey, ScalingPredictor] = {}
+        self._repetitions: Dict[RepetitionKey, RepetitionState] = {}
+        for result in sorted(previous_results, key=attrgetter("run_id")):
+            self._observe(get_result_key(result)[:4], result)
+
+    def _observe(self, repetition_key: RepetitionKey, result: Result) -> None:
+        series, size = get_series(*repetition_key, is_program_partitioned=is_program_partitioned(repetition_key[0]))
+        if series is not None:
+            self._predictors.setdefault(series, ScalingPredictor()).observe(size, result)
+        if self.config.repetition_config is not None:
+            repetition = self._repetitions.setdefault(repetition_key, RepetitionState(self.config.repetition_config))
+            repetition.add(result)
+            result.median_ci_low, result.median_ci_high = repetition.ci or (None, None)
+
+    def _is_repetition_done(self, cell: Cell) -> bool:
+        repetition = self._repetitions.get(cell.repetition_key)
+        return repetition is not None and repetition.is_done()
+
+    def _plan_cell(self, cell: Cell) -> Tuple[Optional[float], Optional[float]]:
+        """Return the timeout of a cell (None if it must be skipped) and its predicted time."""
+        series, size = cell.series
+        if self.config.prediction_config is None or series not in self._predictors:
+            return self.config.timeout, None
+        predicted_time = self._predictors[series].predict(size)
+        budget = self.config.timeout * self.config.prediction_config.margin
+        if predicted_time is None or predicted_time <= budget:
+            return self.config.timeout, predicted_time
+        logging.info(f"Predicted time {predicted_time:.3f} for {cell.key} exceeds the budget {budget:.3f}")
+        if self.config.prediction_config.predicted_timeout is None:
+            return None, predicted_time
+        return min(self.config.timeout, self.config.prediction_config.predicted_timeout), predicted_time
+
+    def run(self, chains: Sequence[Chain], on_result: Callable[[Cell, Result], None]) -> None:
+        """
+        Run the chains.
+
+        on_result is called in the current process once per finished cell, except for warm-up runs.
+        A KeyboardInterrupt is raised if a run has been interrupted.
+        """
+        if self.nb_slots == 1:
+            self._run_sequential(chains, on_result)
+        else:
+            self._run_parallel(chains, on_result)
+
+    def _handle_result(self, chain: Chain, cell: Cell, result: Result, on_result: Callable) -> bool:
+        """Handle a result; return True if the chain must be stopped."""
+        if result.status == Status.INTERRUPTED:
+            if not cell.warmup:
+                on_result(cell, result)
+            raise KeyboardInterrupt
+        if cell.warmup:
+            return False
+        self._observe(cell.repetition_key, result)
+        on_result(cell, result)
+        if chain.should_stop(result):
+            logging.info(f"Stop on timeout, status={result.status}")
+            logging.info("Skipping bigger partitions/programs since stop_on_timeout=True")
+            return True
+        if self._is_repetition_done(cell):
+            ci = (result.median_ci_low, result.median_ci_high)
+            logging.info(f"Repetitions done for {cell.repetition_key}, median time CI: {ci}")
+        return False
+
+    def _next_run(self, chain: Chain, index: int, on_result: Callable) -> Optional[Tuple[int, float, Optional[float]]]:
+        """
+        Get the next cell of the chain to run, from index: its index, its timeout and its predicted time.
+
+        Cells that are skipped are handled here. Return None if the chain is over.
+        """
+        for index in range(index, len(chain.cells)):
+            cell = chain.cells[index]
+            if self._is_repetition_done(cell):
+                continue
+            timeout, predicted_time = self._plan_cell(cell)
+            if timeout is not None:
+                return index, timeout, predicted_time
+            if cell.warmup:
+                continue
+            if self._handle_result(chain, cell, make_skipped_result(cell, predicted_time), on_result):
+                return None
+        return None
+
+    def _run_sequential(self, chains: Sequence[Chain], on_result: Callable) -> None:
+        for chain in chains:
+            next_run = self._next_run(chain, 0, on_result)
+            while next_run is not None:
+                index, timeout, predicted_time = next_run
+                cell = chain.cells[index]
+                result = run_cell(cell, self.output_dir, timeout, self.config)
+                result.predicted_time = predicted_time
+                if self._handle_result(chain, cell, result, on_result):
+                    break
+                next_run = self._next_run(chain, index + 1, on_result)
+
+    def _run_parallel(self, chains: Sequence[Chain], on_result: Callable) -> None:
+        with tempfile.TemporaryDirectory(prefix="benchmark-slots-") as slots_dir:
+            slots = make_slots(self.nb_slots, Path(slots_dir), self.config.base_port)
+            slots_queue: Queue = Queue()
+            for slot in slots:
+                slots_queue.put(slot)
+            logging.info(f"Running on {len(slots)} slots: {[slot.cpus for slot in slots]}")
+
+            pending_chains = list(reversed(chains))
+            in_flight: Dict[Future, Tuple[Chain, int, Optional[float]]] = {}
+            executor = ProcessPoolExecutor(
+                max_workers=self.nb_slots, initializer=_init_slot, initargs=(slots_queue,)
+            )
+
+            def submit(chain: Chain, index: int) -> None:
+                next_run = self._next_run(chain, index, on_result)
+                if next_run is None:
+                    return
+                index, timeout, predicted_time = next_run
+                future = executor.submit(run_cell, chain.cells[index], self.output_dir, timeout, self.config)
+                in_flight[future] = (chain, index, predicted_time)
+
+            try:
+                while pending_chains or in_flight:
+                    while pending_chains and len(in_flight) < self.nb_slots:
+                        submit(pending_chains.pop(), 0)
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        chain, index, predicted_time = in_flight.pop(future)
+                        cell = chain.cells[index]
+                        result = future.result()
+                        result.predicted_time = predicted_time
+                        if self._handle_result(chain, cell, result, on_result):
+                            continue
+                        submit(chain, index + 1)
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
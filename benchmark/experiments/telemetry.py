@@ -0,0 +1,166 @@
+"""Resource telemetry of the process tree of a run."""
+import dataclasses
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import psutil
+
+DEFAULT_SAMPLING_INTERVAL = 0.1
+
+
+@dataclasses.dataclass(frozen=True)
+class TelemetryConfig:
+    sampling_interval: float = DEFAULT_SAMPLING_INTERVAL
+    save_time_series: bool = False
+
+    def __post_init__(self):
+        assert self.sampling_interval > 0.0
+
+
+class _Counters(NamedTuple):
+    cpu_user: float = 0.0
+    cpu_system: float = 0.0
+    read_bytes: int = 0
+    write_bytes: int = 0
+
+    def __sub__(self, other: "_Counters") -> "_Counters":
+        return _Counters(*(a - b for a, b in zip(self, other)))
+
+
+@dataclasses.dataclass(frozen=True)
+class TelemetrySample:
+    time: float
+    rss: int
+    cpu_user: float
+    cpu_system: float
+    read_bytes: int
+    write_bytes: int
+    nb_threads: int
+
+    @staticmethod
+    def headers() -> str:
+        return "time\trss\tcpu_user\tcpu_system\tread_bytes\twrite_bytes\tnb_threads"
+
+    def __str__(self):
+        return (
+            f"{self.time:.6f}\t"
+            f"{self.rss}\t"
+            f"{self.cpu_user:.6f}\t"
+            f"{self.cpu_system:.6f}\t"
+            f"{self.read_bytes}\t"
+            f"{self.write_bytes}\t"
+            f"{self.nb_threads}"
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class TelemetrySummary:
+    peak_rss: int
+    mean_rss: int
+    cpu_user: float
+    cpu_system: float
+    read_bytes: int
+    write_bytes: int
+    peak_threads: int
+
+
+def _read_counters(process: psutil.Process) -> _Counters:
+    cpu_times = process.cpu_times()
+    try:
+        io_counters = process.io_counters()
+        read_bytes, write_bytes = io_counters.read_bytes, io_counters.write_bytes
+    except (psutil.AccessDenied, AttributeError):
+        read_bytes, write_bytes = 0, 0
+    return _Counters(cpu_times.user, cpu_times.system, read_bytes, write_bytes)
+
+
+class ProcessTreeSampler(threading.Thread):
+    """
+    Periodically sample the resource usage of a process tree.
+
+    The tree is made of the root process and all its descendants, plus the extra
+    processes (e.g. a server started outside the tree). For the extra processes,
+    only the usage since the start of the sampler is accounted.
+    CPU times and I/O bytes of a process are the last values observed for it,
+    hence processes shorter than the sampling interval might be missed.
+    Without a root process, only the extra processes are sampled.
+    """
+
+    def __init__(self, root_pid: Optional[int], extra_pids: Sequence[int] = (), interval: float = DEFAULT_SAMPLING_INTERVAL):
+        super().__init__(name=f"sampler-{root_pid}", daemon=True)
+        self.root_pid = root_pid
+        self.extra_pids = list(extra_pids)
+        self.interval = interval
+        self.samples: List[TelemetrySample] = []
+        self._stop_event = threading.Event()
+        self._start_time = time.perf_counter()
+        self._baselines: Dict[int, _Counters] = {}
+        self._last_counters: Dict[int, _Counters] = {}
+        for pid in self.extra_pids:
+            try:
+                self._baselines[pid] = _read_counters(psutil.Process(pid))
+            except psutil.Error:
+                pass
+
+    def _get_processes(self) -> List[psutil.Process]:
+        processes = []
+        if self.root_pid is not None:
+            try:
+                root = psutil.Process(self.root_pid)
+                processes += [root, *root.children(recursive=True)]
+            except psutil.NoSuchProcess:
+                pass
+        for pid in self.extra_pids:
+            try:
+                processes.append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                pass
+        return processes
+
+    def sample(self) -> None:
+        rss = 0
+        nb_threads = 0
+        for process in self._get_processes():
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    nb_threads += process.num_threads()
+                    self._last_counters[process.pid] = _read_counters(process)
+            except psutil.Error:
+                continue
+        totals = _Counters()
+        for pid, counters in self._last_counters.items():
+            delta = counters - self._baselines.get(pid, _Counters())
+            totals = _Counters(*(a + b for a, b in zip(totals, delta)))
+        self.samples.append(
+            TelemetrySample(time.perf_counter() - self._start_time, rss, *totals, nb_threads)
+        )
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> Optional[TelemetrySummary]:
+        """Stop the sampler and summarize the samples (None if there are no samples)."""
+        self._stop_event.set()
+        self.join()
+        if len(self.samples) == 0:
+            return None
+        last = self.samples[-1]
+        return TelemetrySummary(
+            peak_rss=max(sample.rss for sample in self.samples),
+            mean_rss=int(sum(sample.rss for sample in self.samples) / len(self.samples)),
+            cpu_user=last.cpu_user,
+            cpu_system=last.cpu_system,
+            read_bytes=last.read_bytes,
+            write_bytes=last.write_bytes,
+            peak_threads=max(sample.nb_threads for sample in self.samples),
+        )
+
+    def save_time_series(self, output: Path) -> None:
+        content = TelemetrySample.headers() + "\n"
+        content += "".join(str(sample) + "\n" for sample in self.samples)
+        output.write_text(content)
@@ -0,0 +1,164 @@
+"""A queue of chains shared by several workers (processes or hosts), with lock files in the output dir."""
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+
+from benchmark.experiments.scheduler import Chain
+
+QUEUE_DIRNAME = "queue"
+DEFAULT_LEASE_TTL = 120.0
+
+_LEASE_SUFFIX = ".lease"
+_DONE_SUFFIX = ".done"
+
+
+def get_default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def get_chain_id(chain: Chain) -> str:
+    """Get an identifier of a chain that is the same for all the workers that build the same matrix."""
+    content = "\n".join(f"{cell.key} {cell.warmup}" for cell in chain.cells)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class WorkQueue:
+    """
+    A queue of chains, drained by any number of workers.
+
+    A worker claims a chain by creating its lease file exclusively, and renews the lease
+    by touching it periodically. A lease not renewed for lease_ttl seconds (e.g. the worker
+    crashed) is expired, and the chain can be claimed by another worker. A finished chain
+    has a done file. Only atomic file operations are used (O_EXCL creation, rename), so the
+    queue can be shared over a network filesystem; clocks are assumed to be synchronized
+    well within lease_ttl.
+    """
+
+    def __init__(self, queue_dir: Path, worker_id: str, lease_ttl: float = DEFAULT_LEASE_TTL):
+        assert lease_ttl > 0.0
+        self.queue_dir = queue_dir
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="heartbeat", daemon=True)
+
+    def _lease_path(self, chain_id: str) -> Path:
+        return self.queue_dir / (chain_id + _LEASE_SUFFIX)
+
+    def _done_path(self, chain_id: str) -> Path:
+        return self.queue_dir / (chain_id + _DONE_SUFFIX)
+
+    def is_done(self, chain: Chain) -> bool:
+        return self._done_path(get_chain_id(chain)).exists()
+
+    def _is_expired(self, path: Path) -> bool:
+        return time.time() - path.stat().st_mtime > self.lease_ttl
+
+    def _create_lease(self, chain_id: str) -> bool:
+        token = f"{self.worker_id} {uuid.uuid4().hex}"
+        try:
+            fd = os.open(self._lease_path(chain_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        try:
+            os.write(fd, token.encode("utf-8"))
+        finally:
+            os.close(fd)
+        with self._lock:
+            self._tokens[chain_id] = token
+        return True
+
+    def _break_expired_lease(self, chain_id: str) -> None:
+        """Remove the lease of a chain if it is expired; if another worker just renewed it, put it back."""
+        lease_path = self._lease_path(chain_id)
+        stale_path = lease_path.with_name(f"{lease_path.name}.{uuid.uuid4().hex}")
+        try:
+            if not self._is_expired(lease_path):
+                return
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return
+        if not self._is_expired(stale_path):
+            try:
+                os.link(stale_path, lease_path)
+            except FileExistsError:
+                pass
+        else:
+            logging.info(f"Lease of chain {chain_id} expired ({stale_path.read_text()})")
+        stale_path.unlink()
+
+    def try_claim(self, chain: Chain) -> bool:
+        chain_id = get_chain_id(chain)
+        if self._done_path(chain_id).exists():
+            return False
+        if self._create_lease(chain_id):
+            return True
+        self._break_expired_lease(chain_id)
+        return self._create_lease(chain_id)
+
+    def release(self, chain: Chain, done: bool) -> None:
+        """Release the lease of a chain; if done, the chain is not claimed anymore."""
+        chain_id = get_chain_id(chain)
+        if done:
+            self._done_path(chain_id).write_text(self.worker_id)
+        with self._lock:
+            token = self._tokens.pop(chain_id, None)
+        lease_path = self._lease_path(chain_id)
+        try:
+            if lease_path.read_text() == token:
+                lease_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _renew_leases(self) -> None:
+        while not self._stop_event.wait(self.lease_ttl / 4):
+            with self._lock:
+                tokens = dict(self._tokens)
+            for chain_id, token in tokens.items():
+                lease_path = self._lease_path(chain_id)
+                try:
+                    if lease_path.read_text() != token:
+                        raise FileNotFoundError
+                    os.utime(lease_path)
+                except FileNotFoundError:
+                    logging.warning(f"Lease of chain {chain_id} lost; its runs might be run twice")
+                    with self._lock:
+                        self._tokens.pop(chain_id, None)
+
+    def drain(self, chains: Sequence[Chain], run_chain: Callable[[Chain], None]) -> None:
+        """
+        Claim and run chains until all of them are done.
+
+        When no chain can be claimed, wait for the chains leased by other workers to be done,
+        or for their leases to expire.
+        """
+        self._heartbeat.start()
+        try:
+            while True:
+                pending = [chain for chain in chains if not self.is_done(chain)]
+                if not pending:
+                    break
+                chain: Optional[Chain] = next((chain for chain in pending if self.try_claim(chain)), None)
+                if chain is None:
+                    logging.info(f"{len(pending)} chains leased by other workers; waiting")
+                    time.sleep(self.lease_ttl / 4)
+                    continue
+                logging.info(f"Worker {self.worker_id} claimed chain {get_chain_id(chain)}")
+                done = False
+                try:
+                    run_chain(chain)
+                    done = True
+                finally:
+                    self.release(chain, done)
+        finally:
+            self._stop_event.set()
+            self._heartbeat.join()
@@ -3,12 +3,16 @@ from typing import Dict
 import matplotlib
 
 from benchmark.datasets import DatasetID
+from benchmark.experiments.core import Status
 from benchmark.tools import ToolID
 
 DLV = "dlv"
 RDFOX = "rdfox"
 LLUNATIC = "llunatic"
 
+# the statuses of the runs without a time, plotted at the timeout
+CENSORED_STATUSES = {Status.TIMEOUT.value, Status.OUT_OF_MEMORY.value, Status.SKIPPED_PREDICTED.value}
+
 
 def setup_matplotlib():
     matplotlib.rcParams["ps.useafm"] = True
@@ -8,7 +8,7 @@ from benchmark import DATASETS_DIR
 from benchmark.datasets import DatasetID
 from benchmark.experiments.core import Status
 from benchmark.log_parsing import load_results
-from benchmark.plots.base import setup_matplotlib, COLORS, MARKERS
+from benchmark.plots.base import setup_matplotlib, COLORS, MARKERS, CENSORED_STATUSES
 
 setup_matplotlib()
 
@@ -55,7 +55,7 @@ def has_ancestor_plot(results_dir: str, output_dir: str, timeout: int):
             else:
                 query_df = by_query[query]
                 statuses = query_df["status"].unique()
-                if Status.TIMEOUT.value in statuses:
+                if CENSORED_STATUSES.intersection(statuses):
                     mean_time = timeout
                 else:
                     assert statuses == [Status.SUCCESS.value]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+from pathlib import Path
+from typing import List
+
+import click
+import matplotlib.pyplot as plt
+import numpy as np
+
+from benchmark.datasets.core import ALL_DATASET_IDS
+from benchmark.experiments.core import PHASE_COLUMNS, Status
+from benchmark.log_parsing import load_results
+from benchmark.plots.base import setup_matplotlib, TOOL_NAMES, DATASET_NAMES
+from benchmark.utils.base import remove_dir_or_fail
+
+setup_matplotlib()
+
+
+PHASE_NAMES = {
+    "time_parse": "Parsing",
+    "time_rewrite": "Rewriting/planning",
+    "time_reason": "Reasoning",
+    "time_output": "Output",
+    "time_overhead": "Overhead",
+}
+
+PHASE_COLORS = {
+    "time_parse": "gold",
+    "time_rewrite": "violet",
+    "time_reason": "dodgerblue",
+    "time_output": "seagreen",
+    "time_overhead": "lightgrey",
+}
+
+
+@click.command("phases-plot")
+@click.argument(
+    "results-dir", type=click.Path(exists=True, file_okay=False, dir_okay=True)
+)
+@click.option("--output-dir", type=click.Path(file_okay=False, dir_okay=True), default="output")
+@click.option(
+    "--dataset",
+    type=click.Choice(ALL_DATASET_IDS),
+    required=True,
+    multiple=True
+)
+def phases_plot(results_dir: str, output_dir: str, dataset: List[str]):
+    """Plot, for each dataset and tool, the median time of each engine phase, stacked, per partition and program."""
+    results_dir = Path(results_dir)
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        remove_dir_or_fail(output_dir, True)
+    output_dir.mkdir(parents=True)
+
+    allowed_datasets = set(dataset)
+
+    df = load_results(results_dir)
+    missing_columns = set(PHASE_COLUMNS).difference(df.columns)
+    if missing_columns:
+        raise click.ClickException(f"results do not have the phase columns {sorted(missing_columns)}")
+    df = df[df["status"] == Status.SUCCESS.value].copy()
+    df[list(PHASE_COLUMNS)] = df[list(PHASE_COLUMNS)].fillna(0.0)
+    # the time spent outside the engine: process start-up, HTTP round trip, answer parsing
+    df["time_overhead"] = (df["time_end2end"] - df["time_engine"]).clip(lower=0.0).fillna(0.0)
+    phases = [*PHASE_COLUMNS, "time_overhead"]
+
+    for dataset, dataset_df in df.groupby("name"):
+        if dataset not in allowed_datasets:
+            print(f"dataset {dataset} not chosen; skipping...")
+            continue
+        for tool, tool_df in dataset_df.groupby("tool"):
+            medians = tool_df.groupby(["partition", "program"])[phases].median().sort_index()
+            labels = [f"{partition}/{program}" for partition, program in medians.index]
+            x_axis = np.arange(len(labels))
+            bottom = np.zeros(len(labels))
+            for phase in phases:
+                plt.bar(x_axis, medians[phase], bottom=bottom, label=PHASE_NAMES[phase], color=PHASE_COLORS[phase])
+                bottom += medians[phase].to_numpy()
+
+            output_file = output_dir / f"{dataset}-{tool}"
+            plt.xticks(x_axis, labels=labels, rotation=45, ha="right")
+            plt.legend(loc="upper left")
+            plt.xlabel("Partition/program")
+            plt.ylabel("Median time (seconds)")
+            plt.title(f"{DATASET_NAMES.get(dataset, dataset)}, {TOOL_NAMES.get(tool, tool)}")
+            plt.grid(axis="y")
+            plt.savefig(output_file.with_suffix(".pdf"), bbox_inches="tight")
+            plt.savefig(output_file.with_suffix(".svg"), bbox_inches="tight")
+            plt.clf()
+
+
+if __name__ == "__main__":
+    phases_plot()
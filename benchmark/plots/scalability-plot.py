@@ -11,7 +11,7 @@ from benchmark.datasets import dataset_registry
 from benchmark.datasets.core import ALL_DATASET_IDS
 from benchmark.experiments.core import Status
 from benchmark.log_parsing import load_results
-from benchmark.plots.base import setup_matplotlib, COLORS, MARKERS, TOOL_NAMES, DATASET_NAMES
+from benchmark.plots.base import setup_matplotlib, COLORS, MARKERS, TOOL_NAMES, DATASET_NAMES, CENSORED_STATUSES
 from benchmark.utils.base import remove_dir_or_fail, itersubdir, human_format
 
 setup_matplotlib()
@@ -83,7 +83,7 @@ def scalability_plot(results_dir: str, output_dir: str, dataset: List[str], time
                     partition_times = []
                     for program, program_df in partition_df.groupby("program"):
                         statuses = program_df["status"].unique()
-                        if Status.TIMEOUT.value in statuses:
+                        if CENSORED_STATUSES.intersection(statuses):
                             median_time = timeout
                         else:
                             assert statuses == [Status.SUCCESS.value]
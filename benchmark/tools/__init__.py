@@ -1,5 +1,5 @@
 from benchmark.tools.core import ToolID, ToolRegistry
-from benchmark.tools.dlve import DLVE_WRAPPER_PATH, DlvTool
+from benchmark.tools.dlve import DEFAULT_DLVE_BINARY_PATH, DlvTool
 from benchmark.tools.vadalog import VADALOG_WRAPPER_PATH, VadalogTool
 
 tool_registry = ToolRegistry()
@@ -43,5 +43,5 @@ tool_registry.register(
 tool_registry.register(
     ToolID.DLVE,
     item_cls=DlvTool,
-    binary_path=DLVE_WRAPPER_PATH,
+    binary_path=DEFAULT_DLVE_BINARY_PATH,
 )
@@ -1,4 +1,5 @@
 import contextlib
+import dataclasses
 import datetime
 import logging
 from abc import ABC, abstractmethod
@@ -7,7 +8,9 @@ from operator import attrgetter
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from benchmark.experiments.core import Status, Result, run_cli
+from benchmark.experiments.containment import Container, ContainmentConfig
+from benchmark.experiments.core import OutputFilter, Status, Result, run_cli
+from benchmark.experiments.telemetry import TelemetryConfig
 from benchmark.registry import ItemRegistry
 from benchmark.utils.base import ensure_dict
 
@@ -33,6 +36,9 @@ ALL_TOOL_IDS = tuple(map(attrgetter("value"), ToolID))
 class Tool(ABC):
     """Interface for tools."""
 
+    # whether the stderr of a run is written to its stdout file, e.g. because statistics are printed on stderr
+    merge_stderr: bool = False
+
     def __init__(self, tool_id: ToolID, binary_path: str):
         """
         Initialize the tool.
@@ -60,6 +66,8 @@ class Tool(ABC):
         cwd: Optional[str] = None,
         name: Optional[str] = None,
         working_dir: Optional[str] = None,
+        telemetry_config: Optional[TelemetryConfig] = None,
+        containment_config: Optional[ContainmentConfig] = None,
     ) -> Result:
         """
         Apply the tool to a file.
@@ -71,6 +79,8 @@ class Tool(ABC):
         :param cwd: the current working directory
         :param name: the experiment name
         :param working_dir: the working dir
+        :param telemetry_config: the telemetry configuration; if None, no telemetry is collected
+        :param containment_config: the limits for the run; if None, the run is not contained
         :return: the planning result
         """
         run_config = ensure_dict(run_config)
@@ -79,9 +89,22 @@ class Tool(ABC):
         stdout_file = Path(working_dir) / "stdout.txt"
         stderr_file = Path(working_dir) / "stderr.txt"
         timestamp = datetime.datetime.now()
-        returncode, total, timed_out, interrupted = run_cli(args, timeout, cwd, logging, stdout_file, stderr_file)
-
-        result = self.collect_statistics(stdout_file.read_text())
+        container = Container(containment_config, "run", timeout) if containment_config is not None else None
+        returncode, total, timed_out, interrupted, telemetry_summary, containment_usage = run_cli(
+            args,
+            timeout,
+            cwd,
+            logging,
+            stdout_file,
+            stderr_file,
+            telemetry_config=telemetry_config,
+            extra_pids=self.get_extra_pids(),
+            container=container,
+            stdout_filter=self.get_stdout_filter(),
+            merge_stderr=self.merge_stderr,
+        )
+
+        result = self.collect_statistics_from_file(stdout_file)
         result.name = name
         result.tool = self.tool_id.value
         result.timestamp = timestamp
@@ -91,8 +114,22 @@ class Tool(ABC):
         if result.time_end2end is None:
             result.time_end2end = total
 
+        if telemetry_summary is not None:
+            for field in dataclasses.fields(telemetry_summary):
+                setattr(result, field.name, getattr(telemetry_summary, field.name))
+
+        if containment_usage is not None:
+            result.cgroup_memory_peak = containment_usage.memory_peak
+            result.cgroup_cpu_usage = containment_usage.cpu_usage
+            result.oom_kills = containment_usage.oom_kills
+        # an OOM kill in the cgroup (e.g. of a helper process) does not fail a run that exited cleanly
+        run_failed = timed_out or returncode != 0
+        out_of_memory = (result.oom_kills is not None and result.oom_kills > 0) or self.is_out_of_memory()
+
         if interrupted:
             result.status = Status.INTERRUPTED
+        elif run_failed and out_of_memory:
+            result.status = Status.OUT_OF_MEMORY
         elif timed_out:
             result.status = Status.TIMEOUT
         elif result.status is None or returncode != 0:
@@ -109,6 +146,14 @@ class Tool(ABC):
         :return: statistics
         """
 
+    def collect_statistics_from_file(self, output_file: Path) -> Result:
+        """Collect statistics from the output file; override to avoid loading big outputs in memory."""
+        return self.collect_statistics(output_file.read_text())
+
+    def get_stdout_filter(self) -> Optional[OutputFilter]:
+        """Get a filter of the stdout of the next run, e.g. to count the answers without writing them."""
+        return None
+
     @abstractmethod
     def get_cli_args(
         self,
@@ -119,15 +164,23 @@ class Tool(ABC):
     ) -> List[str]:
         """Get CLI arguments."""
 
-    def start_session(self, working_dir: Path) -> None:
+    def get_extra_pids(self) -> List[int]:
+        """Get the PIDs of the processes, outside the process tree of a run, that serve the run."""
+        return []
+
+    def is_out_of_memory(self) -> bool:
+        """Check whether a process serving the last run has been killed for lack of memory."""
+        return False
+
+    def start_session(self, working_dir: Path, containment_config: Optional[ContainmentConfig] = None) -> None:
         """Start session."""
 
     def end_session(self) -> None:
         """End session."""
 
     @contextlib.contextmanager
-    def session(self, working_dir: Path):
-        self.start_session(working_dir)
+    def session(self, working_dir: Path, containment_config: Optional[ContainmentConfig] = None):
+        self.start_session(working_dir, containment_config)
         yield
         self.end_session()
 
@@ -1,14 +1,162 @@
+import logging
 import re
+import shutil
 from pathlib import Path
 from typing import Dict, List, Optional
 
 from benchmark import ROOT_DIR
-from benchmark.tools.core import Tool
-from benchmark.experiments.core import Status, Result
+from benchmark.experiments.containment import ContainmentConfig
+from benchmark.experiments.telemetry import TelemetryConfig
+from benchmark.tools.core import Tool, ToolID
+from benchmark.experiments.core import OutputFilter, Status, Result
+from benchmark.tools.resultset import DEFAULT_READ_SIZE, HASH_MODULUS, format_hash, hash_bytes
+from benchmark.utils.profiling import PERF_DATA_FILENAME, PROFILE_REPORT_FILENAME, get_perf_record_args, \
+    is_perf_available, write_perf_report
 
 DEFAULT_DLVE_ROOT = ROOT_DIR / "third_party" / "TOCL_dlvEx"
 DLVE_WRAPPER_PATH = ROOT_DIR / "bin" / "dlve-wrapper"
 DEFAULT_DLVE_BINARY_PATH = DEFAULT_DLVE_ROOT / "dlvExists"
+PROGRAM_FILENAME = "program.rul"
+
+# top-level (i.e. not indented) lines of the -stats++ block, e.g. "Instantiation time        : 0.331018"
+_STATS_LINE_REGEX = re.compile(r"^(\S[^:\n]*?)\s*:\s*([0-9.]+)s?\s*$", re.MULTILINE)
+_QUERY_ANSWERING_TIME_REGEX = re.compile(r"^Query Answering Time: ([0-9.]+) sec", re.MULTILINE)
+_REWRITING_STATS = ("Rewriting-Basic", "Rewriting-Projection", "SubsumptionChecking", "Magic Set rewriting")
+
+# the answers (one per line, then an empty line) are between the end of the -stats++ block and the query answering time
+_ANSWERS_BEGIN = b"for further information.)\n"
+_ANSWERS_END = b"Query Answering"
+_BEFORE_ANSWERS, _IN_ANSWERS, _AFTER_ANSWERS = range(3)
+
+
+def parse_statistics(output: str) -> Dict[str, float]:
+    """Parse the top-level entries of the -stats++ block, and the query answering time, of dlvExists."""
+    stats = {key: float(value) for key, value in _STATS_LINE_REGEX.findall(output)}
+    match = _QUERY_ANSWERING_TIME_REGEX.search(output)
+    if match is not None:
+        stats["Query Answering Time"] = float(match.group(1))
+    return stats
+
+
+def set_phases(result: Result, stats: Dict[str, float]) -> None:
+    """Set the phase fields of a result from the -stats++ entries."""
+    result.time_parse = stats.get("Parsing")
+    if all(key in stats for key in _REWRITING_STATS):
+        result.time_rewrite = sum(stats[key] for key in _REWRITING_STATS)
+    result.time_grounding = stats.get("Instantiation time")
+    result.time_model_generation = stats.get("Model Generator time")
+    if result.time_grounding is not None and result.time_model_generation is not None:
+        result.time_reason = result.time_grounding + result.time_model_generation + stats.get("Model Checker time", 0.0)
+    result.time_output = stats.get("Query Answering Time")
+    if "Time for all answer sets" in stats:
+        result.time_engine = stats["Time for all answer sets"] + stats.get("Query Answering Time", 0.0)
+    if "Atoms generated" in stats:
+        result.nb_derived_atoms = int(stats["Atoms generated"])
+
+
+def get_dlve_command(program: Path, datasets: List[Path], binary_path: Path = DEFAULT_DLVE_BINARY_PATH) -> List[str]:
+    """
+    Get the command that answers the query of a program with dlvExists (cautious reasoning, with statistics).
+
+    The program and the datasets are given by absolute paths, so that the command can run in any working directory.
+    """
+    return [
+        str(binary_path),
+        str(program.absolute()),
+        *(str(dataset.absolute()) for dataset in datasets),
+        "-cautious",
+        "-stats++",
+    ]
+
+
+class AnswerScanner(OutputFilter):
+    """
+    Count (and optionally hash) the answers in the output of dlvExists, in a single pass over chunks of the output.
+
+    Only complete lines are scanned; the text outside the answers (the statistics) is kept, for parse_statistics.
+    As an OutputFilter, it passes everything through, except the answers if keep_answers is False.
+    """
+
+    def __init__(self, compute_hash: bool = False, keep_answers: bool = True):
+        self.compute_hash = compute_hash
+        self.keep_answers = keep_answers
+        self._state = _BEFORE_ANSWERS
+        self._pending = b""
+        self._text = bytearray()
+        self._nb_lines = 0
+        self._last_line_empty = False
+        self._hash = 0
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._pending + data
+        end = data.rfind(b"\n") + 1
+        self._pending = data[end:]
+        return self._scan(data[:end])
+
+    def close(self) -> bytes:
+        data, self._pending = self._pending, b""
+        if not data:
+            return b""
+        output = self._scan(data + b"\n")
+        return output[:-1] if output.endswith(b"\n") else output
+
+    def _scan(self, lines: bytes) -> bytes:
+        output = []
+        if self._state == _BEFORE_ANSWERS:
+            index = lines.find(_ANSWERS_BEGIN)
+            if index < 0:
+                self._text += lines
+                return lines
+            index += len(_ANSWERS_BEGIN)
+            self._text += lines[:index]
+            output.append(lines[:index])
+            lines = lines[index:]
+            self._state = _IN_ANSWERS
+        if self._state == _IN_ANSWERS:
+            index = 0 if lines.startswith(_ANSWERS_END) else lines.find(b"\n" + _ANSWERS_END)
+            if index > 0:
+                index += 1
+            answers = lines if index < 0 else lines[:index]
+            self._count(answers)
+            if self.keep_answers:
+                output.append(answers)
+            if index < 0:
+                return b"".join(output)
+            lines = lines[index:]
+            self._state = _AFTER_ANSWERS
+        self._text += lines
+        output.append(lines)
+        return b"".join(output)
+
+    def _count(self, answers: bytes) -> None:
+        if not answers:
+            return
+        self._nb_lines += answers.count(b"\n")
+        self._last_line_empty = answers == b"\n" or answers.endswith(b"\n\n")
+        if self.compute_hash:
+            for line in answers.split(b"\n"):
+                if line:
+                    self._hash = (self._hash + hash_bytes(line)) % HASH_MODULUS
+
+    @property
+    def nb_answers(self) -> Optional[int]:
+        """The number of answers; None if the answers did not end."""
+        if self._state != _AFTER_ANSWERS:
+            return None
+        # the answers are followed by an empty line
+        return self._nb_lines - (1 if self._last_line_empty else 0)
+
+    @property
+    def answer_hash(self) -> Optional[str]:
+        """An order-independent hash of the (non-empty) answer lines, if requested and the answers ended."""
+        if not self.compute_hash or self._state != _AFTER_ANSWERS:
+            return None
+        return format_hash(self._hash)
+
+    @property
+    def text(self) -> str:
+        """The output, without the answers."""
+        return self._text.decode("utf-8", errors="replace")
 
 
 class DlvTool(Tool):
@@ -16,22 +164,82 @@ class DlvTool(Tool):
 
     NAME = "DLVE^E"
 
-    def collect_statistics(self, output: str) -> Result:
-        qa_time = re.search("Query Answering Time", output)
-        status = Status.SUCCESS if qa_time else Status.ERROR
+    # dlvExists writes the answers to stdout, and the statistics to stderr: they are parsed together
+    merge_stderr = True
 
-        result = re.search(
-            "for further information\.\)\n(.*)\nQuery Answering",
-            output,
-            re.DOTALL | re.MULTILINE,
+    def __init__(
+        self,
+        tool_id: ToolID,
+        binary_path: str,
+        profile: bool = False,
+        hash_answers: bool = False,
+        pipe_stdout: bool = False,
+    ) -> None:
+        super().__init__(tool_id, binary_path)
+        # if set, and perf is available, each run is recorded with perf
+        self.profile = profile
+        self.hash_answers = hash_answers
+        # if set, the answers are counted from a pipe, and not written to stdout.txt
+        self.pipe_stdout = pipe_stdout
+        self._stdout_scanner: Optional[AnswerScanner] = None
+        if profile and not is_perf_available():
+            logging.warning("perf is not available: the runs are not profiled")
+
+    @property
+    def uses_perf(self) -> bool:
+        return self.profile and is_perf_available()
+
+    def run(
+        self,
+        program: Path,
+        datasets: List[Path],
+        run_config: Optional[Dict] = None,
+        timeout: float = 20.0,
+        cwd: Optional[str] = None,
+        name: Optional[str] = None,
+        working_dir: Optional[str] = None,
+        telemetry_config: Optional[TelemetryConfig] = None,
+        containment_config: Optional[ContainmentConfig] = None,
+    ) -> Result:
+        if cwd is None:
+            # dlvExists is built with gprof instrumentation: its gmon.out is written next to the output of the run
+            cwd = working_dir
+        result = super().run(
+            program, datasets, run_config, timeout, cwd, name, working_dir, telemetry_config, containment_config
         )
-        if result is not None:
-            atoms_string = result.group(1)
-            atoms = atoms_string.splitlines()
-            nb_atoms = len(atoms)
-        else:
-            nb_atoms = None
-        return Result(status=status, nb_atoms=nb_atoms)
+        perf_data_file = Path(working_dir) / PERF_DATA_FILENAME
+        if self.uses_perf and perf_data_file.exists():
+            if write_perf_report(perf_data_file, Path(working_dir) / PROFILE_REPORT_FILENAME):
+                logging.info(f"Profile report written to {Path(working_dir) / PROFILE_REPORT_FILENAME}")
+        return result
+
+    def get_stdout_filter(self) -> Optional[OutputFilter]:
+        self._stdout_scanner = AnswerScanner(self.hash_answers, keep_answers=False) if self.pipe_stdout else None
+        return self._stdout_scanner
+
+    def collect_statistics(self, output: str) -> Result:
+        scanner = AnswerScanner(self.hash_answers)
+        scanner.feed(output.encode("utf-8"))
+        scanner.close()
+        return self._collect_statistics(scanner)
+
+    def collect_statistics_from_file(self, output_file: Path) -> Result:
+        scanner = self._stdout_scanner
+        if scanner is None:
+            scanner = AnswerScanner(self.hash_answers)
+            with output_file.open(mode="rb") as fin:
+                for chunk in iter(lambda: fin.read(DEFAULT_READ_SIZE), b""):
+                    scanner.feed(chunk)
+            scanner.close()
+        return self._collect_statistics(scanner)
+
+    @staticmethod
+    def _collect_statistics(scanner: AnswerScanner) -> Result:
+        output = scanner.text
+        status = Status.SUCCESS if "Query Answering Time" in output else Status.ERROR
+        result = Result(status=status, nb_atoms=scanner.nb_answers, answer_hash=scanner.answer_hash)
+        set_phases(result, parse_statistics(output))
+        return result
 
     def get_cli_args(
         self,
@@ -40,9 +248,11 @@ class DlvTool(Tool):
         run_config: Dict,
         working_dir: Optional[str] = None,
     ) -> List[str]:
-        args = [self.binary_path, "--program", program]
         assert len(datasets) > 0
-        args += ["--dataset", *map(str, datasets)]
         if working_dir is not None:
-            args += ["--working-dir", str(Path(working_dir).absolute())]
+            # keep the program next to the output of the run
+            program = Path(shutil.copyfile(program, Path(working_dir) / PROGRAM_FILENAME))
+        args = get_dlve_command(program, datasets, Path(self.binary_path))
+        if self.uses_perf and working_dir is not None:
+            args = [*get_perf_record_args(Path(working_dir).absolute() / PERF_DATA_FILENAME), *args]
         return args
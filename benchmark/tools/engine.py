@@ -2,7 +2,9 @@ import logging
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from benchmark.experiments.containment import ContainmentConfig
 from benchmark.experiments.core import Result
+from benchmark.experiments.telemetry import TelemetryConfig
 from benchmark.tools import tool_registry
 from benchmark.utils.base import ensure_dict, remove_dir_or_fail
 
@@ -17,6 +19,8 @@ def run_engine(
     run_config: Optional[Dict] = None,
     working_dir: Optional[Path] = None,
     force: bool = False,
+    telemetry_config: Optional[TelemetryConfig] = None,
+    containment_config: Optional[ContainmentConfig] = None,
 ) -> Result:
     tool_config = ensure_dict(tool_config)
     run_config = ensure_dict(run_config)
@@ -33,8 +37,10 @@ def run_engine(
     logging.debug(f"tool_config={tool_config}")
     logging.debug(f"run_config={run_config}")
     logging.debug(f"working_dir={working_dir}")
+    logging.debug(f"telemetry_config={telemetry_config}")
+    logging.debug(f"containment_config={containment_config}")
 
-    with tool.session(working_dir=working_dir):
+    with tool.session(working_dir=working_dir, containment_config=containment_config):
         try:
             result = tool.run(
                 program,
@@ -43,6 +49,8 @@ def run_engine(
                 timeout=timeout,
                 name=name,
                 working_dir=working_dir,
+                telemetry_config=telemetry_config,
+                containment_config=containment_config,
             )
             return result
         except KeyboardInterrupt:
@@ -0,0 +1,174 @@
+"""Streaming, bounded-memory scan of the JSON answers of the Vadalog server."""
+import dataclasses
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Optional, TextIO
+
+DEFAULT_READ_SIZE = 1 << 20
+
+HASH_MODULUS = 1 << 64
+_WHITESPACE = " \t\n\r"
+
+
+@dataclasses.dataclass(frozen=True)
+class ResultSetSummary:
+    """
+    Summary of an answer of the Vadalog server.
+
+    :param nb_tuples: the number of tuples of the first predicate of the result set
+    :param answer_hash: an order-independent hash of those tuples, if requested
+    :param status: the 'status' field of the answer, if any (only errors have it)
+    """
+
+    nb_tuples: int
+    answer_hash: Optional[str] = None
+    status: Optional[int] = None
+
+
+def hash_bytes(content: bytes) -> int:
+    """Hash an answer; the hash of a set of answers is the sum of the hashes of its answers, modulo 2^64."""
+    return int.from_bytes(hashlib.blake2b(content, digest_size=8).digest(), "little")
+
+
+def hash_tuple(values: Any) -> int:
+    """Hash a tuple, from its canonical JSON form."""
+    return hash_bytes(json.dumps(values, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def format_hash(value: int) -> str:
+    return f"{value:016x}"
+
+
+class _JsonStream:
+    """
+    Read JSON values one at a time from a text file, without loading the whole file.
+
+    Only the buffer of the value being decoded is kept in memory: to scan an array of
+    small values in constant memory, decode its items one by one.
+    """
+
+    def __init__(self, fp: TextIO, read_size: int = DEFAULT_READ_SIZE):
+        self._fp = fp
+        self._read_size = read_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Read more content into the buffer; return False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._fp.read(self._read_size)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        self._eof = chunk == ""
+        return not self._eof
+
+    def peek(self) -> str:
+        """Skip the whitespace, and return the next character ('' at end of file)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        actual = self.peek()
+        if actual != char:
+            raise ValueError(f"expected {char!r} at offset {self._pos}, got {actual!r}")
+        self._pos += 1
+
+    def skip(self, char: str) -> bool:
+        """Consume the next character if it is char."""
+        if self.peek() != char:
+            return False
+        self._pos += 1
+        return True
+
+    def decode(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer might continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _scan_array(stream: _JsonStream, compute_hash: bool) -> ResultSetSummary:
+    nb_tuples = 0
+    answer_hash = 0
+    stream.expect("[")
+    if not stream.skip("]"):
+        while True:
+            values = stream.decode()
+            nb_tuples += 1
+            if compute_hash:
+                answer_hash = (answer_hash + hash_tuple(values)) % HASH_MODULUS
+            if stream.skip("]"):
+                break
+            stream.expect(",")
+    return ResultSetSummary(nb_tuples, format_hash(answer_hash) if compute_hash else None)
+
+
+def _scan_result_set(stream: _JsonStream, compute_hash: bool) -> ResultSetSummary:
+    """Scan the 'resultSet' object: summarize the first predicate, and skip the others."""
+    summary = ResultSetSummary(0, format_hash(0) if compute_hash else None)
+    stream.expect("{")
+    index = 0
+    while not stream.skip("}"):
+        if index > 0:
+            stream.expect(",")
+        stream.decode()
+        stream.expect(":")
+        predicate_summary = _scan_array(stream, compute_hash and index == 0)
+        if index == 0:
+            summary = predicate_summary
+        index += 1
+    return summary
+
+
+def scan_answer(fp: TextIO, compute_hash: bool = False, read_size: int = DEFAULT_READ_SIZE) -> ResultSetSummary:
+    """
+    Scan an answer of the Vadalog server, e.g. {"resultSet": {"q": [[...], ...]}, "columnNames": ...}.
+
+    Raise ValueError (or json.JSONDecodeError) if the answer is not valid or has no result set.
+    """
+    stream = _JsonStream(fp, read_size)
+    summary: Optional[ResultSetSummary] = None
+    status: Optional[int] = None
+    stream.expect("{")
+    first = True
+    while not stream.skip("}"):
+        if not first:
+            stream.expect(",")
+        first = False
+        key = stream.decode()
+        stream.expect(":")
+        if key == "resultSet":
+            summary = _scan_result_set(stream, compute_hash)
+        else:
+            value = stream.decode()
+            if key == "status":
+                status = value
+    if summary is None:
+        if status is None:
+            raise ValueError("the answer has no result set")
+        return ResultSetSummary(0, status=status)
+    return dataclasses.replace(summary, status=status)
+
+
+def scan_answer_file(path: Path, compute_hash: bool = False, read_size: int = DEFAULT_READ_SIZE) -> ResultSetSummary:
+    with path.open(encoding="utf-8") as fp:
+        return scan_answer(fp, compute_hash, read_size)
@@ -1,30 +1,85 @@
 import argparse
 import dataclasses
-import json
+import datetime
+import io
 import logging
 import os
+import re
+import shutil
 import signal
 import subprocess
+import tempfile
+import threading
 import time
 from json import JSONDecodeError
+from multiprocessing import util as multiprocessing_util
 from pathlib import Path
-from typing import Dict, List, Mapping, Optional
+from typing import Dict, List, Mapping, Optional, TextIO, Tuple
 
 import requests
 
 from benchmark import ROOT_DIR
-from benchmark.experiments.core import Status, Result
+from benchmark.experiments.containment import Container, ContainmentConfig
+from benchmark.experiments.core import Status, Result, TELEMETRY_FILENAME
+from benchmark.experiments.telemetry import ProcessTreeSampler, TelemetryConfig, TelemetrySummary
 from benchmark.tools.core import Tool, ToolID
-from benchmark.utils.base import from_dict_to_key_equal_value
-from benchmark.utils.jvm import JVMConfig, _get_max_default_heap_size_mb
+from benchmark.tools.resultset import DEFAULT_READ_SIZE, scan_answer
+from benchmark.utils.base import ensure_dict, from_dict_to_key_equal_value
+from benchmark.utils.jvm import CDS_OFF, GC_LOG_FILENAME, JVM_START_MEMORY_ERRORS, OUT_OF_MEMORY_ERROR, JVMConfig, \
+    _get_max_default_heap_size_mb, parse_gc_log
+from benchmark.utils.profiling import JFR_FILENAME, PROFILE_REPORT_FILENAME, start_flight_recording, \
+    stop_flight_recording, write_jfr_report
 
 DEFAULT_JAVA_HOME = (
     Path(os.getenv("HOME")) / ".sdkman" / "candidates" / "java" / "current"
 )
 DEFAULT_VADALOG_ROOT = ROOT_DIR / "third_party" / "vadalog-engine-bankitalia"
 DEFAULT_VADALOG_SERVER_TIMEOUT = 30.0
-DEFAULT_VADALOG_URL = "http://localhost:8080"
+DEFAULT_WARMUP_TIMEOUT = 60.0
+VADALOG_JAR = Path("target") / "VadaEngine-1.14.0.jar"
+DEFAULT_VADALOG_PORT = 8080
+DEFAULT_VADALOG_URL = f"http://localhost:{DEFAULT_VADALOG_PORT}"
 VADALOG_WRAPPER_PATH = ROOT_DIR / "bin" / "vadalog-wrapper"
+SERVER_LOG_FILENAME = "vadalog-output.log"
+PROGRAM_FILENAME = "new_program.vada"
+WARMUP_PROGRAM_FILENAME = "warmup-program.vada"
+DEFAULT_WARMUP_PROGRAM = Path(__file__).parent / "vadalog-warmup.vada"
+EVALUATE_ENDPOINT = "evaluateFromRepoWithParamsProp"
+DEFAULT_HEALTH_PROBE_TIMEOUT = 5.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+
+# 'wrapper': each run is a vadalog-wrapper process; 'session': the harness sends the requests itself
+VADALOG_CLIENTS = ("wrapper", "session")
+
+# 'run': a server per run; 'group': a server reused within a (dataset, tool) group; 'experiment': reused by all runs
+SERVER_SCOPES = ("run", "group", "experiment")
+JVM_COLD = "cold"
+JVM_WARM = "warm"
+# after such runs, the server might still be evaluating the program, or be in a bad state
+_RESTART_STATUSES = {Status.TIMEOUT, Status.INTERRUPTED, Status.OUT_OF_MEMORY}
+
+# the server logs with one of the following layouts (depending on the logging configuration), e.g.:
+# "2023-03-13 14:07:12.249  INFO 11375 --- [nio-8080-exec-5] u.a.o.c.v.v.c.VadaEngineController       : END fetching"
+# "13-03-2023 20:03:45.718 [http-nio-8080-exec-4] INFO  u.a.o.c.v.v.c.VadaEngineController.evaluate - END fetching"
+_LOG_LINE_FORMATS = (
+    (
+        re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3})\s+\w+\s+\d+\s+---\s+\[[^]]*]\s+\S+\s*:\s(.*)$", re.MULTILINE),
+        "%Y-%m-%d %H:%M:%S.%f",
+    ),
+    (
+        re.compile(r"^(\d\d-\d\d-\d{4} \d\d:\d\d:\d\d\.\d{3})\s+\[[^]]*]\s+\w+\s+\S+\s+-\s(.*)$", re.MULTILINE),
+        "%d-%m-%Y %H:%M:%S.%f",
+    ),
+)
+_BEGIN_EVALUATION_MESSAGE = "BEGIN evaluating program"
+_LOG_EVENTS = {
+    "begin_parsing": "BEGIN parsing the program",
+    "end_parsing": "END parsing the program",
+    "begin_optimizing": "BEGIN optimizing",
+    "end_planning": "END planning",
+    "end_fetching": "END fetching",
+}
+_GENERATED_FACTS_REGEX = re.compile(r"Number of generated facts: (\d+)")
 
 DEFAULT_JAVA_CONFIG = dict(
     maximum_heap_size=_get_max_default_heap_size_mb(),
@@ -32,31 +87,446 @@ DEFAULT_JAVA_CONFIG = dict(
 )
 
 
+class VadalogServerStartError(RuntimeError):
+    """The Vadalog server did not start; out_of_memory tells whether it lacked memory."""
+
+    def __init__(self, message: str, out_of_memory: bool = False):
+        super().__init__(message)
+        self.out_of_memory = out_of_memory
+
+
+@dataclasses.dataclass(frozen=True)
+class ServerPoolConfig:
+    """
+    Configuration of the reuse of the Vadalog servers across runs.
+
+    :param scope: one of SERVER_SCOPES
+    :param restart_every: if set, a server is restarted after this number of runs
+    """
+
+    scope: str = "run"
+    restart_every: Optional[int] = None
+
+    def __post_init__(self):
+        assert self.scope in SERVER_SCOPES
+        if self.restart_every is not None:
+            assert self.restart_every > 0
+
+    @property
+    def reuses_servers(self) -> bool:
+        return self.scope != "run"
+
+
+def _read_from(path: Path, offset: int) -> Optional[str]:
+    """Read a file from an offset; None if the file does not exist."""
+    if not path.exists():
+        return None
+    with path.open(mode="rb") as fin:
+        fin.seek(offset)
+        return fin.read().decode("utf-8", errors="replace")
+
+
+def _get_size(path: Path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+def get_vadalog_url(port: int) -> str:
+    """Get the URL of a Vadalog server listening on localhost."""
+    return f"http://localhost:{port}"
+
+
+def build_bind_string(binds: List["Bind"]) -> str:
+    input_statements = set(bind.to_input_statement() for bind in binds)
+    bind_statements = set(bind.to_vadalog_statement() for bind in binds)
+    return "\n".join(sorted(input_statements) + sorted(bind_statements))
+
+
+def relative_to(src: Path, dest: Path) -> Path:
+    """Compute a path to a destination path that is relative to a source path."""
+    assert src.is_absolute()
+    assert dest.is_absolute()
+    return Path(os.path.relpath(dest, src))
+
+
+def get_evaluate_params(
+    program: Path,
+    binds: List["Bind"],
+    prop_string: str,
+    working_dir: Path,
+    vadalog_root: Path = DEFAULT_VADALOG_ROOT,
+    program_filename: str = PROGRAM_FILENAME,
+) -> Dict[str, str]:
+    """Write the program, with its binds, in the working dir, and get the parameters of the evaluation request."""
+    new_program = program.read_text() + "\n" + build_bind_string(binds)
+    path_to_program = (working_dir / program_filename).resolve()
+    path_to_program.write_text(new_program)
+
+    # this is needed because how '/evaluateFromRepoWithParamsProp' works. It expects
+    # the program path to be relative path from VADALOG_ROOT/repository.
+    # TODO: please fix me (add a new REST method that is easier to use, or implement a Vadalog CLI tool)
+    vadalog_repository_path = (vadalog_root / "repository").resolve()
+    path_to_program_relative = relative_to(vadalog_repository_path, path_to_program)
+    # TODO to fix with correct params and prop
+    return dict(
+        programName=str(path_to_program_relative),
+        params="NonExistingParam=0",
+        prop=prop_string if prop_string else "NonExistingProp=0"
+    )
+
+
+class VadalogClient:
+    """A client of a Vadalog server, whose connections are kept alive across requests."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.session = requests.Session()
+
+    def evaluate(self, params: Mapping[str, str], timeout: float) -> requests.Response:
+        """
+        Evaluate a program; raise requests.Timeout if the server sends nothing for timeout seconds.
+
+        The timeout bounds each read, not the whole request: an answer that keeps streaming can take longer, and
+        the caller must enforce its own deadline. The body of the answer is streamed: read it with 'iter_content'.
+        """
+        return self.session.post(
+            f"{self.url}/{EVALUATE_ENDPOINT}", data=params, timeout=(DEFAULT_CONNECT_TIMEOUT, timeout), stream=True
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: Dict[str, VadalogClient] = {}
+
+
+def get_vadalog_client(url: str) -> VadalogClient:
+    """Get the client of the current process for a server URL."""
+    if url not in _clients:
+        _clients[url] = VadalogClient(url)
+    return _clients[url]
+
+
+def parse_server_log(log: str) -> Tuple[Dict[str, datetime.datetime], Optional[int]]:
+    """
+    Parse the events of the last evaluation in the log of a Vadalog server.
+
+    Return the timestamps of the events (the keys of _LOG_EVENTS, plus 'begin_evaluation'),
+    and the number of generated facts.
+    """
+    lines = []
+    for regex, timestamp_format in _LOG_LINE_FORMATS:
+        lines = [
+            (datetime.datetime.strptime(timestamp, timestamp_format), message)
+            for timestamp, message in regex.findall(log)
+        ]
+        if lines:
+            break
+    begin_indexes = [i for i, (_, message) in enumerate(lines) if message.startswith(_BEGIN_EVALUATION_MESSAGE)]
+    if not begin_indexes:
+        return {}, None
+    lines = lines[begin_indexes[-1]:]
+    events = {"begin_evaluation": lines[0][0]}
+    nb_generated_facts = None
+    for timestamp, message in lines:
+        for event, event_message in _LOG_EVENTS.items():
+            if event not in events and message.startswith(event_message):
+                events[event] = timestamp
+        match = _GENERATED_FACTS_REGEX.match(message)
+        if match is not None:
+            nb_generated_facts = int(match.group(1))
+    return events, nb_generated_facts
+
+
+def set_phases(result: Result, events: Mapping[str, datetime.datetime], nb_generated_facts: Optional[int]) -> None:
+    """
+    Set the phase fields of a result from the events of the server log.
+
+    Facts are generated lazily, while they are fetched: the reasoning phase spans from
+    the end of planning to the end of fetching.
+    """
+
+    def get_interval(begin: str, end: str) -> Optional[float]:
+        if begin not in events or end not in events:
+            return None
+        return (events[end] - events[begin]).total_seconds()
+
+    result.time_parse = get_interval("begin_parsing", "end_parsing")
+    result.time_rewrite = get_interval("begin_optimizing", "end_planning")
+    result.time_reason = get_interval("end_planning", "end_fetching")
+    result.time_engine = get_interval("begin_evaluation", "end_fetching")
+    result.nb_derived_atoms = nb_generated_facts
+
+
 class VadalogTool(Tool):
     """Implement the Vadalog tool wrapper."""
 
     NAME = "Vadalog"
 
-    def __init__(self, tool_id: ToolID, binary_path: str, properties: Optional[Mapping] = None, java_config: Optional[Mapping] = None) -> None:
+    def __init__(
+        self,
+        tool_id: ToolID,
+        binary_path: str,
+        properties: Optional[Mapping] = None,
+        java_config: Optional[Mapping] = None,
+        port: int = DEFAULT_VADALOG_PORT,
+        server_pool_config: Optional[ServerPoolConfig] = None,
+        client: str = "wrapper",
+        hash_answers: bool = False,
+        warmup_program: Optional[str] = None,
+        profile: bool = False,
+    ) -> None:
         super().__init__(tool_id, binary_path)
         self.properties = properties if properties else dict()
+        self.port = port
         java_config = java_config if java_config else DEFAULT_JAVA_CONFIG
         self.jvm_config = JVMConfig(**java_config)
+        self.server_pool_config = server_pool_config
+        assert client in VADALOG_CLIENTS
+        self.client = client
+        self.hash_answers = hash_answers
+        self.warmup_program = Path(warmup_program) if warmup_program is not None else None
+        # if set, each run is recorded with Java Flight Recorder
+        self.profile = profile
 
         self.vadalog_server: Optional[_VadalogServer] = None
+        self.jvm_state: Optional[str] = None
+        self._server_log_offset = 0
+        self._gc_log_offset = 0
+        self._working_dir: Optional[Path] = None
+        self._last_status: Optional[Status] = None
+        self._recording = False
+        # the error of the server start of the current session, if it failed
+        self._start_error: Optional[VadalogServerStartError] = None
+
+    @property
+    def url(self) -> str:
+        return get_vadalog_url(self.port)
+
+    @property
+    def reuses_server(self) -> bool:
+        return self.server_pool_config is not None and self.server_pool_config.reuses_servers
+
+    @property
+    def prop_string(self) -> str:
+        return from_dict_to_key_equal_value(tuple(self.properties.items()), separator=",")
+
+    def run(
+        self,
+        program: Path,
+        datasets: List[Path],
+        run_config: Optional[Dict] = None,
+        timeout: float = 20.0,
+        cwd: Optional[str] = None,
+        name: Optional[str] = None,
+        working_dir: Optional[str] = None,
+        telemetry_config: Optional[TelemetryConfig] = None,
+        containment_config: Optional[ContainmentConfig] = None,
+    ) -> Result:
+        if self._start_error is not None:
+            result = Result(
+                status=Status.OUT_OF_MEMORY if self._start_error.out_of_memory else Status.ERROR,
+                name=name,
+                tool=self.tool_id.value,
+                timestamp=datetime.datetime.now(),
+                jvm_state=self.jvm_state,
+            )
+            self._last_status = result.status
+            return result
+        if self.client == "session":
+            if containment_config is not None:
+                raise ValueError("the runs of the in-process Vadalog client cannot be contained: use the wrapper client")
+            result = self._run_in_process(program, run_config, timeout, name, Path(working_dir), telemetry_config)
+        else:
+            result = super().run(
+                program, datasets, run_config, timeout, cwd, name, working_dir, telemetry_config, containment_config
+            )
+        self._stop_profiling(Path(working_dir))
+        result.jvm_state = self.jvm_state
+        if self.vadalog_server is not None:
+            result.jvm_cds = self.vadalog_server.cds_state
+            if self.jvm_state == JVM_COLD:
+                result.time_server_start = self.vadalog_server.start_time
+                result.time_server_warmup = self.vadalog_server.warmup_time
+            gc_log = self._read_gc_log()
+            if gc_log is not None:
+                gc_summary = parse_gc_log(gc_log)
+                result.gc_count = gc_summary.nb_collections
+                result.gc_pause_time = gc_summary.pause_time
+                result.gc_max_pause = gc_summary.max_pause
+                result.gc_peak_heap_after = gc_summary.peak_heap_after
+        self._last_status = result.status
+        return result
+
+    def _run_in_process(
+        self,
+        program: Path,
+        run_config: Optional[Dict],
+        timeout: float,
+        name: Optional[str],
+        working_dir: Path,
+        telemetry_config: Optional[TelemetryConfig],
+    ) -> Result:
+        """
+        Run the program by sending the request from the harness, through the keep-alive session of the server URL.
+
+        The request is sent from the harness, which cannot be contained: the runs are rejected with a containment
+        configuration (see run). The telemetry is the one of the server. The timeout is a wall-clock deadline on the
+        request and the read of the answer: when it passes, the server is stopped, to cancel the evaluation (and the
+        streaming of the answer).
+        """
+        binds = [parse_bind_type(bind) for bind in ensure_dict(run_config).get("binds", [])]
+        params = get_evaluate_params(program, binds, self.prop_string, working_dir)
+        client = get_vadalog_client(self.url)
+        command = ["POST", f"{self.url}/{EVALUATE_ENDPOINT}", *(f"{key}={value}" for key, value in params.items())]
+        logging.info("Sending request: %s", " ".join(command))
+        timestamp = datetime.datetime.now()
+        sampler: Optional[ProcessTreeSampler] = None
+        telemetry_summary: Optional[TelemetrySummary] = None
+        if telemetry_config is not None:
+            sampler = ProcessTreeSampler(None, self.get_extra_pids(), telemetry_config.sampling_interval)
+            sampler.start()
+        stdout_file = working_dir / "stdout.txt"
+        response: Optional[requests.Response] = None
+        timed_out = False
+        interrupted = False
+        deadline_passed = threading.Event()
+        # the watchdog and the main thread can both stop the server: the first one does, under the lock
+        stop_lock = threading.Lock()
+        server_stopped = False
+
+        def stop_server(reason: str) -> None:
+            nonlocal server_stopped
+            with stop_lock:
+                if server_stopped or self.vadalog_server is None:
+                    return
+                server_stopped = True
+                # the recording would be lost with the server
+                self._stop_profiling(working_dir)
+                logging.info(f"{reason}: stopping the Vadalog server to cancel the evaluation")
+                self.vadalog_server.stop()
+
+        def cancel_evaluation() -> None:
+            deadline_passed.set()
+            stop_server("Timeout")
+
+        # the read timeout of the request only bounds each read
+        watchdog = threading.Timer(timeout, cancel_evaluation)
+        watchdog.daemon = True
+        start = time.perf_counter()
+
+        def is_past_deadline() -> bool:
+            return deadline_passed.is_set() or time.perf_counter() - start >= timeout
+
+        # the answer is streamed to disk, as the wrapper does, and never held in memory
+        with stdout_file.open(mode="wb") as fout:
+            try:
+                if self.vadalog_server is not None:
+                    watchdog.start()
+                response = client.evaluate(params, timeout)
+                for chunk in response.iter_content(chunk_size=DEFAULT_READ_SIZE):
+                    if is_past_deadline():
+                        break
+                    fout.write(chunk)
+                # the answer of a stopped server might just end
+                timed_out = is_past_deadline()
+                if timed_out:
+                    logging.error("request timed out")
+                else:
+                    logging.info(f"request completed with HTTP status {response.status_code}")
+            except requests.RequestException as e:
+                # a read timeout while streaming the body is raised as a connection error
+                timed_out = isinstance(e, requests.Timeout) or is_past_deadline()
+                logging.error("request timed out" if timed_out else f"request failed: {e}")
+            except KeyboardInterrupt:
+                logging.error("keyboard interrupt received...")
+                interrupted = True
+            finally:
+                end = time.perf_counter()
+                watchdog.cancel()
+                if watchdog.ident is not None:
+                    # if the deadline just passed, wait until the server is stopped
+                    watchdog.join()
+                if response is not None:
+                    response.close()
+        if sampler is not None:
+            telemetry_summary = sampler.stop()
+            if telemetry_config.save_time_series:
+                sampler.save_time_series(working_dir / TELEMETRY_FILENAME)
+        if timed_out or interrupted:
+            stop_server("Timeout" if timed_out else "Interrupted")
+
+        result = Result(status=Status.ERROR)
+        run_failed = response is None or not response.ok or timed_out or interrupted
+        if not run_failed:
+            result = self.collect_statistics_from_file(stdout_file)
+        result.name = name
+        result.tool = self.tool_id.value
+        result.timestamp = timestamp
+        result.command = command
+        result.time_end2end = end - start
+        if telemetry_summary is not None:
+            for field in dataclasses.fields(telemetry_summary):
+                setattr(result, field.name, getattr(telemetry_summary, field.name))
+        if interrupted:
+            result.status = Status.INTERRUPTED
+        elif run_failed and self.is_out_of_memory():
+            result.status = Status.OUT_OF_MEMORY
+        elif timed_out:
+            result.status = Status.TIMEOUT
+        return result
+
+    def _start_profiling(self) -> None:
+        if not self.profile or self.vadalog_server is None:
+            return
+        self._recording = start_flight_recording(self.vadalog_server.java_home, self.vadalog_server.pid)
+        if not self._recording:
+            logging.warning("Could not start the JFR recording of the run")
+
+    def _stop_profiling(self, working_dir: Path) -> None:
+        """Dump the JFR recording of the run next to its stdout, and write its report of hot methods and allocations."""
+        if not self._recording:
+            return
+        self._recording = False
+        jfr_file = working_dir / JFR_FILENAME
+        java_home = self.vadalog_server.java_home
+        if not self.vadalog_server.is_running or not stop_flight_recording(java_home, self.vadalog_server.pid, jfr_file):
+            logging.warning("Could not dump the JFR recording of the run")
+            return
+        if write_jfr_report(java_home, jfr_file, working_dir / PROFILE_REPORT_FILENAME):
+            logging.info(f"Profile report written to {working_dir / PROFILE_REPORT_FILENAME}")
+
+    def _read_server_log(self) -> Optional[str]:
+        """Read the log written by the server since the beginning of the session."""
+        if self.vadalog_server is None:
+            return None
+        return _read_from(self.vadalog_server.output_file, self._server_log_offset)
+
+    def _read_gc_log(self) -> Optional[str]:
+        """Read the GC log written by the server since the beginning of the session (after its start-up)."""
+        if self.vadalog_server is None or not self.jvm_config.gc_logging:
+            return None
+        return _read_from(self.vadalog_server.gc_log_file, self._gc_log_offset)
 
     def collect_statistics(self, output: str) -> Result:
+        return self._collect_statistics(io.StringIO(output))
+
+    def collect_statistics_from_file(self, output_file: Path) -> Result:
+        with output_file.open(encoding="utf-8") as fp:
+            return self._collect_statistics(fp)
+
+    def _collect_statistics(self, output: TextIO) -> Result:
+        """Count the answers (the tuples of the first predicate) with a streaming scan, in bounded memory."""
         try:
-            json_output = json.loads(output)
-            result_set = json_output["resultSet"]
-            result_sets = list(result_set.items())
-            if len(result_sets) == 0:
-                nb_values = 0
-            else:
-                nb_values = len(result_sets[0][1])
-            return Result(status=Status.SUCCESS, nb_atoms=nb_values)
-        except json.JSONDecodeError:
+            summary = scan_answer(output, self.hash_answers)
+        except ValueError:
+            return Result(status=Status.ERROR)
+        if summary.status is not None and summary.status != 200:
             return Result(status=Status.ERROR)
+        result = Result(status=Status.SUCCESS, nb_atoms=summary.nb_tuples, answer_hash=summary.answer_hash)
+        server_log = self._read_server_log()
+        if server_log is not None:
+            set_phases(result, *parse_server_log(server_log))
+        return result
 
     def get_cli_args(
         self,
@@ -71,6 +541,7 @@ class VadalogTool(Tool):
             args += ["--bind", *bind_parameters]
         if working_dir is not None:
             args += ["--working-dir", working_dir]
+        args += ["--url", self.url, "--stream"]
         if self.properties:
             args += [
                 "--set",
@@ -80,13 +551,85 @@ class VadalogTool(Tool):
             ]
         return args
 
-    def start_session(self, working_dir: Path) -> None:
+    def get_extra_pids(self) -> List[int]:
+        if self.vadalog_server is None or not self.vadalog_server.is_running:
+            return []
+        return [self.vadalog_server.pid]
+
+    def is_out_of_memory(self) -> bool:
+        """Check whether the server has been killed for lack of memory, or has thrown an OutOfMemoryError."""
+        if self.vadalog_server is None:
+            return False
+        if self.vadalog_server.is_out_of_memory():
+            return True
+        server_log = self._read_server_log()
+        return server_log is not None and OUT_OF_MEMORY_ERROR in server_log
+
+    def start_session(self, working_dir: Path, containment_config: Optional[ContainmentConfig] = None) -> None:
+        """
+        Start (or reuse) the server of the run; if it does not start, the run gets an error (or out-of-memory) result.
+        """
         if self.vadalog_server is not None:
             return
-        self.vadalog_server = _VadalogServer(working_dir, jvm_config=self.jvm_config)
+        self._working_dir = working_dir
+        self._last_status = None
+        self._start_error = None
+        jvm_config = self.jvm_config
+        if containment_config is not None and containment_config.memory_max is not None:
+            # the heap must fit in the memory limit, since the address space of the JVM is not limited
+            jvm_config = dataclasses.replace(jvm_config, memory_limit=containment_config.memory_max)
+        try:
+            self._start_server(working_dir, jvm_config, containment_config)
+        except VadalogServerStartError as e:
+            logging.error(f"Vadalog server failed to start: {e}")
+            self._start_error = e
+            self.vadalog_server = None
+            self.jvm_state = JVM_COLD
+
+    def _start_server(
+        self, working_dir: Path, jvm_config: JVMConfig, containment_config: Optional[ContainmentConfig]
+    ) -> None:
+        if self.reuses_server:
+            self.vadalog_server, is_warm = _server_pool.acquire(
+                self.port, jvm_config, containment_config, self.server_pool_config.restart_every, self.warmup_program
+            )
+            self._server_log_offset = self.vadalog_server.output_file.stat().st_size
+            self._gc_log_offset = _get_size(self.vadalog_server.gc_log_file)
+            self.jvm_state = JVM_WARM if is_warm else JVM_COLD
+            self._start_profiling()
+            return
+        container = (
+            Container(containment_config, "vadalog", limit_address_space=False)
+            if containment_config is not None else None
+        )
+        self.vadalog_server = _VadalogServer(
+            working_dir,
+            jvm_config=jvm_config,
+            port=self.port,
+            container=container,
+            warmup_program=self.warmup_program,
+        )
         self.vadalog_server.start()
+        self._gc_log_offset = _get_size(self.vadalog_server.gc_log_file)
+        self.jvm_state = JVM_COLD
+        self._start_profiling()
 
     def end_session(self) -> None:
+        if self._start_error is not None:
+            # no server is running
+            return
+        if self.reuses_server:
+            # the log of a pooled server is outside the working dir: keep the part of the run next to its stdout
+            server_log = self._read_server_log()
+            if server_log is not None and self._working_dir is not None:
+                (self._working_dir / SERVER_LOG_FILENAME).write_text(server_log)
+            gc_log = self._read_gc_log()
+            if gc_log is not None and self._working_dir is not None:
+                (self._working_dir / GC_LOG_FILENAME).write_text(gc_log)
+            restart = self._last_status is None or self._last_status in _RESTART_STATUSES
+            _server_pool.release(self.port, restart)
+            self.vadalog_server = None
+            return
         if not self.vadalog_server.is_running:
             return
         self.vadalog_server.stop()
@@ -100,6 +643,9 @@ class _VadalogServer:
         vadalog_root: Path = DEFAULT_VADALOG_ROOT,
         vadalog_timeout: float = DEFAULT_VADALOG_SERVER_TIMEOUT,
         jvm_config: Optional[JVMConfig] = None,
+        port: int = DEFAULT_VADALOG_PORT,
+        container: Optional[Container] = None,
+        warmup_program: Optional[Path] = None,
     ):
         self.working_dir = working_dir
         self.java_home = java_home
@@ -107,38 +653,104 @@ class _VadalogServer:
         self.vadalog_server: Optional[subprocess.Popen] = None
         self.vadalog_timeout = vadalog_timeout
         self.jvm_config = jvm_config if jvm_config is not None else JVMConfig()
+        self.port = port
+        self.container = container
+        self.output_file = working_dir / SERVER_LOG_FILENAME
+        self.gc_log_file = working_dir / GC_LOG_FILENAME
+        self.warmup_program = warmup_program
+        # seconds until the server answers, and seconds to evaluate the warm-up program, for the last start
+        self.start_time: Optional[float] = None
+        self.warmup_time: Optional[float] = None
+        self.cds_state = CDS_OFF
+
+    @property
+    def url(self) -> str:
+        return get_vadalog_url(self.port)
 
     @property
     def java_bin(self) -> Path:
         """Get the java binary."""
         return self.java_home / "bin" / "java"
 
+    @property
+    def jar_path(self) -> Path:
+        return self.vadalog_root / VADALOG_JAR
+
     @property
     def is_running(self) -> bool:
         return self.vadalog_server is not None
 
+    @property
+    def pid(self) -> Optional[int]:
+        return self.vadalog_server.pid if self.is_running else None
+
     def start(self):
         if self.is_running:
             return
         logging.info("Starting Vadalog engine server...")
-        cmd = [str(self.java_bin), *self.jvm_config.to_cli_config(), "-jar", "target/VadaEngine-1.14.0.jar"]
+        self.cds_state = self.jvm_config.get_cds_state(self.jar_path)
+        cmd = [
+            str(self.java_bin),
+            *self.jvm_config.to_cli_config(self.jar_path, self.gc_log_file),
+            f"-Dserver.port={self.port}",
+            "-jar",
+            str(VADALOG_JAR),
+        ]
         logging.info("Running command: %s", " ".join(cmd))
 
-        vadalog_server_output_file = self.working_dir / "vadalog-output.log"
-        with vadalog_server_output_file.open(mode="w") as fout:
-            self.vadalog_server = subprocess.Popen(
-                cmd,
-                cwd=str(self.vadalog_root),
-                stdout=fout,
-                stderr=fout,
-            )
+        if self.container is not None:
+            self.container.create()
+        self.start_time = None
+        self.warmup_time = None
+        start = time.perf_counter()
+        with self.output_file.open(mode="w") as fout:
+            try:
+                self.vadalog_server = subprocess.Popen(
+                    cmd,
+                    cwd=str(self.vadalog_root),
+                    stdout=fout,
+                    stderr=fout,
+                    preexec_fn=self.container.preexec if self.container is not None else None,
+                )
+            except OSError as e:
+                if self.container is not None:
+                    self.container.destroy()
+                raise VadalogServerStartError(f"cannot run {cmd[0]}: {e}") from e
             logging.info("Wait until Vadalog server is healthy...")
             try:
                 self.wait_until_up()
-                logging.info("Vadalog is ready!")
-            except TimeoutError:
+                self.start_time = time.perf_counter() - start
+                logging.info(f"Vadalog is ready in {self.start_time:.3f} seconds (class data sharing: {self.cds_state})")
+            except TimeoutError as e:
+                out_of_memory = self.is_out_of_memory()
                 self._stop()
-                raise
+                log = self.output_file.read_text(errors="replace")
+                out_of_memory = out_of_memory or any(
+                    message in log for message in (OUT_OF_MEMORY_ERROR, *JVM_START_MEMORY_ERRORS)
+                )
+                raise VadalogServerStartError(f"{e}; server log: {log[-1000:]!r}", out_of_memory) from e
+        if self.warmup_program is not None:
+            self.warm_up()
+
+    def warm_up(self) -> None:
+        """Evaluate the warm-up program, so that the first measured run does not pay for class loading and JIT."""
+        params = get_evaluate_params(
+            self.warmup_program, [], "", self.working_dir, self.vadalog_root, WARMUP_PROGRAM_FILENAME
+        )
+        client = VadalogClient(self.url)
+        start = time.perf_counter()
+        try:
+            with client.evaluate(params, DEFAULT_WARMUP_TIMEOUT) as response:
+                for _ in response.iter_content(chunk_size=DEFAULT_READ_SIZE):
+                    pass
+            if not response.ok:
+                logging.warning(f"Warm-up program failed with HTTP status {response.status_code}")
+        except requests.RequestException as e:
+            logging.warning(f"Warm-up program failed: {e}")
+        finally:
+            client.close()
+        self.warmup_time = time.perf_counter() - start
+        logging.info(f"Warm-up program evaluated in {self.warmup_time:.3f} seconds")
 
     def stop(self):
         if not self.is_running:
@@ -155,12 +767,34 @@ class _VadalogServer:
                 os.kill(self.vadalog_server.pid, signal.SIGKILL)
         finally:
             self.vadalog_server = None
+            if self.container is not None:
+                self.container.destroy()
         logging.info("Stopping completed.")
+        if self.cds_state != CDS_OFF and self.jvm_config.commit_cds_archive(self.jar_path):
+            logging.info(f"Class data sharing archive dumped: {self.jvm_config.get_cds_archive(self.jar_path)}")
+
+    def is_out_of_memory(self) -> bool:
+        if self.container is None or self.container.cgroup is None:
+            return False
+        oom_kills = self.container.get_usage().oom_kills
+        return oom_kills is not None and oom_kills > 0
+
+    def is_healthy(self, timeout: float = DEFAULT_HEALTH_PROBE_TIMEOUT) -> bool:
+        """Probe the server: it must be alive and answer on its URL."""
+        if not self.is_running or self.vadalog_server.poll() is not None:
+            return False
+        try:
+            requests.get(self.url, timeout=timeout).json()
+            return True
+        except (requests.RequestException, ValueError):
+            return False
 
-    def wait_until_up(self, timeout: float = 1.0, attempts=20):
+    def wait_until_up(self, timeout: float = 0.05, attempts=400):
         for i in range(attempts):
+            if self.vadalog_server.poll() is not None:
+                raise TimeoutError(f"Vadalog engine exited with code {self.vadalog_server.returncode}")
             try:
-                response = requests.get(DEFAULT_VADALOG_URL)
+                response = requests.get(self.url)
                 response.json()
                 return
             except (requests.ConnectionError, JSONDecodeError):
@@ -168,6 +802,126 @@ class _VadalogServer:
         raise TimeoutError("Vadalog engine does not respond")
 
 
+@dataclasses.dataclass
+class _PooledServer:
+    server: _VadalogServer
+    containment_config: Optional[ContainmentConfig]
+    nb_runs: int = 0
+    in_use: bool = False
+
+
+class _VadalogServerPool:
+    """
+    The Vadalog servers kept running across the runs of the current process, at most one per port.
+
+    Before being reused, a server is probed; it is restarted if it does not answer, if its last run
+    did not end cleanly (e.g. a timeout, whose evaluation might still be running), if the configuration
+    changed, or after restart_every runs. The servers log in a temporary dir, and are stopped when
+    the process exits.
+    """
+
+    def __init__(self):
+        self._servers: Dict[int, _PooledServer] = {}
+        self._log_dir: Optional[Path] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_process(self) -> None:
+        # a forked process inherits the pool, but not the servers
+        if self._pid == os.getpid():
+            return
+        self._servers = {}
+        self._log_dir = None
+        self._pid = os.getpid()
+        # unlike atexit handlers, finalizers also run when a multiprocessing worker exits
+        multiprocessing_util.Finalize(self, self.shutdown, exitpriority=10)
+
+    def _get_restart_reason(
+        self,
+        pooled: _PooledServer,
+        jvm_config: JVMConfig,
+        containment_config: Optional[ContainmentConfig],
+        restart_every: Optional[int],
+        warmup_program: Optional[Path],
+    ) -> Optional[str]:
+        if pooled.in_use:
+            return "the last run did not end"
+        if (
+            pooled.server.jvm_config != jvm_config
+            or pooled.containment_config != containment_config
+            or pooled.server.warmup_program != warmup_program
+        ):
+            return "the configuration changed"
+        if restart_every is not None and pooled.nb_runs >= restart_every:
+            return f"it served {pooled.nb_runs} runs"
+        if not pooled.server.is_healthy():
+            return "the health probe failed"
+        return None
+
+    def acquire(
+        self,
+        port: int,
+        jvm_config: JVMConfig,
+        containment_config: Optional[ContainmentConfig] = None,
+        restart_every: Optional[int] = None,
+        warmup_program: Optional[Path] = None,
+    ) -> Tuple[_VadalogServer, bool]:
+        """Get a healthy server on the port, starting it if needed; return it and whether it is warm."""
+        self._ensure_process()
+        pooled = self._servers.get(port)
+        if pooled is not None:
+            reason = self._get_restart_reason(pooled, jvm_config, containment_config, restart_every, warmup_program)
+            if reason is None:
+                logging.info(f"Reusing the Vadalog server on port {port} ({pooled.nb_runs} runs served)")
+                pooled.in_use = True
+                return pooled.server, True
+            logging.info(f"Restarting the Vadalog server on port {port}: {reason}")
+            self._stop(port)
+        if self._log_dir is None:
+            self._log_dir = Path(tempfile.mkdtemp(prefix="vadalog-servers-"))
+        log_dir = self._log_dir / str(port)
+        log_dir.mkdir(exist_ok=True)
+        container = (
+            Container(containment_config, "vadalog", limit_address_space=False)
+            if containment_config is not None else None
+        )
+        server = _VadalogServer(
+            log_dir, jvm_config=jvm_config, port=port, container=container, warmup_program=warmup_program
+        )
+        server.start()
+        self._servers[port] = _PooledServer(server, containment_config, in_use=True)
+        return server, False
+
+    def release(self, port: int, restart: bool = False) -> None:
+        """Release the server on the port after a run; if restart, it is stopped and restarted on next use."""
+        pooled = self._servers[port]
+        pooled.in_use = False
+        pooled.nb_runs += 1
+        if restart:
+            self._stop(port)
+
+    def _stop(self, port: int) -> None:
+        pooled = self._servers.pop(port)
+        pooled.server.stop()
+
+    def shutdown(self) -> None:
+        """Stop all the servers."""
+        if self._pid != os.getpid():
+            return
+        for port in list(self._servers):
+            self._stop(port)
+        if self._log_dir is not None:
+            shutil.rmtree(self._log_dir, ignore_errors=True)
+            self._log_dir = None
+
+
+_server_pool = _VadalogServerPool()
+
+
+def shutdown_vadalog_servers() -> None:
+    """Stop the Vadalog servers kept running by the current process."""
+    _server_pool.shutdown()
+
+
 @dataclasses.dataclass(frozen=True)
 class Bind:
     predicate_name: str
@@ -1,11 +1,45 @@
 import dataclasses
+import functools
+import hashlib
+import os
+import re
 from math import floor, log2, ceil
-from typing import Optional, List
+from pathlib import Path
+from typing import Dict, Optional, List, Tuple
 
 import psutil
 
+from benchmark import ROOT_DIR
 from benchmark.utils.base import argmin
 
+DEFAULT_CDS_ARCHIVE_DIR = ROOT_DIR / ".cds-archives"
+
+# whether a JVM runs without class data sharing archive, dumps one at exit, or uses one
+CDS_OFF = "off"
+CDS_DUMP = "dump"
+CDS_USE = "use"
+
+GARBAGE_COLLECTORS: Dict[str, str] = {
+    "g1": "-XX:+UseG1GC",
+    "parallel": "-XX:+UseParallelGC",
+    "zgc": "-XX:+UseZGC",
+}
+GC_LOG_FILENAME = "gc.log"
+OUT_OF_MEMORY_ERROR = "java.lang.OutOfMemoryError"
+# the messages of a JVM that cannot reserve its memory at start-up
+JVM_START_MEMORY_ERRORS = ("Could not reserve enough space", "insufficient memory for the Java Runtime Environment")
+# the share of a memory limit given to the heap; the rest is left to the metaspace, the code cache and the stacks
+MEMORY_LIMIT_HEAP_FRACTION = 0.75
+
+# a line of a unified GC log (-Xlog:gc*), with the uptime, level and tags decorations, e.g.:
+# "[0.240s][info][gc          ] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 24M->3M(256M) 6.123ms"
+# "[1.021s][info][gc,phases   ] GC(3) Pause Mark End 0.020ms" (ZGC)
+# "[1.030s][info][gc          ] GC(3) Garbage Collection (Warmup) 40M(1%)->12M(0%)" (ZGC)
+_GC_LINE_REGEX = re.compile(r"^\[[^]]*]\[\w+\s*]\[([\w,]+)\s*] GC\((\d+)\) (.*)$", re.MULTILINE)
+_GC_PAUSE_REGEX = re.compile(r"^Pause .* (\d+(?:\.\d+)?)ms$")
+_GC_HEAP_REGEX = re.compile(r"(\d+)([KMG])(?:\(\d+%\))?->(\d+)([KMG])")
+_SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
 _total_mem_gb: float = psutil.virtual_memory().total // 10 ** 9
 _max_mem_mb: int = _total_mem_gb * 1000
 _min_mem_mb: int = 256
@@ -19,23 +53,138 @@ def _get_max_default_heap_size_mb():
     return int(closest / 2) * 1000
 
 
+@functools.lru_cache(maxsize=None)
+def _get_checksum(path: Path, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with path.open(mode="rb") as fin:
+        for block in iter(lambda: fin.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_jar_checksum(jar_path: Path) -> str:
+    """Get the SHA-256 checksum of a jar; it is computed once per version of the file."""
+    stat = jar_path.stat()
+    return _get_checksum(jar_path, stat.st_size, stat.st_mtime_ns)
+
+
+@dataclasses.dataclass(frozen=True)
+class GCSummary:
+    """
+    Summary of a unified GC log.
+
+    :param nb_collections: the number of collections (including concurrent cycles)
+    :param pause_time: the total time of the stop-the-world pauses, in seconds
+    :param max_pause: the longest pause, in seconds
+    :param peak_heap_after: the largest heap occupancy after a collection, in bytes
+    """
+
+    nb_collections: int = 0
+    pause_time: float = 0.0
+    max_pause: float = 0.0
+    peak_heap_after: Optional[int] = None
+
+
+def parse_gc_log(log: str) -> GCSummary:
+    """Parse a GC log written with -Xlog:gc* (G1, Parallel or ZGC)."""
+    collections = set()
+    pauses = []
+    peak_heap_after = None
+    for tags, gc_id, message in _GC_LINE_REGEX.findall(log):
+        collections.add(int(gc_id))
+        pause_match = _GC_PAUSE_REGEX.match(message)
+        if pause_match is not None:
+            pauses.append(float(pause_match.group(1)) / 1000.0)
+        heap_match = _GC_HEAP_REGEX.search(message) if tags == "gc" else None
+        if heap_match is not None:
+            heap_after = int(heap_match.group(3)) * _SIZE_UNITS[heap_match.group(4)]
+            peak_heap_after = heap_after if peak_heap_after is None else max(peak_heap_after, heap_after)
+    return GCSummary(len(collections), sum(pauses), max(pauses, default=0.0), peak_heap_after)
+
+
 @dataclasses.dataclass(frozen=True)
 class JVMConfig:
+    """
+    Configuration of a JVM.
+
+    If class_data_sharing is set, the JVM uses an AppCDS archive of the classes loaded by the jar it runs,
+    one per jar checksum in cds_archive_dir. If the archive does not exist yet, the JVM dumps it at exit.
+    garbage_collector is one of GARBAGE_COLLECTORS (None: the default of the JVM); extra_flags are other
+    -XX flags. If gc_logging is set, the JVM writes a unified GC log (see parse_gc_log). If memory_limit (MB) is
+    set, the heap is capped to MEMORY_LIMIT_HEAP_FRACTION of it, and the JVM sizes its other areas from it.
+    """
+
     initial_heap_size: Optional[int] = None
     maximum_heap_size: Optional[int] = None
+    class_data_sharing: bool = False
+    cds_archive_dir: Path = DEFAULT_CDS_ARCHIVE_DIR
+    garbage_collector: Optional[str] = None
+    extra_flags: Tuple[str, ...] = ()
+    gc_logging: bool = False
+    memory_limit: Optional[int] = None
 
     def __post_init__(self):
+        if self.garbage_collector is not None:
+            assert self.garbage_collector in GARBAGE_COLLECTORS
+        for flag in self.extra_flags:
+            assert flag.startswith("-XX:"), f"not a -XX flag: {flag}"
+
         if self.initial_heap_size:
             assert _min_mem_mb < self.initial_heap_size <= _max_mem_mb
         if self.maximum_heap_size:
             assert _min_mem_mb < self.maximum_heap_size <= _max_mem_mb
         if self.initial_heap_size and self.maximum_heap_size:
             assert self.initial_heap_size <= self.maximum_heap_size
+        if self.memory_limit is not None:
+            assert self.memory_limit > 0
+
+    def get_cds_archive(self, jar_path: Path) -> Path:
+        return Path(self.cds_archive_dir) / f"{jar_path.stem}-{get_jar_checksum(jar_path)[:16]}.jsa"
+
+    def get_cds_state(self, jar_path: Optional[Path]) -> str:
+        if not self.class_data_sharing or jar_path is None:
+            return CDS_OFF
+        return CDS_USE if self.get_cds_archive(jar_path).exists() else CDS_DUMP
 
-    def to_cli_config(self) -> List[str]:
+    def to_cli_config(self, jar_path: Optional[Path] = None, gc_log_file: Optional[Path] = None) -> List[str]:
         args = []
-        if self.initial_heap_size is not None:
-            args.append(f"-Xms{self.initial_heap_size}m")
-        if self.maximum_heap_size is not None:
-            args.append(f"-Xmx{self.maximum_heap_size}m")
+        initial_heap_size, maximum_heap_size = self.initial_heap_size, self.maximum_heap_size
+        if self.memory_limit is not None:
+            heap_limit = max(int(self.memory_limit * MEMORY_LIMIT_HEAP_FRACTION), 1)
+            maximum_heap_size = heap_limit if maximum_heap_size is None else min(maximum_heap_size, heap_limit)
+            if initial_heap_size is not None:
+                initial_heap_size = min(initial_heap_size, maximum_heap_size)
+            args.append(f"-XX:MaxRAM={self.memory_limit}m")
+        if initial_heap_size is not None:
+            args.append(f"-Xms{initial_heap_size}m")
+        if maximum_heap_size is not None:
+            args.append(f"-Xmx{maximum_heap_size}m")
+        if self.garbage_collector is not None:
+            args.append(GARBAGE_COLLECTORS[self.garbage_collector])
+        if self.gc_logging and gc_log_file is not None:
+            # no rotation: the log is truncated at each start
+            args.append(f"-Xlog:gc*:file={gc_log_file}:uptime,level,tags:filecount=0")
+        args.extend(self.extra_flags)
+        cds_state = self.get_cds_state(jar_path)
+        if cds_state == CDS_USE:
+            args.append(f"-XX:SharedArchiveFile={self.get_cds_archive(jar_path)}")
+        elif cds_state == CDS_DUMP:
+            archive_path, pending_path = self._get_cds_paths(jar_path)
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            args.append(f"-XX:ArchiveClassesAtExit={pending_path}")
         return args
+
+    def _get_cds_paths(self, jar_path: Path) -> Tuple[Path, Path]:
+        """Get the path of the archive, and the one where the current process dumps it (other processes might too)."""
+        archive_path = self.get_cds_archive(jar_path)
+        return archive_path, archive_path.with_name(f"{archive_path.name}.{os.getpid()}.tmp")
+
+    def commit_cds_archive(self, jar_path: Path) -> bool:
+        """Move the archive dumped by a JVM of the current process, if any, to its final path."""
+        if not self.class_data_sharing:
+            return False
+        archive_path, pending_path = self._get_cds_paths(jar_path)
+        if not pending_path.exists():
+            return False
+        os.replace(pending_path, archive_path)
+        return True
@@ -0,0 +1,153 @@
+"""Profiling of the runs: Java Flight Recorder for the Vadalog server, perf for the other engines."""
+import json
+import logging
+import shutil
+import subprocess
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+JFR_FILENAME = "profile.jfr"
+PERF_DATA_FILENAME = "perf.data"
+PROFILE_REPORT_FILENAME = "profile-report.txt"
+DEFAULT_TOP_N = 20
+DEFAULT_PROFILE_TOOL_TIMEOUT = 300.0
+
+# the name of the recording of a run, in the Vadalog server
+_RECORDING_NAME = "benchmark-run"
+_EXECUTION_SAMPLE_EVENT = "jdk.ExecutionSample"
+# JDK 16+ samples the allocations with a weight; older JDKs record the allocations in new TLABs
+_ALLOCATION_EVENTS = ("jdk.ObjectAllocationSample", "jdk.ObjectAllocationInNewTLAB")
+
+
+def _run_profile_tool(args: List[str]) -> Optional[str]:
+    """Run a profiling tool; return its stdout, or None (with a warning) if it fails."""
+    logging.info("Running command: %s", " ".join(args))
+    try:
+        process = subprocess.run(args, capture_output=True, text=True, timeout=DEFAULT_PROFILE_TOOL_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"{Path(args[0]).name} failed: {e}")
+        return None
+    if process.returncode != 0:
+        logging.warning(f"{Path(args[0]).name} failed with exit code {process.returncode}: {process.stderr.strip()}")
+        return None
+    return process.stdout
+
+
+def start_flight_recording(java_home: Path, pid: int) -> bool:
+    """Start a JFR recording, with the 'profile' settings, in a running JVM."""
+    output = _run_profile_tool([
+        str(java_home / "bin" / "jcmd"), str(pid), "JFR.start", f"name={_RECORDING_NAME}", "settings=profile"
+    ])
+    return output is not None
+
+
+def stop_flight_recording(java_home: Path, pid: int, jfr_file: Path) -> bool:
+    """Stop the JFR recording started by start_flight_recording, and dump it to jfr_file."""
+    output = _run_profile_tool([
+        str(java_home / "bin" / "jcmd"), str(pid), "JFR.stop", f"name={_RECORDING_NAME}", f"filename={jfr_file}"
+    ])
+    return output is not None and jfr_file.exists()
+
+
+def _get_class_name(recorded_class: Optional[dict]) -> str:
+    if not recorded_class:
+        return "<unknown>"
+    return recorded_class.get("name", "<unknown>").replace("/", ".")
+
+
+def _get_top_frame(event: dict) -> Optional[str]:
+    frames = (event["values"].get("stackTrace") or {}).get("frames") or []
+    if not frames:
+        return None
+    method = frames[0]["method"]
+    return f"{_get_class_name(method.get('type'))}.{method.get('name', '<unknown>')}"
+
+
+def _get_allocation_weight(event: dict) -> int:
+    values = event["values"]
+    for key in ("weight", "tlabSize", "allocationSize"):
+        if values.get(key) is not None:
+            return int(values[key])
+    return 0
+
+
+def get_hot_spots(recording: dict) -> Tuple[Counter, Counter]:
+    """
+    Aggregate the events of a recording (the output of 'jfr print --json').
+
+    Return the number of execution samples per method at the top of the stack (i.e. self time),
+    and the sampled allocated bytes per class.
+    """
+    methods: Counter = Counter()
+    allocations: Counter = Counter()
+    for event in recording["recording"]["events"]:
+        if event["type"] == _EXECUTION_SAMPLE_EVENT:
+            method = _get_top_frame(event)
+            if method is not None:
+                methods[method] += 1
+        elif event["type"] in _ALLOCATION_EVENTS:
+            allocations[_get_class_name(event["values"].get("objectClass"))] += _get_allocation_weight(event)
+    return methods, allocations
+
+
+def _format_table(counter: Counter, top_n: int, unit: str) -> List[str]:
+    total = sum(counter.values())
+    lines = [f"{unit:>14}  {'%':>6}  name"]
+    for name, value in counter.most_common(top_n):
+        # all the weights can be 0, e.g. allocation samples without a weight
+        percentage = 100.0 * value / total if total > 0 else 0.0
+        lines.append(f"{value:>14}  {percentage:>6.2f}  {name}")
+    return lines
+
+
+def format_jfr_report(jfr_file: Path, summary: str, methods: Counter, allocations: Counter, top_n: int) -> str:
+    lines = [f"JFR recording: {jfr_file}", ""]
+    lines.append(f"Hot methods: top {min(top_n, len(methods))} of {len(methods)}, by self execution samples")
+    lines.extend(_format_table(methods, top_n, "samples"))
+    lines.append("")
+    lines.append(f"Allocations: top {min(top_n, len(allocations))} of {len(allocations)} classes, by sampled bytes")
+    lines.extend(_format_table(allocations, top_n, "bytes"))
+    lines.append("")
+    lines.append(summary)
+    return "\n".join(lines) + "\n"
+
+
+def write_jfr_report(java_home: Path, jfr_file: Path, report_file: Path, top_n: int = DEFAULT_TOP_N) -> bool:
+    """Summarize a recording with the 'jfr' tool of the JDK, into a report of the hot methods and allocations."""
+    jfr_bin = str(java_home / "bin" / "jfr")
+    summary = _run_profile_tool([jfr_bin, "summary", str(jfr_file)])
+    # only the top frame is needed
+    events = _run_profile_tool([
+        jfr_bin, "print", "--json", "--stack-depth", "1",
+        "--events", ",".join((_EXECUTION_SAMPLE_EVENT, *_ALLOCATION_EVENTS)), str(jfr_file)
+    ])
+    if summary is None or events is None:
+        return False
+    methods, allocations = get_hot_spots(json.loads(events))
+    report_file.write_text(format_jfr_report(jfr_file, summary, methods, allocations, top_n))
+    return True
+
+
+def is_perf_available() -> bool:
+    return shutil.which("perf") is not None
+
+
+def get_perf_record_args(perf_data_file: Path) -> List[str]:
+    """The prefix of a command that records its profile, with call graphs, in perf_data_file."""
+    return ["perf", "record", "--quiet", "-g", "-o", str(perf_data_file), "--"]
+
+
+def write_perf_report(perf_data_file: Path, report_file: Path, top_n: int = DEFAULT_TOP_N) -> bool:
+    """Summarize a perf profile into a report of the top_n hottest symbols (by self time)."""
+    output = _run_profile_tool([
+        "perf", "report", "--stdio", "--no-children", "-g", "none", "--sort", "comm,dso,symbol",
+        "-i", str(perf_data_file)
+    ])
+    if output is None:
+        return False
+    entries = [line for line in output.splitlines() if line.strip() and not line.startswith("#")]
+    header = [line for line in output.splitlines() if line.startswith("# Samples") or line.startswith("# Overhead")]
+    lines = [f"perf profile: {perf_data_file}", "", *header, *entries[:top_n]]
+    report_file.write_text("\n".join(lines) + "\n")
+    return True